@@ -1,7 +1,10 @@
-import os, ebooklib
+import os, re, argparse, ebooklib
 from ebooklib import epub
 from bs4 import BeautifulSoup
 
+# --- CONFIGURATION ---
+CHUNK_SIZE = 1 << 20   # Characters read per step of the streaming pass
+
 def extract_canto_literals(epub_path):
     """
     Extracts the Canto header and the literal HTML string of the 
@@ -11,7 +14,6 @@ def extract_canto_literals(epub_path):
     canto_data = []
     
     # Target Location • Canto Roman
-    import re
     canto_pattern = re.compile(r'(Inferno|Purgatorio|Paradiso)\s*•\s*Canto\s*[IVXLCDM]+', re.IGNORECASE)
 
     for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
@@ -27,48 +29,84 @@ def extract_canto_literals(epub_path):
                     canto_data.append((header, literal_content))
     return canto_data
 
-def augment_with_literals(input_txt, output_txt, canto_data):
+def build_literal_pattern(canto_data):
     """
-    Performs a literal string replacement.
+    One regex for every canto's first-paragraph literal, in both the indented
+    ("<p>\n  ...") and the flush ("<p>...") form. Longer literals come first so
+    a literal that is a prefix of another never wins. Returns (pattern, headers
+    by literal, longest possible match).
     """
-    with open(input_txt, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    found_count = 0
+    headers = {}
     for header, literal_text in canto_data:
-        # We look for the exact literal text preceded by a <p> tag
-        # This matches the raw structure: <p>\n  Nel mezzo...
-        search_string = f"<p>\n  {literal_text}"
-        
-        if search_string in content:
-            # We insert the header immediately before the <p> tag
-            insertion = f"<h3 class='canto-header'>{header}</h3>\n{search_string}"
-            content = content.replace(search_string, insertion)
-            found_count += 1
-        else:
-            # Fallback check: try without the specific indentation
-            search_alt = f"<p>{literal_text}"
-            if search_alt in content:
-                insertion = f"<h3 class='canto-header'>{header}</h3>\n{search_alt}"
-                content = content.replace(search_alt, insertion)
-                found_count += 1
-            else:
-                print(f"[!] Literal match failed for: {header}")
+        if literal_text:
+            headers.setdefault(literal_text, []).append(header)
+    if not headers:
+        return None, headers, 0
+    literals = sorted(headers, key=len, reverse=True)
+    pattern = re.compile(r"<p>(\n  )?(" + "|".join(re.escape(t) for t in literals) + ")")
+    return pattern, headers, len(literals[0]) + len("<p>\n  ")
 
-    with open(output_txt, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"[*] Success: {found_count} headers inserted into {output_txt}.")
+def augment_with_literals(input_txt, output_txt, canto_data, report_path=None):
+    """
+    Inserts each canto's header before its first paragraph in a single
+    streaming pass. The file is read in CHUNK_SIZE pieces and written out as
+    it goes; the tail of each chunk is held back until no match can still
+    start there. Returns the headers that were not found.
+    """
+    pattern, headers, longest = build_literal_pattern(canto_data)
+    found = set()
+    tmp_path = output_txt + ".tmp"
+    with open(input_txt, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as out:
+        buffer = ""
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            buffer += chunk
+            # Matches starting before `safe` are complete; later ones wait for more text
+            safe = len(buffer) if not chunk else max(0, len(buffer) - longest + 1)
+            pos = 0
+            if pattern:
+                for match in pattern.finditer(buffer):
+                    if match.start() >= safe:
+                        break
+                    names = headers[match.group(2)]
+                    found.update(names)
+                    out.write(buffer[pos:match.start()])
+                    out.write("".join(f"<h3 class='canto-header'>{name}</h3>\n" for name in names))
+                    out.write(match.group(0))
+                    pos = match.end()
+            if safe > pos:
+                out.write(buffer[pos:safe])
+                pos = safe
+            buffer = buffer[pos:]
+            if not chunk:
+                break
+    os.replace(tmp_path, output_txt)
 
-if __name__ == "__main__":
+    unmatched = [header for header, _ in canto_data if header not in found]
+    for header in unmatched:
+        print(f"[!] Literal match failed for: {header}")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{header}\n" for header in unmatched)
+    print(f"[*] Success: {len(canto_data) - len(unmatched)} headers inserted into {output_txt}.")
+    return unmatched
+
+def cli(argv=None):
     # Ensure files are in the Books folder as previously specified
-    EPUB = "Books/divine_comedy.epub"
-    IN_TXT = "Books/divine_comedy_Bilingual.txt"
-    OUT_TXT = "Books/divine_comedy_Bilingual_aug.txt"
+    parser = argparse.ArgumentParser(description="Insert canto headers into a bilingual text file.")
+    parser.add_argument("--epub", default="Books/divine_comedy.epub")
+    parser.add_argument("--input", default="Books/divine_comedy_Bilingual.txt")
+    parser.add_argument("--output", default="Books/divine_comedy_Bilingual_aug.txt")
+    parser.add_argument("--report", default=None, help="Write the headers that could not be placed here, one per line")
+    args = parser.parse_args(argv)
+    EPUB, IN_TXT, OUT_TXT = args.epub, args.input, args.output
 
     if os.path.exists(EPUB) and os.path.exists(IN_TXT):
         data = extract_canto_literals(EPUB)
-        augment_with_literals(IN_TXT, OUT_TXT, data)
+        augment_with_literals(IN_TXT, OUT_TXT, data, args.report)
     else:
         print("[!] Error: Check your Books/ folder for the required files.")
 
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,9 @@
+"""
+Offline throughput benchmarks for the book pipeline.
+
+    python -m bench.run --chapters 20 --cantos 10 --latency 0.05
+
+synth.py builds synthetic EPUBs, fakes.py provides in-process stand-ins for
+the Gemini client and edge-tts, and run.py runs each stage against them and
+reports sections/sec, MB/sec and peak memory.
+"""
@@ -0,0 +1,119 @@
+import io, re, json, time, random, asyncio, threading
+from types import SimpleNamespace
+
+# --- CONFIGURATION ---
+CHARS_PER_SECOND = 15      # Speaking rate used to size fake TTS audio
+SUMMARY_WORDS = 40         # Length of fake model responses
+
+
+class Latency:
+    """Seeded per-call delay: base seconds plus uniform jitter."""
+    def __init__(self, base=0.0, jitter=0.0, seed=0):
+        self.base = base
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            return self.base + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+def summarize_words(text, words=SUMMARY_WORDS):
+    """Stand-in model output: the first words of the prompt's text, so output scales with input."""
+    parts = re.split(r"(?i)text:", text, maxsplit=1)
+    body = parts[-1] if len(parts) > 1 else text.split("\n\n", 1)[-1]
+    return " ".join(body.split()[:words]) or "Empty."
+
+class FakeModels:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        owner = self.owner
+        time.sleep(owner.latency.next())
+        text = contents if isinstance(contents, str) else " ".join(map(str, contents))
+        cached = 0
+        if getattr(config, "cached_content", None):
+            cached = owner.cached_tokens.get(config.cached_content, 0)
+        schema = getattr(config, "response_schema", None)
+        if schema:
+            answer = json.dumps({key: summarize_words(text) for key in schema.get("properties", {})})
+        else:
+            answer = summarize_words(text)
+        with owner.lock:
+            owner.calls += 1
+        usage = SimpleNamespace(prompt_token_count=len(text) // 4 + cached, candidates_token_count=len(answer) // 4,
+                                cached_content_token_count=cached or None, thoughts_token_count=None)
+        return SimpleNamespace(text=answer, usage_metadata=usage)
+
+class FakeCaches:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model, config=None):
+        owner = self.owner
+        time.sleep(owner.latency.next())
+        with owner.lock:
+            owner.calls += 1
+            name = f"cachedContents/bench-{owner.calls}"
+        contents = getattr(config, "contents", None) or []
+        owner.cached_tokens[name] = sum(len(str(c)) for c in contents) // 4
+        return SimpleNamespace(name=name)
+
+    def delete(self, name):
+        self.owner.cached_tokens.pop(name, None)
+
+class FakeGenaiClient:
+    """
+    In-process stand-in for genai.Client covering what the pipeline uses:
+    models.generate_content (plain and JSON-schema) and caches.create/delete.
+    """
+    def __init__(self, latency=0.0, jitter=0.0, seed=0):
+        self.latency = Latency(latency, jitter, seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.cached_tokens = {}
+        self.models = FakeModels(self)
+        self.caches = FakeCaches(self)
+
+
+class FakeTTS:
+    """
+    Stand-in for the edge_tts module. Communicate(...).save() waits the
+    configured latency and writes a silent MP3 as long as the text would take
+    to speak, so decode/encode costs downstream are realistic. Clips are
+    encoded once per whole-second duration and reused. With real_audio=False
+    a placeholder is written instead, for callers that never decode it.
+    """
+    def __init__(self, latency=0.0, jitter=0.0, seed=0, real_audio=True):
+        self.latency = Latency(latency, jitter, seed)
+        self.real_audio = real_audio
+        self.clips = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        tts = self
+
+        class Communicate:
+            def __init__(self, text, voice, rate="+0%", **kwargs):
+                self.text = text
+
+            async def save(self, path):
+                await asyncio.sleep(tts.latency.next())
+                with open(path, "wb") as f:
+                    f.write(tts.clip(max(1, round(len(self.text) / CHARS_PER_SECOND))))
+                with tts.lock:
+                    tts.calls += 1
+
+        self.Communicate = Communicate
+
+    def clip(self, seconds):
+        if not self.real_audio:
+            return b"ID3" + bytes(seconds)
+        with self.lock:
+            if seconds not in self.clips:
+                from pydub import AudioSegment
+                buf = io.BytesIO()
+                AudioSegment.silent(duration=seconds * 1000).export(buf, format="mp3")
+                self.clips[seconds] = buf.getvalue()
+            return self.clips[seconds]
@@ -0,0 +1,214 @@
+import os, sys, time, random, asyncio, argparse, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from google.genai import errors
+from bench.fakes import FakeGenaiClient, FakeTTS
+
+# --- CONFIGURATION ---
+# Named fault profiles; any field can be overridden on the command line.
+PROFILES = {
+    "steady": {},
+    "quota": {"rpm": 10},                                   # Free-tier style per-minute quota
+    "burst429": {"lockout_every": 30, "lockout_for": 8},    # Periodic windows where every request is refused
+    "tail": {"tail_prob": 0.05, "tail_latency": 5.0},       # Rare very slow responses
+    "flaky": {"error_rate": 0.05, "drop_rate": 0.1},        # 5xx errors and dropped TTS websockets
+    "overnight": {"rpm": 10, "lockout_every": 120, "lockout_for": 15, "tail_prob": 0.02,
+                  "tail_latency": 5.0, "error_rate": 0.02, "drop_rate": 0.05},
+}
+
+
+class FaultProfile:
+    """
+    What goes wrong and how often.
+      rpm/window: sliding-window quota; requests beyond it get 429
+      lockout_every/lockout_for: every N seconds, refuse everything for M seconds (429 bursts)
+      error_rate: share of requests failing with 503 (Gemini) or a dropped connection (TTS)
+      drop_rate: extra share of TTS requests whose websocket drops mid-stream
+      tail_prob/tail_latency: share of requests delayed by tail_latency seconds
+    """
+    FIELDS = {"rpm": 0, "window": 60.0, "lockout_every": 0.0, "lockout_for": 0.0, "error_rate": 0.0,
+              "drop_rate": 0.0, "tail_prob": 0.0, "tail_latency": 0.0, "seed": 0}
+
+    def __init__(self, **overrides):
+        for name, default in self.FIELDS.items():
+            setattr(self, name, type(default)(overrides.get(name, default)))
+
+    def describe(self):
+        return ", ".join(f"{n}={getattr(self, n)}" for n, d in self.FIELDS.items() if getattr(self, n) != d) or "no faults"
+
+class FaultInjector:
+    """
+    Decides the fate of each request from a seeded RNG, so a run with the same
+    seed and call order sees the same fault sequence. Thread-safe.
+    """
+    def __init__(self, profile):
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.recent = deque()
+        self.injected = {}
+
+    def record(self, kind):
+        self.injected[kind] = self.injected.get(kind, 0) + 1
+        return kind
+
+    def decide(self, is_tts=False):
+        """Returns (fault kind or None, extra latency in seconds)."""
+        p = self.profile
+        with self.lock:
+            now = time.monotonic()
+            roll, tail_roll = self.rng.random(), self.rng.random()
+            delay = p.tail_latency if tail_roll < p.tail_prob else 0.0
+            if delay:
+                self.record("tail")
+            if p.lockout_every and (now - self.started) % p.lockout_every < p.lockout_for:
+                return self.record("lockout"), delay
+            if p.rpm and not is_tts:
+                while self.recent and now - self.recent[0] > p.window:
+                    self.recent.popleft()
+                if len(self.recent) >= p.rpm:
+                    return self.record("quota"), delay
+                self.recent.append(now)
+            if roll < p.error_rate:
+                return self.record("error"), delay
+            if is_tts and roll < p.error_rate + p.drop_rate:
+                return self.record("drop"), delay
+            return None, delay
+
+def api_error(kind):
+    if kind in ("lockout", "quota"):
+        return errors.ClientError(429, {"error": {"code": 429, "message": f"Simulated {kind}", "status": "RESOURCE_EXHAUSTED"}})
+    return errors.ServerError(503, {"error": {"code": 503, "message": "Simulated outage", "status": "UNAVAILABLE"}})
+
+class FaultyModels:
+    def __init__(self, inner, injector):
+        self.inner = inner
+        self.injector = injector
+
+    def generate_content(self, *args, **kwargs):
+        fault, delay = self.injector.decide()
+        time.sleep(delay)
+        if fault:
+            raise api_error(fault)
+        return self.inner.generate_content(*args, **kwargs)
+
+class FaultyGenaiClient:
+    """Wraps a client (a FakeGenaiClient by default) and injects the profile's faults before each call."""
+    def __init__(self, profile, inner=None):
+        self.injector = FaultInjector(profile)
+        self.inner = inner or FakeGenaiClient()
+        self.models = FaultyModels(self.inner.models, self.injector)
+        self.caches = self.inner.caches
+
+class FaultyTTS:
+    """edge_tts stand-in whose Communicate.save() can stall, fail or drop like a flaky websocket."""
+    def __init__(self, profile, inner=None):
+        self.injector = FaultInjector(profile)
+        self.inner = inner or FakeTTS()
+        injector, base = self.injector, self.inner.Communicate
+
+        class Communicate(base):
+            async def save(self, path):
+                fault, delay = injector.decide(is_tts=True)
+                await asyncio.sleep(delay)
+                if fault == "drop":
+                    # Part of the audio arrives, then the connection goes away
+                    with open(path, "wb") as f:
+                        f.write(b"\xff\xfb")
+                    raise ConnectionResetError("Simulated websocket drop")
+                if fault:
+                    raise ConnectionError(f"Simulated {fault}")
+                await super().save(path)
+
+        self.Communicate = Communicate
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def report(name, outcomes, wall, injected):
+    latencies = [seconds for ok, seconds in outcomes]
+    ok = sum(1 for good, _ in outcomes if good)
+    print(f"\n=== {name} ===")
+    print(f"calls {len(outcomes)}, succeeded {ok}, failed {len(outcomes) - ok}, "
+          f"{len(outcomes) / wall if wall else 0:.2f} calls/s over {wall:.1f}s")
+    print(f"latency p50 {percentile(latencies, 0.5):.2f}s  p95 {percentile(latencies, 0.95):.2f}s  max {max(latencies, default=0):.2f}s")
+    print("injected: " + (", ".join(f"{k} {v}" for k, v in sorted(injected.items())) or "none"))
+
+def load_gemini(profile, requests, concurrency, latency):
+    """Drives translate_epub.call_gemini_with_backoff (with its real backoff policy) from a thread pool."""
+    import translate_epub
+    client = FaultyGenaiClient(profile, FakeGenaiClient(latency, seed=profile.seed))
+    translate_epub.client = client
+
+    def one(i):
+        started = time.monotonic()
+        try:
+            translate_epub.call_gemini_with_backoff(f"Summarize this:\n\nSection {i} text.")
+            return True, time.monotonic() - started
+        except Exception:
+            return False, time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        outcomes = list(pool.map(one, range(requests)))
+    attempts = client.inner.calls + sum(client.injector.injected.get(k, 0) for k in ("lockout", "quota", "error"))
+    report("call_gemini_with_backoff", outcomes, time.monotonic() - started, client.injector.injected)
+    print(f"attempts {attempts} ({attempts - requests} retries)")
+
+def load_tts(profile, requests, concurrency, latency, workdir):
+    """Drives build_audio.generate_speech (with its own retry loop) as concurrent asyncio tasks."""
+    import build_audio
+    tts = FaultyTTS(profile, FakeTTS(latency, seed=profile.seed, real_audio=False))
+    build_audio.edge_tts = tts
+    gate = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(i):
+        async with gate:
+            started = time.monotonic()
+            path = os.path.join(workdir, f"fault_tts_{i}.mp3")
+            ok = await build_audio.generate_speech(f"Segment {i} of the canto.", "it-IT-DiegoNeural", path)
+            if os.path.exists(path):
+                os.remove(path)
+            return ok, time.monotonic() - started
+
+    async def run_all():
+        return await asyncio.gather(*(one(i) for i in range(requests)))
+
+    started = time.monotonic()
+    outcomes = asyncio.run(run_all())
+    report("generate_speech", outcomes, time.monotonic() - started, tts.injector.injected)
+    print(f"successful saves {tts.inner.calls}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the retry paths against simulated quota windows, tail latency and errors.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="overnight")
+    parser.add_argument("--target", choices=["gemini", "tts", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Base seconds per successful call")
+    parser.add_argument("--workdir", default=".", help="Where temporary TTS files are written")
+    for name, default in FaultProfile.FIELDS.items():
+        parser.add_argument(f"--{name}", type=type(default), default=None, help=f"Override the profile's {name}")
+    args = parser.parse_args(argv)
+
+    settings = dict(PROFILES[args.profile])
+    settings.update({n: getattr(args, n) for n in FaultProfile.FIELDS if getattr(args, n) is not None})
+    profile = FaultProfile(**settings)
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    print(f"[*] Profile {args.profile}: {profile.describe()}")
+
+    if args.target in ("gemini", "both"):
+        load_gemini(profile, args.requests, args.concurrency, args.latency)
+    if args.target in ("tts", "both"):
+        load_tts(profile, args.requests, args.concurrency, args.latency, args.workdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os, sys, json, time, shutil, asyncio, argparse, tempfile, contextlib, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.synth import make_prose_epub, make_canto_epub
+from bench.fakes import FakeGenaiClient, FakeTTS
+
+# --- CONFIGURATION ---
+STAGES = ["translate", "translate_cantos", "chapters", "cantos", "epub", "site", "chapter_audio", "canto_audio"]
+
+
+def count_sections(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().count("### SECTION ")
+
+def file_mb(*paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p)) / 2**20
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 1024  # bytes on macOS, kilobytes on Linux
+
+
+# --- Stages (each runs in a fresh process so peak RSS is its own) ---
+def bench_translate(opts, gemini, tts, cantos=False):
+    import translate_epub
+    translate_epub.client = gemini
+    translate_epub.THROTTLE_SECONDS = 0
+    epub_path = opts["canto_epub"] if cantos else opts["prose_epub"]
+    # Never resume from, or leave behind, progress
+    shutil.rmtree(translate_epub.state_dir(epub_path), ignore_errors=True)
+    translate_epub.run_interleaved_translation(epub_path, None, None, 500, cantos)
+    shutil.rmtree(translate_epub.state_dir(epub_path), ignore_errors=True)
+    out = epub_path.replace(".epub", "_Bilingual.txt")
+    return {"sections": count_sections(out), "mb": file_mb(epub_path)}
+
+def bench_chapters(opts, gemini, tts):
+    import extract_chapters
+    extract_chapters.client = gemini
+    src = opts["prose_bilingual"]
+    extract_chapters.extract_chapters(src, opts["chapter_summary"], True, opts["workers"], 0)
+    return {"sections": count_sections(src), "mb": file_mb(src)}
+
+def bench_cantos(opts, gemini, tts):
+    import extract_cantos
+    extract_cantos.client = gemini
+    src, out = opts["canto_bilingual"], opts["canto_summary"]
+    if os.path.exists(out):
+        os.remove(out)
+    names = opts["canto_names"]
+    extract_cantos.summarize_cantos_to_file(src, names[0], names[-1], out, opts["workers"], 0)
+    return {"sections": count_sections(src), "mb": file_mb(src)}
+
+def bench_epub(opts, gemini, tts):
+    import build_epub
+    src = opts["prose_bilingual"]
+    build_epub.create_epub(src, opts["chapter_summary"], opts["out_epub"])
+    return {"sections": count_sections(src), "mb": file_mb(src, opts["chapter_summary"])}
+
+def bench_site(opts, gemini, tts):
+    import epub_to_htmlz
+    css = os.path.join(opts["workdir"], "bench.css")
+    with open(css, "w", encoding="utf-8") as f:
+        f.write("body { font-family: serif; }\n")
+    site = os.path.join(opts["workdir"], "site")
+    shutil.rmtree(site, ignore_errors=True)
+    epub_to_htmlz.epub_to_jekyll_htmlz(opts["out_epub"], css, site, search_index=True)
+    return {"sections": count_sections(opts["prose_bilingual"]), "mb": file_mb(opts["out_epub"])}
+
+def bench_chapter_audio(opts, gemini, tts):
+    import build_chapter_audio
+    build_chapter_audio.edge_tts = tts
+    src = opts["prose_bilingual"]
+    asyncio.run(build_chapter_audio.build_audiobook(src, os.path.join(opts["workdir"], "bench_all.mp3"),
+                                                    None, not opts["ffmpeg"]))
+    return {"sections": count_sections(src), "mb": file_mb(src)}
+
+def bench_canto_audio(opts, gemini, tts):
+    import build_audio
+    build_audio.edge_tts = tts
+    src = opts["canto_bilingual"]
+    asyncio.run(build_audio.main(src, 1, 1.0, "italian", opts["canto_summary"]))
+    return {"sections": count_sections(src), "mb": file_mb(src)}
+
+BENCHES = {
+    "translate": bench_translate,
+    "translate_cantos": lambda opts, gemini, tts: bench_translate(opts, gemini, tts, cantos=True),
+    "chapters": bench_chapters,
+    "cantos": bench_cantos,
+    "epub": bench_epub,
+    "site": bench_site,
+    "chapter_audio": bench_chapter_audio,
+    "canto_audio": bench_canto_audio,
+}
+
+def run_stage(name, opts):
+    """Child-process entry point: installs the fakes, runs one stage quietly and measures it."""
+    os.environ.setdefault("GEMINI_API_KEY", "bench")  # Modules build a client (or exit) at import
+    os.chdir(opts["workdir"])
+    gemini = FakeGenaiClient(opts["latency"], opts["jitter"], opts["seed"])
+    tts = FakeTTS(opts["tts_latency"], opts["jitter"], opts["seed"])
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        result = BENCHES[name](opts, gemini, tts)
+        seconds = time.perf_counter() - started
+    result.update({"stage": name, "seconds": seconds, "requests": gemini.calls + tts.calls, "peak_mb": peak_rss_mb()})
+    return result
+
+
+def report(results, baseline=None):
+    header = f"{'STAGE':<22}{'SECONDS':>9}{'SECTIONS':>10}{'SECT/S':>9}{'MB':>8}{'MB/S':>8}{'REQS':>7}{'PEAK MB':>9}"
+    if baseline:
+        header += f"{'Δ SECT/S':>10}{'Δ PEAK':>9}"
+    print(header)
+    for r in results:
+        rate = r["sections"] / r["seconds"] if r["seconds"] else 0.0
+        mbps = r["mb"] / r["seconds"] if r["seconds"] else 0.0
+        line = (f"{r['stage'] + r.get('note', ''):<22}{r['seconds']:>9.2f}{r['sections']:>10}{rate:>9.1f}"
+                f"{r['mb']:>8.2f}{mbps:>8.2f}{r['requests']:>7}{r['peak_mb']:>9.0f}")
+        old = (baseline or {}).get(r["stage"])
+        if old and old["seconds"] and old["sections"] and old["peak_mb"]:
+            old_rate = old["sections"] / old["seconds"]
+            line += f"{100 * (rate - old_rate) / old_rate:>+9.0f}%{100 * (r['peak_mb'] - old['peak_mb']) / old['peak_mb']:>+8.0f}%"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic books with fake Gemini and edge-tts backends.")
+    parser.add_argument("--chapters", type=int, default=20, help="Prose chapters")
+    parser.add_argument("--paragraphs", type=int, default=30, help="Paragraphs (sections) per chapter")
+    parser.add_argument("--words", type=int, default=110, help="Words per paragraph")
+    parser.add_argument("--cantos", type=int, default=10)
+    parser.add_argument("--tercets", type=int, default=40, help="Tercets (sections) per canto")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per fake Gemini call")
+    parser.add_argument("--tts_latency", type=float, default=0.0, help="Seconds per fake edge-tts call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random latency, seconds")
+    parser.add_argument("--workers", type=int, default=4, help="Workers for the concurrent summary stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--workdir", default=None, help="Keep generated books and outputs here (default: a temp dir)")
+    parser.add_argument("--save", default=None, help="Write results as JSON for later --compare")
+    parser.add_argument("--compare", default=None, help="Show changes against a saved results JSON")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="ltw_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    prose_epub = make_prose_epub(os.path.join(workdir, "bench_novel.epub"), args.chapters, args.paragraphs, args.words, args.seed)
+    canto_epub, canto_names = make_canto_epub(os.path.join(workdir, "bench_commedia.epub"), args.cantos, args.tercets, args.seed)
+    opts = {
+        "workdir": workdir, "prose_epub": prose_epub, "canto_epub": canto_epub, "canto_names": canto_names,
+        "prose_bilingual": prose_epub.replace(".epub", "_Bilingual.txt"),
+        "canto_bilingual": canto_epub.replace(".epub", "_Bilingual.txt"),
+        "chapter_summary": os.path.join(workdir, "bench_novel_summaries.txt"),
+        "canto_summary": os.path.join(workdir, "bench_commedia_summaries.txt"),
+        "out_epub": os.path.join(workdir, "bench_novel_Book.epub"),
+        "latency": args.latency, "tts_latency": args.tts_latency, "jitter": args.jitter,
+        "workers": args.workers, "seed": args.seed, "ffmpeg": bool(shutil.which("ffmpeg")),
+    }
+    print(f"[*] Synthetic books in {workdir}: {args.chapters} chapters x {args.paragraphs} paragraphs, "
+          f"{args.cantos} cantos x {args.tercets} tercets")
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for name in [s.strip() for s in args.stages.split(",") if s.strip()]:
+        if name not in BENCHES:
+            raise SystemExit(f"[!] Unknown stage: {name}")
+        if name == "canto_audio" and not opts["ffmpeg"]:
+            print(f"[!] {name}: skipped, ffmpeg not found")
+            continue
+        print(f"[*] {name}...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            try:
+                result = pool.submit(run_stage, name, opts).result()
+            except Exception as e:
+                print(f"[!] {name} failed: {e}")
+                continue
+        if name == "chapter_audio" and not opts["ffmpeg"]:
+            result["note"] = " (dry)"
+        results.append(result)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = {r["stage"]: r for r in json.load(f)["results"]}
+    print()
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=1)
+        print(f"[*] Results saved to {args.save}")
+
+if __name__ == "__main__":
+    main()
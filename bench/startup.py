@@ -0,0 +1,89 @@
+import os, sys, time, argparse, tempfile, subprocess, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- CONFIGURATION ---
+TARGET_SECONDS = 0.25   # Cold-start budget for every lightweight command
+RUNS = 5
+
+SAMPLE_BILINGUAL = """<div class='original-text'>
+<h2>I</h2>
+</div>
+### EXTRACTED HEADER: I
+========================================
+<div class='original-text'>
+### SECTION 1 ORIGINAL
+<p>{prose}</p>
+</div>
+<details>
+<summary><b>View Contemporary Translation</b></summary>
+<div class='translation-content'>
+A short translation.
+</div>
+</details>
+"""
+
+
+def cases(workdir):
+    """(label, ltw arguments, lightweight?) for each measured command."""
+    for name in ("Inferno_*_Canto_II_speed_0.75.html", "Inferno_*_Canto_I_speed_0.75.html"):
+        with open(os.path.join(workdir, name), "w") as f:
+            f.write("<html></html>")
+    subprocess.run([sys.executable, "-m", "ltw", "catalog", "scan", "--dir", workdir], cwd=workdir,
+                   env=dict(os.environ, LTW_NO_DAEMON="1", PYTHONPATH=ROOT), stdout=subprocess.DEVNULL, check=True)
+    bilingual = os.path.join(workdir, "startup_Bilingual.txt")
+    with open(bilingual, "w", encoding="utf-8") as f:
+        f.write(SAMPLE_BILINGUAL.format(prose="Words of the chapter. " * 20))
+    return [
+        ("ltw --help", ["--help"], True),
+        ("canto-sort", ["canto-sort", "--dir", workdir], True),
+        ("canto-index", ["canto-index", "--dir", workdir], True),
+        ("audio --dry-run", ["audio", "--dry-run", "-i", bilingual, "-o", os.path.join(workdir, "x.mp3")], True),
+        ("build --help", ["build", "--help"], True),
+        ("daemon status", ["daemon", "status"], True),
+        ("translate --help", ["translate", "--help"], False),
+        ("canto-audio --help", ["canto-audio", "--help"], False),
+    ]
+
+def time_command(args, runs, workdir):
+    """Median seconds for `ltw args`; raises if the command fails, so an error is never timed as a result."""
+    env = dict(os.environ, LTW_NO_DAEMON="1", PYTHONPATH=ROOT)
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        done = subprocess.run([sys.executable, "-m", "ltw"] + args, cwd=workdir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+        times.append(time.perf_counter() - started)
+        if done.returncode:
+            raise SystemExit(f"[!] ltw {' '.join(args)} exited with {done.returncode}:\n{done.stderr}")
+    return statistics.median(times)
+
+def time_command_python(runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=False)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold-start time of ltw commands against a target.")
+    parser.add_argument("--runs", type=int, default=RUNS, help="Runs per command; the median is reported")
+    parser.add_argument("--target", type=float, default=TARGET_SECONDS, help="Seconds allowed for lightweight commands")
+    args = parser.parse_args(argv)
+
+    floor = time_command_python(args.runs)
+    print(f"{'COMMAND':<22}{'SECONDS':>9}{'TARGET':>9}")
+    print(f"{'(bare interpreter)':<22}{floor:>9.3f}")
+    over = 0
+    with tempfile.TemporaryDirectory(prefix="ltw_startup_") as workdir:
+        for label, ltw_args, light in cases(workdir):
+            seconds = time_command(ltw_args, args.runs, workdir)
+            verdict = ("ok" if seconds <= args.target else "SLOW") if light else "-"
+            over += light and seconds > args.target
+            print(f"{label:<22}{seconds:>9.3f}{verdict:>9}")
+    if over:
+        raise SystemExit(f"[!] {over} lightweight command(s) over the {args.target:.2f}s target")
+
+if __name__ == "__main__":
+    main()
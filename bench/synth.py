@@ -0,0 +1,96 @@
+import random
+from ebooklib import epub
+
+# --- CONFIGURATION ---
+SYLLABLES = ["la", "re", "mi", "so", "ta", "ne", "di", "vo", "ca", "por", "men", "tri", "sel", "gu", "an", "ter", "bel", "qua"]
+CANTICLES = ["Inferno", "Purgatorio", "Paradiso"]
+
+
+def int_to_roman(n):
+    """Converts an integer to a Roman numeral string."""
+    val = [1000, 900, 500, 400, 100, 90, 50, 40, 10, 9, 5, 4, 1]
+    syb = ["M", "CM", "D", "CD", "C", "XC", "L", "XL", "X", "IX", "V", "IV", "I"]
+    roman_num = ""
+    i = 0
+    while n > 0:
+        for _ in range(n // val[i]):
+            roman_num += syb[i]
+            n -= val[i]
+        i += 1
+    return roman_num
+
+class TextGenerator:
+    """Deterministic pseudo-language prose so runs with the same seed are byte-identical."""
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def word(self):
+        return "".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(1, 4)))
+
+    def sentence(self, words):
+        text = " ".join(self.word() for _ in range(words))
+        return text[0].upper() + text[1:] + "."
+
+    def paragraph(self, words):
+        out = []
+        while words > 0:
+            n = min(words, self.rng.randint(8, 20))
+            out.append(self.sentence(n))
+            words -= n
+        return " ".join(out)
+
+def new_book(title, lang):
+    book = epub.EpubBook()
+    book.set_identifier(f"bench-{title.lower().replace(' ', '-')}")
+    book.set_title(title)
+    book.set_language(lang)
+    book.add_author("Bench Generator")
+    return book
+
+def finish_book(book, docs, path):
+    for doc in docs:
+        book.add_item(doc)
+    book.toc = tuple(docs)
+    book.add_item(epub.EpubNav())
+    book.spine = ["nav"] + docs
+    epub.write_epub(path, book)
+    return path
+
+def make_prose_epub(path, chapters=20, paragraphs=30, words=110, seed=0, lang="fr"):
+    """
+    A novel-shaped EPUB: one document per chapter headed by <h2>{roman}</h2>,
+    the form translate_epub, build_epub and build_chapter_audio detect.
+    With the default 110 words, paragraphs clear translate_epub's 500-character minimum.
+    """
+    gen = TextGenerator(seed)
+    book = new_book("Bench Novel", lang)
+    docs = []
+    for c in range(1, chapters + 1):
+        body = "".join(f"<p>{gen.paragraph(words)}</p>" for _ in range(paragraphs))
+        doc = epub.EpubHtml(title=f"Chapter {c}", file_name=f"chap_{c:03d}.xhtml", lang=lang)
+        doc.content = f"<html><body><h2>{int_to_roman(c)}</h2>{body}</body></html>"
+        docs.append(doc)
+    return finish_book(book, docs, path)
+
+def make_canto_epub(path, cantos=10, tercets=40, seed=0, lang="it"):
+    """
+    A Divine-Comedy-shaped EPUB: cantos spread over the three canticles, each
+    opening with a '<Canticle> • Canto <roman>' paragraph followed by tercets
+    (three lines joined by <br/>). Translate it with break_at_p_tags.
+    Returns the EPUB path and the canto names for extract_cantos' range.
+    """
+    gen = TextGenerator(seed)
+    book = new_book("Bench Commedia", lang)
+    docs, names = [], []
+    per_canticle = max(1, -(-cantos // len(CANTICLES)))
+    for c in range(cantos):
+        canticle = CANTICLES[min(c // per_canticle, len(CANTICLES) - 1)]
+        number = c - CANTICLES.index(canticle) * per_canticle + 1
+        name = f"{canticle} • Canto {int_to_roman(number)}"
+        names.append(name)
+        verses = "".join(f"<p>{'<br/>'.join(gen.sentence(gen.rng.randint(7, 11)) for _ in range(3))}</p>" for _ in range(tercets))
+        doc = epub.EpubHtml(title=name, file_name=f"canto_{c + 1:03d}.xhtml", lang=lang)
+        doc.content = f"<html><body><p>{name}</p>{verses}</body></html>"
+        docs.append(doc)
+    finish_book(book, docs, path)
+    return path, names
@@ -0,0 +1,172 @@
+import os, json, time, argparse, threading
+import ebooklib
+from ebooklib import epub
+from google.genai import types
+import translate_epub
+import metrics
+
+# --- CONFIGURATION ---
+GLOSSARY_FILE = "glossary.json"     # Kept in the book's .state folder and reused by later runs
+CHUNK_CHARS = 400000                # Book text per extraction request
+MAX_ENTRIES = 150                   # Per list, most frequently seen first
+CACHE_TTL_SECONDS = 3600
+REFRESH_MARGIN_SECONDS = 300        # Re-upload this long before the cache would expire
+
+EXTRACT_PROMPT = ("List the characters of this part of a book, with the English form of each name, and the recurring "
+                  "places, titles, forms of address and terms of art, with the English rendering to use for each. "
+                  "Skip anything that appears only once.\n\nText:\n{text}")
+GLOSSARY_INSTRUCTION = ("The glossary below belongs to the book the passages come from. Use its English names and "
+                        "renderings consistently in every answer.")
+
+ENTRY = {"type": "OBJECT", "properties": {"name": {"type": "STRING"}, "english": {"type": "STRING"},
+                                          "note": {"type": "STRING"}}, "required": ["name", "english"]}
+SCHEMA = {"type": "OBJECT", "properties": {"characters": {"type": "ARRAY", "items": ENTRY},
+                                           "terms": {"type": "ARRAY", "items": ENTRY}},
+          "required": ["characters", "terms"]}
+
+
+def glossary_path(epub_path):
+    return os.path.join(translate_epub.state_dir(epub_path), GLOSSARY_FILE)
+
+def book_chunks(epub_path, chunk_chars=CHUNK_CHARS):
+    """The book's text in pieces of about chunk_chars, split at paragraph boundaries."""
+    book = epub.read_epub(epub_path)
+    items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+    chunk = []
+    size = 0
+    for section in translate_epub.iter_sections(items, ["h1", "h2", "h3"]):
+        if not section["text"]:
+            continue
+        chunk.append(section["text"])
+        size += len(section["text"])
+        if size >= chunk_chars:
+            yield "\n\n".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "\n\n".join(chunk)
+
+def merge(found, entries):
+    """Adds entries to found (keyed by lowercased name), counting how many chunks mention each."""
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or not entry.get("name") or not entry.get("english"):
+            continue
+        key = entry["name"].strip().lower()
+        if key in found:
+            found[key]["seen"] += 1
+        else:
+            found[key] = {"name": entry["name"].strip(), "english": entry["english"].strip(),
+                          "note": (entry.get("note") or "").strip(), "seen": 1}
+
+def extract_glossary(epub_path, chunk_chars=CHUNK_CHARS):
+    """One structured request per chunk of the book; returns {'characters': [...], 'terms': [...]}."""
+    characters, terms = {}, {}
+    for i, text in enumerate(book_chunks(epub_path, chunk_chars), start=1):
+        print(f"[*] Glossary pass over part {i}...", flush=True)
+        response = translate_epub.call_gemini_with_backoff(EXTRACT_PROMPT.format(text=text),
+                                                           response_mime_type="application/json", response_schema=SCHEMA)
+        try:
+            result = json.loads(response.text)
+        except ValueError as e:
+            print(f"[!] Part {i} gave no usable glossary: {e}")
+            continue
+        merge(characters, result.get("characters"))
+        merge(terms, result.get("terms"))
+    ranked = lambda found: sorted(found.values(), key=lambda e: -e["seen"])[:MAX_ENTRIES]
+    return {"characters": ranked(characters), "terms": ranked(terms)}
+
+def load_glossary(epub_path, rebuild=False, chunk_chars=CHUNK_CHARS):
+    """The book's glossary, extracted on first use and read from the state folder afterwards."""
+    path = glossary_path(epub_path)
+    if not rebuild and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    with metrics.stage("glossary"):
+        data = extract_glossary(epub_path, chunk_chars)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+    return data
+
+def format_glossary(data):
+    """Compact text form used as context: one line per name or term."""
+    def lines(entries):
+        return [f"- {e['name']}: {e['english']}" + (f" ({e['note']})" if e.get("note") else "") for e in entries]
+    return "\n".join(["CHARACTERS:"] + lines(data.get("characters", [])) + ["", "TERMS:"] + lines(data.get("terms", [])))
+
+
+class BookContext:
+    """
+    The glossary as cached context that every section request references,
+    so each request pays for it at the cached rate instead of inlining it.
+    The cache is re-uploaded before it expires during long runs. If caching
+    is unavailable (or the glossary is below the model's minimum cache size),
+    the glossary is inlined into each prompt instead.
+    """
+    def __init__(self, text, ttl=CACHE_TTL_SECONDS):
+        self.text = text
+        self.ttl = ttl
+        self.cache = None
+        self.created = 0.0
+        self.inline = False
+        self.lock = threading.Lock()
+
+    def cache_name(self):
+        with self.lock:
+            if self.inline:
+                return None
+            if self.cache and time.monotonic() - self.created < self.ttl - REFRESH_MARGIN_SECONDS:
+                return self.cache.name
+            try:
+                with metrics.request("cache-create"):
+                    self.cache = translate_epub.client.caches.create(
+                        model=translate_epub.MODEL_ID,
+                        config=types.CreateCachedContentConfig(contents=[self.text], system_instruction=GLOSSARY_INSTRUCTION,
+                                                               ttl=f"{self.ttl}s"),
+                    )
+                self.created = time.monotonic()
+                metrics.count("cache_created")
+                return self.cache.name
+            except Exception as e:
+                metrics.count("cache_unavailable")
+                print(f"[!] Context cache unavailable, inlining the glossary: {e}")
+                self.inline = True
+                return None
+
+    def apply(self, prompt, config):
+        """The prompt and request config with the glossary attached."""
+        name = self.cache_name()
+        if name:
+            return prompt, dict(config, cached_content=name)
+        return f"{GLOSSARY_INSTRUCTION}\n\n{self.text}\n\n{prompt}", config
+
+    def close(self):
+        if self.cache:
+            try:
+                translate_epub.client.caches.delete(name=self.cache.name)
+            except Exception as e:
+                print(f"[!] Could not delete context cache {self.cache.name}: {e}")
+            self.cache = None
+
+
+def open_context(epub_path, rebuild=False):
+    data = load_glossary(epub_path, rebuild)
+    print(f"[*] Glossary: {len(data['characters'])} characters, {len(data['terms'])} terms")
+    return BookContext(format_glossary(data))
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Extract (or show) a book's glossary of names and recurring terms.")
+    parser.add_argument("input", help="Source EPUB")
+    parser.add_argument("--rebuild", action="store_true", help="Extract again even if the book already has one")
+    parser.add_argument("--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+    args = parser.parse_args(argv)
+    with metrics.run("book_glossary", args.metrics):
+        data = load_glossary(args.input, args.rebuild)
+    print(format_glossary(data))
+    print(f"\n[*] {glossary_path(args.input)}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,7 +1,14 @@
+import worker_daemon
+worker_daemon.delegate(__name__, __file__)  # Run in the warm worker daemon if one is up
 import os, sys, re, asyncio, argparse
 from bs4 import BeautifulSoup
 from pydub import AudioSegment
 import edge_tts
+import metrics
+import cassette
+import structure_index
+import catalog
+import sentence_align
 
 # --- CONFIGURATION ---
 VOICE_MAP = {
@@ -17,6 +24,7 @@ VOICE_MAP = {
 VOICE_EN = "en-US-GuyNeural"
 SILENCE_GAP = 1500 
 RETRIES = 3         
+edge_tts = cassette.tts_module(edge_tts)
 
 def speed_to_tts_rate(speed_decimal):
     return f"{(speed_decimal - 1) * 100:+.0f}%"
@@ -27,11 +35,14 @@ async def generate_speech(text, voice, output_path, *, speed=1.0):
     rate_str = speed_to_tts_rate(speed)
     for attempt in range(RETRIES):
         try:
-            communicate = edge_tts.Communicate(clean_text, voice, rate=rate_str)
-            await communicate.save(output_path)
+            with metrics.request("edge-tts"):
+                communicate = edge_tts.Communicate(clean_text, voice, rate=rate_str)
+                await communicate.save(output_path)
             return True
         except Exception:
-            if attempt < RETRIES - 1: await asyncio.sleep(2)
+            if attempt < RETRIES - 1:
+                metrics.count("retries")
+                await asyncio.sleep(2)
             else: return False
 
 def parse_summaries(summary_file):
@@ -80,26 +91,61 @@ def generate_html_player(title, summary, segments, mp3_filename):
     html_filename = mp3_filename.replace(".mp3", ".html")
     with open(html_filename, "w", encoding="utf-8") as f: f.write(html_content)
 
-def parse_bilingual_text(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f: content = f.read()
-    title = re.search(r"TITLE: (.*)", content).group(1).strip() if "TITLE:" in content else "Unknown"
-    author = re.search(r"AUTHOR: (.*)", content).group(1).strip() if "AUTHOR:" in content else "Unknown"
-    segments = []
-    for chunk in content.split('========================================'):
-        if "ORIGINAL" not in chunk: continue
+def save_canto(info, combined_audio, segments, speed, book):
+    """
+    Writes a canto's MP3 and HTML player and records both in the artifact
+    catalog. The introductory sections before the first canto are written but
+    not catalogued, as they have no canto number.
+    """
+    fname = f"{info['name'].replace(' ', '_')}_speed_{speed}.mp3"
+    with metrics.stage("encode"):
+        combined_audio.export(fname, format="mp3")
+    generate_html_player(info['name'], info['summary'], segments, fname)
+    part, number = catalog.parse_canto_name(info['name'])
+    if number is None:
+        return
+    entries = catalog.open_catalog()
+    entries.register(fname, "canto_audio", book, part, number, speed, len(combined_audio) / 1000.0)
+    entries.register(fname.replace(".mp3", ".html"), "canto_page", book, part, number, speed)
+
+def parse_bilingual_text(file_path, start_from=1):
+    """
+    Returns title, author and a lazy iterator of (position, source, translation).
+    Segments are located through the structure index and read from start_from
+    on, so -start and -canto skip the earlier text without parsing it.
+    """
+    index = structure_index.load_index(file_path)
+    return index.title, index.author, iter_segments(file_path, index, start_from)
+
+def iter_segments(file_path, index, start_from=1):
+    """Sentence-aligned sections (translate_epub --align_sentences) yield one item per pair, all at the same position."""
+    for i, chunk in structure_index.iter_segment_text(file_path, index, start_from):
+        pairs = sentence_align.parse_pairs(chunk)
+        if pairs:
+            for s, e in pairs:
+                yield i, s, e
+            continue
         soup = BeautifulSoup(chunk, 'html.parser')
         orig = soup.find('div', class_='original-text')
         tran = soup.find('div', class_='translation-content')
         if orig:
             s = re.sub(r'### SECTION \d+ ORIGINAL', '', orig.get_text()).strip()
             e = re.sub(r'<[^>]+>', '', tran.get_text()).strip() if tran else ""
-            segments.append((s, e))
-    return title, author, segments
+            yield i, s, e
 
-async def main(file_path, start_from=1, speed=1.0, lang="french", summary_file=None, num_cantos=0):
-    title, author, segments = parse_bilingual_text(file_path)
-    canto_map = parse_summaries(summary_file)
+async def main(file_path, start_from=1, speed=1.0, lang="french", summary_file=None, num_cantos=0, canto=None):
+    with metrics.stage("index"):
+        if canto:
+            index = structure_index.load_index(file_path)
+            found = index.canto(canto)
+            if not found:
+                print(f"[!] {canto} not found; the bilingual file needs canto headers (augment_bilingual_text.py).")
+                return
+            start_from = index.segment_for_section(found["start"]) or start_from
+        title, author, segments = parse_bilingual_text(file_path, start_from)
+        canto_map = parse_summaries(summary_file)
     voice_code = VOICE_MAP.get(lang.lower(), "fr-FR-HenriNeural")
+    book = os.path.basename(file_path).replace("_Bilingual", "").rsplit(".", 1)[0]
     
     combined_audio = AudioSegment.empty()
     current_canto_segments = []
@@ -108,16 +154,13 @@ async def main(file_path, start_from=1, speed=1.0, lang="french", summary_file=N
 
     # Initialize this before the loop
     cantos_processed = 0
+    previous = None
 
-    for i, (src, en) in enumerate(segments, start=1):
-        if i < start_from: continue
-        
+    for i, src, en in metrics.timed_iter(segments, "parse"):
         # Trigger split if this section starts a new Canto [cite: 558, 565]
-        if i in canto_map:
+        if i in canto_map and i != previous:
             if current_canto_segments:
-                fname = f"{current_canto_info['name'].replace(' ', '_')}_speed_{speed}.mp3"
-                combined_audio.export(fname, format="mp3")
-                generate_html_player(current_canto_info['name'], current_canto_info['summary'], current_canto_segments, fname)
+                save_canto(current_canto_info, combined_audio, current_canto_segments, speed, book)
                 combined_audio = AudioSegment.empty()
                 current_canto_segments = []
                 cantos_processed += 1
@@ -126,23 +169,24 @@ async def main(file_path, start_from=1, speed=1.0, lang="french", summary_file=N
                     return
             current_canto_info = canto_map[i]
             print(f"[*] Starting {current_canto_info['name']}")
+        previous = i
 
         src_tmp, en_tmp = f"tmp_s_{i}.mp3", f"tmp_e_{i}.mp3"
         if await generate_speech(src, voice_code, src_tmp, speed=speed):
-            combined_audio += AudioSegment.from_mp3(src_tmp) + silence
+            with metrics.stage("decode"):
+                combined_audio += AudioSegment.from_mp3(src_tmp) + silence
             if en and await generate_speech(en, VOICE_EN, en_tmp):
-                combined_audio += AudioSegment.from_mp3(en_tmp) + (silence * 2)
+                with metrics.stage("decode"):
+                    combined_audio += AudioSegment.from_mp3(en_tmp) + (silence * 2)
                 os.remove(en_tmp)
             os.remove(src_tmp)
             current_canto_segments.append((src, en))
             print(f"Processed Segment {i}")
 
     if current_canto_segments:
-        fname = f"{current_canto_info['name'].replace(' ', '_')}_speed_{speed}.mp3"
-        combined_audio.export(fname, format="mp3")
-        generate_html_player(current_canto_info['name'], current_canto_info['summary'], current_canto_segments, fname)
+        save_canto(current_canto_info, combined_audio, current_canto_segments, speed, book)
 
-if __name__ == "__main__":
+def cli(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("input_file")
     parser.add_argument("-summary_file", "--summary_file", help="Path to summaries file")
@@ -150,8 +194,12 @@ if __name__ == "__main__":
     parser.add_argument("-speed", type=float, default=1.0)
     parser.add_argument("-lang", type=str, default="french")
     parser.add_argument("-num_cantos", type=int, default=0, help="Number of Cantos to process before exiting")
-    args = parser.parse_args()
-    asyncio.run(main(args.input_file, args.start, args.speed, args.lang, args.summary_file, args. num_cantos))
-
+    parser.add_argument("-canto", default=None, help="Start at this canto, e.g. 'Paradiso • Canto XXXIII' (overrides -start)")
+    parser.add_argument("-metrics", "--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+    args = parser.parse_args(argv)
+    with metrics.run("build_audio", args.metrics):
+        asyncio.run(main(args.input_file, args.start, args.speed, args.lang, args.summary_file, args.num_cantos, args.canto))
 
 
+if __name__ == "__main__":
+    cli()
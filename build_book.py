@@ -0,0 +1,295 @@
+import os, sys, json, hashlib, argparse, threading, subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- CONFIGURATION ---
+STATE_SUFFIX = ".build_state.json"
+PROGRESS_FILE = "translation_progress.json"  # Inside translate_epub's <book>.state/ directory
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+EXAMPLE_CONFIG = """{
+  "epub": "Books/divine_comedy.epub",
+  "stages": {
+    "translate": {"break_at_p_tags": true},
+    "augment": {},
+    "cantos": {"start_canto": "Inferno * Canto I", "end_canto": "Paradiso * Canto XXXIII"},
+    "rehabilitate": {},
+    "epub": {"output": "Books/divine_comedy_Bilingual.epub"},
+    "audio": {"speed": 0.75, "lang": "italian", "start": 10}
+  }
+}"""
+
+
+class Stage:
+    """
+    One step of the book workflow. inputs/outputs/argv are functions of the
+    book config so that every path is derived in one place.
+      script: the pipeline script the stage runs
+      deps: stages that must finish first
+      clean: remove outputs before a rebuild (for scripts that append)
+    """
+    def __init__(self, name, script, deps, inputs, outputs, argv, clean=False):
+        self.name = name
+        self.script = script
+        self.deps = deps
+        self.inputs = inputs
+        self.outputs = outputs
+        self.argv = argv
+        self.clean = clean
+
+
+def paths(cfg):
+    """Every file the workflow reads or writes, derived from the book config."""
+    epub_path = cfg["epub"]
+    stages = cfg["stages"]
+    bilingual = epub_path.replace(".epub", "_Bilingual.txt")
+    augmented = stages.get("augment", {}).get("output", bilingual.replace(".txt", "_aug.txt"))
+    base = os.path.splitext(epub_path)[0]
+    canto_summaries = stages.get("cantos", {}).get("output", f"{base}_all_summaries.txt")
+    return {
+        "epub": epub_path,
+        "bilingual": bilingual,
+        "augmented": augmented,
+        # Later stages read the augmented text whenever the augment stage is configured
+        "text": augmented if "augment" in stages else bilingual,
+        "chapter_summaries": stages.get("chapters", {}).get("output", f"{base}_Bilingual.out.txt"),
+        "canto_summaries": canto_summaries,
+        "rehabilitated": canto_summaries.replace(".txt", "_rehabilitated.txt"),
+        "out_epub": stages.get("epub", {}).get("output", f"{base}_Bilingual_Book.epub"),
+        "chapter_mp3": stages.get("chapter_audio", {}).get("output", f"{base}_all.mp3"),
+        "site": stages.get("site", {}).get("output_folder", f"{base}_site"),
+    }
+
+def flag_args(params, mapping):
+    """Turns stage params into CLI flags: mapping is {param: flag}; True booleans become bare flags."""
+    argv = []
+    for key, flag in mapping.items():
+        value = params.get(key)
+        if value is True:
+            argv.append(flag)
+        elif value not in (None, False):
+            argv += [flag, str(value)]
+    return argv
+
+def summary_for_epub(cfg, p):
+    """build_epub reads chapter summaries for prose books and canto summaries for verse."""
+    if "chapters" in cfg["stages"]:
+        return p["chapter_summaries"]
+    return p["rehabilitated"] if "rehabilitate" in cfg["stages"] else p["canto_summaries"]
+
+STAGES = [
+    Stage("translate", "translate_epub.py", [],
+          lambda c, p: [p["epub"]], lambda c, p: [p["bilingual"]],
+          lambda c, p, s: ["--input", p["epub"]] + flag_args(s, {"chapter_limit": "--chapter_limit", "min_sect_length": "--min_sect_length",
+                                                                "break_at_p_tags": "--break_at_p_tags", "chapter_tags": "--chapter_tags"})),
+    Stage("augment", "augment_bilingual_text.py", ["translate"],
+          lambda c, p: [p["epub"], p["bilingual"]], lambda c, p: [p["augmented"]],
+          lambda c, p, s: ["--epub", p["epub"], "--input", p["bilingual"], "--output", p["augmented"]]),
+    Stage("chapters", "extract_chapters.py", ["translate", "augment"],
+          lambda c, p: [p["text"]], lambda c, p: [p["chapter_summaries"]],
+          lambda c, p, s: ["-i", p["text"], "-o", p["chapter_summaries"]] + flag_args(s, {"extract_analysis": "--extract-analysis",
+                                                                                         "workers": "--workers", "rpm": "--rpm",
+                                                                                         "from_sections": "--from-sections"})),
+    Stage("cantos", "extract_cantos.py", ["translate", "augment"],
+          lambda c, p: [p["text"]], lambda c, p: [p["canto_summaries"]],
+          lambda c, p, s: ["-input", p["text"], "-start_canto", s["start_canto"], "-end_canto", s["end_canto"],
+                           "-summary_file", p["canto_summaries"]] + flag_args(s, {"workers": "-workers", "rpm": "-rpm"}),
+          clean=True),
+    Stage("rehabilitate", "rehabilitate_summaries.py", ["cantos"],
+          lambda c, p: [p["text"], p["canto_summaries"]], lambda c, p: [p["rehabilitated"]],
+          lambda c, p, s: ["--bilingual", p["text"], "--summary", p["canto_summaries"]]),
+    Stage("epub", "build_epub.py", ["translate", "augment", "chapters", "rehabilitate"],
+          lambda c, p: [p["text"], summary_for_epub(c, p)], lambda c, p: [p["out_epub"]],
+          lambda c, p, s: ["-i", p["text"], "-s", summary_for_epub(c, p), "-o", p["out_epub"]]),
+    Stage("audio", "build_audio.py", ["translate", "augment", "rehabilitate", "cantos"],
+          lambda c, p: [p["text"]] + ([p["rehabilitated"]] if "rehabilitate" in c["stages"] else
+                                      [p["canto_summaries"]] if "cantos" in c["stages"] else []),
+          lambda c, p: [],
+          lambda c, p, s: [p["text"]] + (["-summary_file", p["rehabilitated"] if "rehabilitate" in c["stages"] else p["canto_summaries"]]
+                                         if "cantos" in c["stages"] else [])
+                          + flag_args(s, {"start": "-start", "speed": "-speed", "lang": "-lang", "num_cantos": "-num_cantos"})),
+    Stage("chapter_audio", "build_chapter_audio.py", ["translate", "augment"],
+          lambda c, p: [p["text"]], lambda c, p: [p["chapter_mp3"]],
+          lambda c, p, s: ["-i", p["text"], "-o", p["chapter_mp3"]] + flag_args(s, {"num_chapters": "-n"})),
+    Stage("site", "epub_to_htmlz.py", ["epub"],
+          lambda c, p: [p["out_epub"]], lambda c, p: [],
+          lambda c, p, s: ["-i", p["out_epub"], "-o", p["site"]] + flag_args(s, {"css": "--css", "incremental": "--incremental",
+                                                                               "search_index": "--search_index",
+                                                                               "responsive_images": "--responsive_images"})),
+]
+
+
+def file_hash(path, h):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+def stage_fingerprint(stage, cfg, p, params):
+    """Content hash over the stage's input files, its parameters and the script itself."""
+    h = hashlib.sha256()
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    h.update(json.dumps(stage.argv(cfg, p, params)).encode("utf-8"))
+    for path in stage.inputs(cfg, p) + [os.path.join(HERE, stage.script)]:
+        h.update(path.encode("utf-8"))
+        if os.path.exists(path):
+            file_hash(path, h)
+        else:
+            h.update(b"<missing>")
+    return h.hexdigest()
+
+
+class BookBuild:
+    """Plans and runs the configured stages of one book as a DAG with up-to-date checks."""
+    def __init__(self, config_path, jobs=2):
+        with open(config_path, "r", encoding="utf-8") as f:
+            self.cfg = json.load(f)
+        self.root = os.path.dirname(os.path.abspath(config_path))
+        self.base = os.path.splitext(os.path.abspath(config_path))[0]
+        self.state_path = self.base + STATE_SUFFIX
+        self.state = {}
+        self.state_lock = threading.Lock()  # Stages run in pool threads and all record into one file
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        self.jobs = jobs
+        configured = self.cfg["stages"]
+        self.stages = {s.name: s for s in STAGES if s.name in configured}
+        unknown = set(configured) - {s.name for s in STAGES}
+        if unknown:
+            raise SystemExit(f"[!] Unknown stage(s) in config: {', '.join(sorted(unknown))}")
+
+    def deps(self, stage):
+        return [d for d in stage.deps if d in self.stages]
+
+    def order(self):
+        """Stages in dependency order (STAGES is already topologically sorted)."""
+        return [s for s in STAGES if s.name in self.stages]
+
+    def status(self, stage, p):
+        """Returns a reason string if the stage must run, else None."""
+        params = self.cfg["stages"][stage.name]
+        with self.state_lock:
+            recorded = dict(self.state.get(stage.name, {}))
+        missing = [o for o in stage.outputs(self.cfg, p) if not os.path.exists(o)]
+        if not recorded.get("done"):
+            return "never built"
+        if missing:
+            return f"missing {', '.join(missing)}"
+        if recorded["done"] != stage_fingerprint(stage, self.cfg, p, params):
+            return "inputs, parameters or script changed"
+        return None
+
+    def record(self, name, key, fingerprint):
+        """Sets one stage's 'started' or 'done' fingerprint and saves the state file."""
+        with self.state_lock:
+            self.state.setdefault(name, {})[key] = fingerprint
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.state_path)
+
+    def run_stage(self, stage, p):
+        params = self.cfg["stages"][stage.name]
+        fingerprint = stage_fingerprint(stage, self.cfg, p, params)
+        if stage.clean:
+            for path in stage.outputs(self.cfg, p):
+                if os.path.exists(path):
+                    os.remove(path)
+        with self.state_lock:
+            started = self.state.get(stage.name, {}).get("started")
+        if stage.name == "translate" and started != fingerprint:
+            # Progress from a run over different inputs must not be resumed
+            progress = os.path.join(os.path.splitext(p["epub"])[0] + ".state", PROGRESS_FILE)
+            if os.path.exists(progress):
+                os.remove(progress)
+        self.record(stage.name, "started", fingerprint)
+
+        cmd = [sys.executable, os.path.join(HERE, stage.script)] + stage.argv(self.cfg, p, params)
+        print(f"[*] {stage.name}: {' '.join(cmd[1:])}")
+        log_path = f"{self.base}.{stage.name}.log"
+        with open(log_path, "w", encoding="utf-8") as log:
+            result = subprocess.run(cmd, cwd=self.root, stdout=log, stderr=subprocess.STDOUT)
+        if result.returncode != 0:
+            raise RuntimeError(f"{stage.name} exited with {result.returncode}; see {log_path}")
+        # Record the fingerprint the stage was built from, taken before it ran
+        self.record(stage.name, "done", fingerprint)
+        print(f"[*] {stage.name}: done")
+
+    def plan(self):
+        """Prints what would rebuild without running anything."""
+        os.chdir(self.root)
+        p = paths(self.cfg)
+        rebuilding = set()
+        for stage in self.order():
+            reason = self.status(stage, p)
+            upstream = [d for d in self.deps(stage) if d in rebuilding]
+            if reason or upstream:
+                rebuilding.add(stage.name)
+                why = reason or f"after {', '.join(upstream)}"
+                print(f"  REBUILD  {stage.name:<14} ({why})")
+            else:
+                print(f"  ok       {stage.name}")
+        return rebuilding
+
+    def build(self, force=()):
+        os.chdir(self.root)
+        p = paths(self.cfg)
+        remaining = {s.name: s for s in self.order()}
+        finished, failed = set(), set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as pool:
+            while remaining or running:
+                for name, stage in list(remaining.items()):
+                    deps = self.deps(stage)
+                    if any(d in failed for d in deps):
+                        print(f"[!] {name}: skipped because a dependency failed")
+                        failed.add(name)
+                        del remaining[name]
+                    elif all(d in finished for d in deps):
+                        del remaining[name]
+                        # Inputs are hashed only now, after the dependencies have produced them
+                        reason = "forced" if name in force else self.status(stage, p)
+                        if reason:
+                            print(f"[*] {name}: rebuilding ({reason})")
+                            running[pool.submit(self.run_stage, stage, p)] = name
+                        else:
+                            print(f"[ ] {name}: up to date")
+                            finished.add(name)
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        finished.add(name)
+                    except Exception as e:
+                        print(f"[!] {e}")
+                        failed.add(name)
+
+        if failed:
+            print(f"[!] Build failed: {', '.join(sorted(failed))}")
+            return False
+        print("[SUCCESS] Book is up to date.")
+        return True
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild only the out-of-date stages of a book's workflow.",
+                                     epilog=f"Example config:\n{EXAMPLE_CONFIG}", formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("config", help="Per-book JSON config")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would rebuild and exit")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Independent stages run in parallel")
+    parser.add_argument("--force", default="", help="Comma-separated stages to rebuild regardless of state")
+    args = parser.parse_args(argv)
+
+    build = BookBuild(args.config, args.jobs)
+    if args.dry_run:
+        build.plan()
+    else:
+        ok = build.build({s.strip() for s in args.force.split(",") if s.strip()})
+        raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    cli()
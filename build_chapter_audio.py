@@ -1,11 +1,26 @@
+import worker_daemon
+worker_daemon.delegate(__name__, __file__)  # Run in the warm worker daemon if one is up
 import os, sys, re, asyncio, argparse
-from bs4 import BeautifulSoup
-from pydub import AudioSegment
-import edge_tts
+import metrics
+import cassette
+import catalog
 
 # Configuration for the narrator
 VOICE = "en-GB-SoniaNeural"
 
+# pydub and edge-tts are imported on first synthesis, so --dry-run and --help stay fast
+AudioSegment = None
+edge_tts = None
+
+def load_audio():
+    """Imports the audio libraries once; a test or benchmark may already have set edge_tts."""
+    global AudioSegment, edge_tts
+    if AudioSegment is None:
+        from pydub import AudioSegment
+    if edge_tts is None:
+        import edge_tts as tts_module
+        edge_tts = cassette.tts_module(tts_module)
+
 def int_to_roman(n):
     """Converts an integer to a Roman numeral."""
     val = [1000, 900, 500, 400, 100, 90, 50, 40, 10, 9, 5, 4, 1]
@@ -21,12 +36,15 @@ def int_to_roman(n):
 
 async def synthesize_to_segment(text, voice=VOICE):
     """Synthesizes text to an AudioSegment."""
+    load_audio()
     temp_file = f"temp_{asyncio.current_task().get_name()}.mp3"
     # Clean text to ensure the TTS engine handles it smoothly
     clean_text = " ".join(text.split())
-    communicate = edge_tts.Communicate(clean_text, voice)
-    await communicate.save(temp_file)
-    segment = AudioSegment.from_mp3(temp_file)
+    with metrics.request("edge-tts"):
+        communicate = edge_tts.Communicate(clean_text, voice)
+        await communicate.save(temp_file)
+    with metrics.stage("decode"):
+        segment = AudioSegment.from_mp3(temp_file)
     os.remove(temp_file)
     return segment
 
@@ -40,14 +58,18 @@ async def build_audiobook(input_txt, output_mp3, num_chapters=None, dry_run=Fals
         print(f"[!] Input file not found: {input_txt}")
         return
 
-    with open(input_txt, 'r', encoding='utf-8') as f:
-        content = f.read()
+    with metrics.stage("parse"):
+        with open(input_txt, 'r', encoding='utf-8') as f:
+            content = f.read()
 
-    # Split using the divider produced by translate_epub.py
-    raw_sections = re.split(r'={40}', content)
+        # Split using the divider produced by translate_epub.py
+        raw_sections = re.split(r'={40}', content)
     
-    full_audiobook = AudioSegment.empty()
-    silence_gap = AudioSegment.silent(duration=2000) 
+    book = os.path.basename(input_txt).replace("_Bilingual", "").rsplit(".", 1)[0]
+    if not dry_run:
+        load_audio()
+        full_audiobook = AudioSegment.empty()
+        silence_gap = AudioSegment.silent(duration=2000)
     
     individual_dir = "individual_chapters"
     if not dry_run:
@@ -82,7 +104,8 @@ async def build_audiobook(input_txt, output_mp3, num_chapters=None, dry_run=Fals
                     individual_dir, 
                     js_map, 
                     cumulative_seconds, 
-                    dry_run
+                    dry_run,
+                    book
                 )
                 
                 if result:
@@ -116,14 +139,17 @@ async def build_audiobook(input_txt, output_mp3, num_chapters=None, dry_run=Fals
                 individual_dir, 
                 js_map, 
                 cumulative_seconds, 
-                dry_run
+                dry_run,
+                book
             )
             if result and not dry_run:
                 chapter_audio, _ = result
                 full_audiobook += chapter_audio + silence_gap
 
     if not dry_run:
-        full_audiobook.export(output_mp3, format="mp3")
+        with metrics.stage("encode"):
+            full_audiobook.export(output_mp3, format="mp3")
+        catalog.open_catalog(os.path.dirname(output_mp3) or ".").register(output_mp3, "audiobook", book, duration=len(full_audiobook) / 1000.0)
         print(f"\n[*] Audiobook saved to: {output_mp3}")
         
         # Print the Map for index.html
@@ -136,7 +162,7 @@ async def build_audiobook(input_txt, output_mp3, num_chapters=None, dry_run=Fals
         print("};")
         print("="*30)
 
-async def process_audio_chapter(title, text_list, out_dir, js_map, offset, dry_run):
+async def process_audio_chapter(title, text_list, out_dir, js_map, offset, dry_run, book=None):
     full_text = " ".join(text_list).strip()
     # Length filter to ignore structural fragments or empty chapters
     if not full_text or len(full_text) < 150:
@@ -155,7 +181,10 @@ async def process_audio_chapter(title, text_list, out_dir, js_map, offset, dry_r
         
         # Save individual file
         safe_name = f"Chapter_{title}.mp3"
-        chapter_audio.export(os.path.join(out_dir, safe_name), format="mp3")
+        with metrics.stage("encode"):
+            chapter_audio.export(os.path.join(out_dir, safe_name), format="mp3")
+        catalog.open_catalog(out_dir).register(os.path.join(out_dir, safe_name), "chapter_audio", book, None,
+                                               catalog.roman_to_int(title), None, len(chapter_audio) / 1000.0)
         
         # Update Map
         js_map[title] = round(offset, 2)
@@ -167,14 +196,19 @@ async def process_audio_chapter(title, text_list, out_dir, js_map, offset, dry_r
         print(f"    [!] Error synthesizing Chapter {title}: {e}")
         return None
 
-if __name__ == "__main__":
+def cli(argv=None):
     parser = argparse.ArgumentParser(description="Build audiobook from bilingual translation text.")
     parser.add_argument("-i", "--input", required=True, help="Input .txt file from translator")
     parser.add_argument("-o", "--output", required=True, help="Output master .mp3 file")
     parser.add_argument("-n", "--num_chapters", type=int, default=None, help="Limit number of chapters")
     parser.add_argument("--dry-run", action="store_true", help="Count chapters without synthesizing")
-    
-    args = parser.parse_args()
-    
-    asyncio.run(build_audiobook(args.input, args.output, args.num_chapters, args.dry_run))
-    
+    parser.add_argument("--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+
+    args = parser.parse_args(argv)
+
+    with metrics.run("build_chapter_audio", args.metrics):
+        asyncio.run(build_audiobook(args.input, args.output, args.num_chapters, args.dry_run))
+
+
+if __name__ == "__main__":
+    cli()
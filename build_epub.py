@@ -1,7 +1,11 @@
+import worker_daemon
+worker_daemon.delegate(__name__, __file__)  # Run in the warm worker daemon if one is up
 import os
 import re
 import argparse
 from ebooklib import epub
+import metrics
+import sentence_align
 
 def is_strictly_roman(text):
     """Matches standalone Roman numerals like 'VII' or 'I'."""
@@ -55,10 +59,10 @@ def create_epub(bilingual_txt, summary_txt, output_epub):
     book.set_language('en')
     book.add_author('Henry James')
 
-    chapter_metadata = extract_metadata(summary_txt)
-    
-    with open(bilingual_txt, 'r', encoding='utf-8') as f:
-        full_content = f.read()
+    with metrics.stage("parse"):
+        chapter_metadata = extract_metadata(summary_txt)
+        with open(bilingual_txt, 'r', encoding='utf-8') as f:
+            full_content = f.read()
 
     sections = re.split(r'={40,}', full_content)
     chapters = []
@@ -75,6 +79,7 @@ def create_epub(bilingual_txt, summary_txt, output_epub):
         # Strip Technical markers
         clean_section = re.sub(r'###\s+SECTION\s+\d+\s+(ORIGINAL|TRANSLATED)', '', section, flags=re.IGNORECASE)
         clean_section = re.sub(r'^\s*[#=]{3,}\s*$', '', clean_section, flags=re.MULTILINE)
+        clean_section = sentence_align.interlinear_html(clean_section)
 
         header_match = re.search(ROMAN_H2_PATTERN, clean_section, re.IGNORECASE)
         
@@ -117,6 +122,9 @@ def create_epub(bilingual_txt, summary_txt, output_epub):
         
         .original-text { color: #000; margin-bottom: 0.5em; display: block; }
         .translation-content { color: #666; font-style: italic; margin-bottom: 1.5em; display: block; border-bottom: 1px solid #eee; padding-bottom: 1em; }
+        .interlinear { border-bottom: 1px solid #eee; margin-bottom: 1.5em; }
+        .interlinear .original-text { margin-bottom: 0.1em; }
+        .interlinear .translation-content { margin-bottom: 0.8em; border-bottom: none; padding-bottom: 0; }
     '''
     nav_css = epub.EpubItem(uid="style_nav", file_name="style/nav.css", media_type="text/css", content=style)
     book.add_item(nav_css)
@@ -125,7 +133,8 @@ def create_epub(bilingual_txt, summary_txt, output_epub):
     book.add_item(epub.EpubNav())
     book.spine = ['nav'] + chapters
 
-    epub.write_epub(output_epub, book)
+    with metrics.stage("write"):
+        epub.write_epub(output_epub, book)
     print(f"[*] EPUB created successfully: {output_epub}")
 
 def save_chapter(book, chapters_list, count, html_content, metadata_list):
@@ -177,11 +186,16 @@ def save_chapter(book, chapters_list, count, html_content, metadata_list):
     book.add_item(chapter_item)
     chapters_list.append(chapter_item)
 
-if __name__ == "__main__":
+def cli(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input", required=True)
     parser.add_argument("-s", "--summary", required=True)
     parser.add_argument("-o", "--output", required=True)
-    args = parser.parse_args()
-    create_epub(args.input, args.summary, args.output)
+    parser.add_argument("--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+    args = parser.parse_args(argv)
+    with metrics.run("build_epub", args.metrics):
+        create_epub(args.input, args.summary, args.output)
 
+
+if __name__ == "__main__":
+    cli()
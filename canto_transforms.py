@@ -0,0 +1,126 @@
+import os, re, json, hashlib, inspect, argparse, importlib
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup
+
+# --- CONFIGURATION ---
+# pass name -> ("module:function", help), in the order passes run by default.
+# A pass takes the parsed page (plus its options) and edits it in place; returning False
+# means it found nothing to change.
+PASSES = {
+    "summaries": ("reformat_cantos:inject_summaries", "Canto heading and summary box before the first segment"),
+    "restyle": ("reformat_cantos_2:restyle", "Drop the segment border, black centered title"),
+    "refine": ("reformat_cantos_3:refine", "Tighter tercet spacing, trimmed <br/> in source text"),
+    "poetry": ("format_poetry:format_poetry", "Stack original over translation in bilingual rows"),
+    "line_breaks": ("add_line_breaks:break_lines", "A <br/> after every line of the original text"),
+    "pre_wrap": ("fix_line_breaks:pre_wrap", "white-space: pre-wrap for .original"),
+}
+STAMP_NAME = "ltw-transforms"
+STAMP_RE = re.compile(r'<meta\s+content="([^"]*)"\s+name="ltw-transforms"|<meta\s+name="ltw-transforms"\s+content="([^"]*)"')
+
+
+def resolve(name):
+    module_name, function = PASSES[name][0].split(":")
+    return getattr(importlib.import_module(module_name), function)
+
+def pass_fingerprint(name, options=None):
+    """Changes whenever the pass's code or its options change."""
+    blob = inspect.getsource(resolve(name)) + json.dumps(options or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:12]
+
+def canto_files(directory="."):
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".html") and "Canto" in f)
+
+def read_stamp(html):
+    """{pass name: fingerprint} recorded in the page by earlier runs."""
+    match = STAMP_RE.search(html)
+    if not match:
+        return {}
+    return dict(entry.split(":", 1) for entry in (match.group(1) or match.group(2)).split(";") if ":" in entry)
+
+def write_stamp(soup, stamp):
+    content = ";".join(f"{name}:{fp}" for name, fp in stamp.items())
+    meta = soup.find("meta", attrs={"name": STAMP_NAME})
+    if meta is None:
+        meta = soup.new_tag("meta", attrs={"name": STAMP_NAME, "content": content})
+        (soup.head or soup).insert(0, meta)
+    else:
+        meta["content"] = content
+
+def transform_file(path, names, options, fingerprints):
+    """
+    Applies the passes this page has not had yet, with one parse and one
+    serialization. Returns (path, passes that changed it).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    stamp = read_stamp(html)
+    todo = [name for name in names if stamp.get(name) != fingerprints[name]]
+    if not todo:
+        return path, None
+    soup = BeautifulSoup(html, "html.parser")
+    changed = [name for name in todo if resolve(name)(soup, **options.get(name, {})) is not False]
+    if not changed:
+        return path, []
+    for name in todo:
+        stamp[name] = fingerprints[name]
+    write_stamp(soup, stamp)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(soup.prettify())
+    os.replace(tmp, path)
+    return path, changed
+
+def transform_files(paths, names, options=None, workers=None):
+    """Runs the named passes over the pages, in a process pool when there are several."""
+    options = options or {}
+    unknown = [name for name in names if name not in PASSES]
+    if unknown:
+        raise ValueError(f"Unknown pass: {', '.join(unknown)}; choose from {', '.join(PASSES)}")
+    fingerprints = {name: pass_fingerprint(name, options.get(name)) for name in names}
+    jobs = [(path, names, options, fingerprints) for path in paths]
+    if workers == 1 or len(jobs) < 2:
+        results = [transform_file(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(transform_file, *zip(*jobs)))
+
+    for path, changed in results:
+        if changed is None:
+            print(f"[ ] Up to date: {path}")
+        elif changed:
+            print(f"[*] {', '.join(changed)}: {path}")
+        else:
+            print(f"[ ] Nothing to change: {path}")
+    done = sum(1 for _, changed in results if changed)
+    print(f"[*] {done} of {len(results)} files updated.")
+    return results
+
+def run_passes(names, directory=".", options=None, workers=None):
+    return transform_files(canto_files(directory), names, options, workers)
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Apply the Canto HTML post-processing passes with one parse per file.",
+                                     epilog="Passes: " + "; ".join(f"{n} ({h})" for n, (_, h) in PASSES.items()))
+    parser.add_argument("--dir", default=".", help="Folder holding the *Canto*.html files")
+    parser.add_argument("--passes", default=None,
+                        help="Comma-separated passes, in order (default: all; summaries only with --canto_data)")
+    parser.add_argument("--canto_data", default=None, help="Rehabilitated summary file for the summaries pass")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    if args.passes:
+        names = [n.strip() for n in args.passes.split(",") if n.strip()]
+    else:
+        names = [n for n in PASSES if n != "summaries" or args.canto_data]
+    options = {}
+    if "summaries" in names:
+        if not args.canto_data:
+            parser.error("the summaries pass needs --canto_data")
+        from reformat_cantos import extract_summaries
+        options["summaries"] = {"summaries": extract_summaries(args.canto_data)}
+    run_passes(names, args.dir, options, args.workers)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,244 @@
+import os, sys, json, time, zlib, asyncio, hashlib, sqlite3, argparse, threading
+from types import SimpleNamespace
+
+# --- CONFIGURATION ---
+# LTW_CASSETTE=path/to/book.cassette turns the layer on for every script that builds its
+# clients through this module. LTW_CASSETTE_MODE picks record, replay or auto (replay
+# what is stored, record the rest). LTW_CASSETTE_LATENCY scales the recorded latency
+# on replay: 0 serves at full speed, 1 reproduces the original timing.
+ENV_PATH = "LTW_CASSETTE"
+ENV_MODE = "LTW_CASSETTE_MODE"
+ENV_LATENCY = "LTW_CASSETTE_LATENCY"
+MODES = ("record", "replay", "auto")
+
+
+class CassetteMiss(KeyError):
+    """Raised on replay when a request was never recorded."""
+
+
+class Cassette:
+    """
+    Compact record/replay store: one SQLite file, one row per request hash,
+    payloads zlib-compressed. Safe to share between threads.
+    """
+    def __init__(self, path, mode="auto", latency_scale=0.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; use one of {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, kind TEXT, payload BLOB, "
+                        "latency REAL, created REAL)")
+        self.db.commit()
+        self.hits = self.misses = self.recorded = 0
+
+    @staticmethod
+    def key(kind, request):
+        blob = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{kind}\n{blob}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns (payload bytes, latency) or None."""
+        if self.mode == "record":
+            return None
+        with self.lock:
+            row = self.db.execute("SELECT payload, latency FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.hits += 1
+                return zlib.decompress(row[0]), row[1]
+            self.misses += 1
+        if self.mode == "replay":
+            raise CassetteMiss(key)
+        return None
+
+    def put(self, key, kind, payload, latency):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                            (key, kind, zlib.compress(payload, 9), latency, time.time()))
+            self.db.commit()
+            self.recorded += 1
+
+    def delay(self, latency):
+        return latency * self.latency_scale if latency else 0.0
+
+
+def from_env():
+    """The cassette configured by the environment, or None when recording/replay is off."""
+    path = os.environ.get(ENV_PATH)
+    if not path:
+        return None
+    global _cassette
+    if _cassette is None or _cassette.path != path:
+        _cassette = Cassette(path, os.environ.get(ENV_MODE, "auto"), float(os.environ.get(ENV_LATENCY, "0")))
+        print(f"[*] Cassette {path} ({_cassette.mode})", file=sys.stderr)
+    return _cassette
+
+_cassette = None
+
+
+# --- Gemini ---
+def dump_config(config):
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        return config.model_dump(exclude_none=True, mode="json")
+    return dict(config)
+
+def usage_dict(response):
+    meta = getattr(response, "usage_metadata", None)
+    fields = ("prompt_token_count", "candidates_token_count", "cached_content_token_count", "thoughts_token_count")
+    return {f: getattr(meta, f, None) for f in fields} if meta is not None else None
+
+def replayed_response(payload):
+    data = json.loads(payload)
+    usage = SimpleNamespace(**data["usage"]) if data.get("usage") else None
+    return SimpleNamespace(text=data["text"], usage_metadata=usage)
+
+class CassetteModels:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        owner, cassette = self.owner, self.owner.cassette
+        key = cassette.key("gemini", {"model": model, "contents": contents, "config": dump_config(config)})
+        hit = cassette.get(key)
+        if hit:
+            payload, latency = hit
+            time.sleep(cassette.delay(latency))
+            return replayed_response(payload)
+        cached = getattr(config, "cached_content", None)
+        if cached in owner.pending:
+            config = config.model_copy(update={"cached_content": owner.real_cache(cached)})
+        started = time.monotonic()
+        response = owner.real().models.generate_content(model=model, contents=contents, config=config)
+        latency = time.monotonic() - started
+        cassette.put(key, "gemini", json.dumps({"text": response.text, "usage": usage_dict(response)}).encode("utf-8"), latency)
+        return response
+
+class CassetteCaches:
+    """
+    Context caches are created lazily: callers get a name derived from the
+    cached contents (stable across runs, so it can be part of request keys),
+    and a real cache is only created when a request using it misses.
+    """
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model, config=None):
+        name = "cassette/" + self.owner.cassette.key("cache", {"model": model, "config": dump_config(config)})[:32]
+        self.owner.pending[name] = (model, config)
+        return SimpleNamespace(name=name)
+
+    def delete(self, name):
+        self.owner.pending.pop(name, None)
+        real_name = self.owner.created.pop(name, None)
+        if real_name:
+            self.owner.real().caches.delete(name=real_name)
+
+class CassetteClient:
+    """
+    genai.Client look-alike that answers from the cassette and records misses.
+    The real client is only built when a request has to go to the network.
+    """
+    def __init__(self, cassette, factory):
+        self.cassette = cassette
+        self.factory = factory
+        self.client = None
+        self.lock = threading.Lock()
+        self.pending = {}    # stable cache name -> (model, config)
+        self.created = {}    # stable cache name -> real cache name
+        self.models = CassetteModels(self)
+        self.caches = CassetteCaches(self)
+
+    def real(self):
+        with self.lock:
+            if self.client is None:
+                self.client = self.factory()
+            return self.client
+
+    def real_cache(self, name):
+        if name not in self.created:
+            model, config = self.pending[name]
+            self.created[name] = self.real().caches.create(model=model, config=config).name
+        return self.created[name]
+
+def gemini_client(factory):
+    """Returns factory() normally, or a cassette-backed client when LTW_CASSETTE is set."""
+    cassette = from_env()
+    return CassetteClient(cassette, factory) if cassette else factory()
+
+class LazyClient:
+    """
+    Stands in for a client and builds it on first use, so a module that keeps
+    one at import time can still be imported (for --help or a plan) without
+    GEMINI_API_KEY.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self.client = None
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self.lock:
+            if self.client is None:
+                self.client = self.factory()
+        return getattr(self.client, name)
+
+def lazy_gemini_client(factory):
+    """gemini_client(factory), built when first used."""
+    return LazyClient(lambda: gemini_client(factory))
+
+
+# --- edge-tts ---
+class CassetteTTS:
+    """edge_tts look-alike whose Communicate.save() replays recorded audio or records it."""
+    def __init__(self, cassette, module):
+        self.cassette = cassette
+        self.module = module
+        self.exceptions = getattr(module, "exceptions", None)
+        outer = self
+
+        class Communicate:
+            def __init__(self, text, voice=None, **kwargs):
+                self.args = (text, voice)
+                self.kwargs = kwargs
+
+            async def save(self, path):
+                cassette = outer.cassette
+                key = cassette.key("tts", {"text": self.args[0], "voice": self.args[1], **self.kwargs})
+                hit = cassette.get(key)
+                if hit:
+                    payload, latency = hit
+                    await asyncio.sleep(cassette.delay(latency))
+                    with open(path, "wb") as f:
+                        f.write(payload)
+                    return
+                started = time.monotonic()
+                await outer.module.Communicate(*self.args, **self.kwargs).save(path)
+                latency = time.monotonic() - started
+                with open(path, "rb") as f:
+                    cassette.put(key, "tts", f.read(), latency)
+
+        self.Communicate = Communicate
+
+def tts_module(module):
+    """Returns the edge_tts module normally, or a cassette-backed stand-in when LTW_CASSETTE is set."""
+    cassette = from_env()
+    return CassetteTTS(cassette, module) if cassette else module
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a request cassette.")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+    db = sqlite3.connect(args.path)
+    print(f"{'KIND':<8}{'ENTRIES':>9}{'STORED MB':>11}{'RECORDED s':>12}")
+    for kind, count, size, latency in db.execute("SELECT kind, COUNT(*), SUM(LENGTH(payload)), SUM(latency) FROM entries GROUP BY kind"):
+        print(f"{kind:<8}{count:>9}{size / 2**20:>11.2f}{latency:>12.1f}")
+
+
+if __name__ == "__main__":
+    cli()
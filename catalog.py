@@ -0,0 +1,172 @@
+import os, re, time, hashlib, sqlite3, argparse, threading
+from urllib.parse import quote
+
+# --- CONFIGURATION ---
+# Builders register what they write in <output folder>/ltw_catalog.db, or in the file
+# named by LTW_CATALOG. Index pages and listings query it instead of scanning folders.
+ENV_PATH = "LTW_CATALOG"
+DEFAULT_NAME = "ltw_catalog.db"
+PART_ORDER = {"Inferno": 1, "Purgatorio": 2, "Paradiso": 3}
+CANTO_NAME_RE = re.compile(r"(Inferno|Purgatorio|Paradiso)\s*[•*_]+\s*Canto[\s_]+([IVXLCDM]+)", re.IGNORECASE)
+SPEED_RE = re.compile(r"_speed_([\d.]+?)\.(?:mp3|html?)$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path TEXT PRIMARY KEY,   -- relative to the catalog's folder
+    kind TEXT,               -- canto_audio, canto_page, chapter_audio, audiobook
+    book TEXT,
+    part TEXT,               -- canticle for cantos
+    part_order INTEGER,
+    number INTEGER,          -- canto or chapter number
+    speed REAL,
+    duration REAL,           -- seconds
+    size INTEGER,
+    sha256 TEXT,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS artifacts_order ON artifacts (kind, book, part_order, number, speed);
+"""
+
+
+def roman_to_int(roman):
+    """Converts a Roman numeral string to an integer."""
+    values = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+    total = 0
+    prev_value = 0
+    for char in reversed(roman.upper()):
+        curr_value = values.get(char, 0)
+        if curr_value >= prev_value:
+            total += curr_value
+        else:
+            total -= curr_value
+        prev_value = curr_value
+    return total
+
+def int_to_roman(n):
+    if not isinstance(n, int) or n < 1:
+        raise ValueError(f"no Roman numeral for {n!r}")
+    val = [1000, 900, 500, 400, 100, 90, 50, 40, 10, 9, 5, 4, 1]
+    syb = ["M", "CM", "D", "CD", "C", "XC", "L", "XL", "X", "IX", "V", "IV", "I"]
+    roman_num = ""
+    for v, s in zip(val, syb):
+        count, n = divmod(n, v)
+        roman_num += s * count
+    return roman_num
+
+def parse_canto_name(name):
+    """'Inferno • Canto XXXIII', 'Inferno * Canto XXXIII' or 'Inferno_*_Canto_XXXIII' -> ('Inferno', 33)."""
+    match = CANTO_NAME_RE.search(name)
+    if not match:
+        return None, None
+    return match.group(1).capitalize(), roman_to_int(match.group(2))
+
+
+class Catalog:
+    """
+    One SQLite file listing generated artifacts. Safe to share between threads.
+    Read-only catalogs never create the file; a missing one reads as empty.
+    """
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.lock = threading.Lock()
+        if read_only and os.path.exists(path):
+            self.db = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True,
+                                      check_same_thread=False)
+            return
+        self.db = sqlite3.connect(":memory:" if read_only else path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def register(self, path, kind, book=None, part=None, number=None, speed=None, duration=None):
+        """Records (or refreshes) one written file with its size and content hash."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        row = (rel, kind, book, part, PART_ORDER.get(part, 0), number, speed, duration,
+               os.path.getsize(path), digest.hexdigest(), time.time())
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self.db.commit()
+
+    def listing(self, kind=None, book=None, speed=None, numbered=False):
+        """
+        Rows in reading order: canticle, then canto or chapter number, then speed.
+        numbered leaves out rows without a number (intro pages registered by older runs).
+        """
+        where, params = [], []
+        for column, value in (("kind", kind), ("book", book), ("speed", speed)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if numbered:
+            where.append("number IS NOT NULL")
+        sql = "SELECT * FROM artifacts" + (" WHERE " + " AND ".join(where) if where else "")
+        sql += " ORDER BY book, part_order, number, speed, path"
+        with self.lock:
+            cursor = self.db.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def prune(self):
+        """Drops rows whose files no longer exist. Returns how many."""
+        with self.lock:
+            paths = [row[0] for row in self.db.execute("SELECT path FROM artifacts")]
+            gone = [p for p in paths if not os.path.exists(os.path.join(self.root, p))]
+            self.db.executemany("DELETE FROM artifacts WHERE path = ?", [(p,) for p in gone])
+            self.db.commit()
+        return len(gone)
+
+    def scan(self, directory, book=None):
+        """Registers canto pages and audio already on disk (written before the catalog existed)."""
+        added = 0
+        for name in sorted(os.listdir(directory)):
+            kind = {".mp3": "canto_audio", ".html": "canto_page", ".htm": "canto_page"}.get(os.path.splitext(name)[1])
+            part, number = parse_canto_name(name)
+            if kind and number:
+                speed = SPEED_RE.search(name)
+                self.register(os.path.join(directory, name), kind, book, part, number,
+                              float(speed.group(1)) if speed else None)
+                added += 1
+        return added
+
+
+def open_catalog(directory=".", read_only=False):
+    """
+    The catalog for outputs written to `directory` (LTW_CATALOG overrides the
+    location). Queries pass read_only, so they never leave a new file behind.
+    """
+    path = os.environ.get(ENV_PATH) or os.path.join(directory, DEFAULT_NAME)
+    if read_only:
+        return Catalog(path, read_only=True)
+    global _catalog
+    if _catalog is None or _catalog.path != path:
+        _catalog = Catalog(path)
+    return _catalog
+
+_catalog = None
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Query or maintain the generated-artifact catalog.")
+    parser.add_argument("action", choices=["list", "scan", "prune"])
+    parser.add_argument("--dir", default=".", help="Folder holding the catalog and the artifacts")
+    parser.add_argument("--kind", default=None, help="canto_audio, canto_page, chapter_audio or audiobook")
+    parser.add_argument("--book", default=None)
+    args = parser.parse_args(argv)
+    catalog = open_catalog(args.dir, read_only=args.action == "list")
+    if args.action == "scan":
+        print(f"[*] Registered {catalog.scan(args.dir, args.book)} files in {catalog.path}")
+    elif args.action == "prune":
+        print(f"[*] Removed {catalog.prune()} missing files from {catalog.path}")
+    else:
+        for row in catalog.listing(args.kind, args.book):
+            duration = f"{row['duration']:.0f}s" if row["duration"] else "-"
+            print(f"{row['kind']:<14}{row['part'] or '':<12}{row['number'] or '':>4}  {row['speed'] or '':<5}"
+                  f"{duration:>7}{row['size'] / 2**20:>8.2f} MB  {row['path']}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,14 +1,117 @@
+import worker_daemon
+worker_daemon.delegate(__name__, __file__)  # Run in the warm worker daemon if one is up
 import argparse
+import gzip
+import hashlib
+import json
 import os
 import shutil
 import ebooklib
 from ebooklib import epub
 from bs4 import BeautifulSoup
 import re
+from site_search_index import SearchIndexBuilder
+from site_images import ImagePipeline, VARIANT_WIDTHS
 
 # Default CSS path based on your setup
 DEFAULT_CSS_PATH = '/Users/edgargilchrist/tools/BookTranslator/Books/WingsOfDove/wings/wings_one/test_style.css'
 
+# Incremental mode bookkeeping. Bump RENDER_VERSION whenever the page templates
+# below change so that every chapter is re-rendered on the next run.
+SITE_MANIFEST = ".site_manifest.json"
+RENDER_VERSION = "1"
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".json")
+
+def fingerprint(*parts):
+    """Returns a sha256 hex digest over the given str/bytes parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode('utf-8') if isinstance(part, str) else part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class SiteWriter:
+    """
+    Writes generated site files into the output folder. In incremental mode it
+    keeps a manifest of source/output fingerprints so unchanged files are not
+    rewritten, stale files from earlier runs are removed, and changed HTML/CSS
+    gets a pre-compressed .gz sibling.
+    """
+    def __init__(self, output_folder, incremental=False):
+        self.output_folder = output_folder
+        self.incremental = incremental
+        self.manifest_path = os.path.join(output_folder, SITE_MANIFEST)
+        self.manifest = {}
+        self.seen = set()
+        self.changed = []
+        self.unchanged = []
+        self.removed = []
+        if incremental and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def is_fresh(self, rel_path, source_hash):
+        """True if rel_path was last rendered from exactly this source and is still on disk."""
+        entry = self.manifest.get(rel_path)
+        if not self.incremental or not entry or entry.get('source') != source_hash:
+            return False
+        return os.path.exists(os.path.join(self.output_folder, rel_path))
+
+    def keep(self, rel_path):
+        """Marks a fresh file as part of this run without touching it."""
+        self.seen.add(rel_path)
+        self.unchanged.append(rel_path)
+
+    def write(self, rel_path, content, source_hash=None):
+        """Writes content (str or bytes) unless the rendered output is identical. Returns True if written."""
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        output_hash = fingerprint(data)
+        full_path = os.path.join(self.output_folder, rel_path)
+        self.seen.add(rel_path)
+
+        entry = self.manifest.get(rel_path)
+        if self.incremental and entry and entry.get('output') == output_hash and os.path.exists(full_path):
+            entry['source'] = source_hash
+            self.unchanged.append(rel_path)
+            return False
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(data)
+        if self.incremental and rel_path.endswith(COMPRESSIBLE_EXTENSIONS):
+            # mtime=0 keeps the .gz byte-identical across runs for identical input
+            with open(full_path + ".gz", 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+
+        self.manifest[rel_path] = {'source': source_hash, 'output': output_hash}
+        self.changed.append(rel_path)
+        return True
+
+    def untrack(self, rel_path):
+        """Forgets a file without touching it, so finish() never removes it."""
+        self.manifest.pop(rel_path, None)
+
+    def finish(self):
+        """Removes files generated by earlier runs that were not produced this time and saves the manifest."""
+        if not self.incremental:
+            return
+        for rel_path in sorted(set(self.manifest) - self.seen):
+            for path in (os.path.join(self.output_folder, rel_path), os.path.join(self.output_folder, rel_path) + ".gz"):
+                if os.path.exists(path):
+                    os.remove(path)
+            del self.manifest[rel_path]
+            self.removed.append(rel_path)
+
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+
+        print(f"[*] Incremental build: {len(self.changed)} changed, {len(self.unchanged)} unchanged, {len(self.removed)} removed.")
+        for rel_path in self.changed:
+            print(f"    + {rel_path}")
+        for rel_path in self.removed:
+            print(f"    - {rel_path}")
+
 def clean_text_content(text):
     """Removes technical markers, artifacts, and duplicate chapter headings."""
     text = re.sub(r'###\s+SECTION\s+\d+\s+(ORIGINAL|TRANSLATED)', '', text, flags=re.IGNORECASE)
@@ -21,7 +124,15 @@ def clean_text_content(text):
     return text
 
 
-def epub_to_jekyll_htmlz(epub_path, css_path, output_folder):
+def book_language(book, default="en"):
+    """Returns the DC language code of the EPUB (e.g. 'it' from 'it-IT')."""
+    languages = book.get_metadata('DC', 'language')
+    if languages and languages[0][0]:
+        return languages[0][0].split('-')[0].lower()
+    return default
+
+def epub_to_jekyll_htmlz(epub_path, css_path, output_folder, incremental=False, search_index=False, source_lang=None,
+                         responsive_images=False, image_workers=None):
     if not os.path.exists(epub_path):
         print(f"Error: EPUB not found: {epub_path}")
         return
@@ -39,7 +150,11 @@ def epub_to_jekyll_htmlz(epub_path, css_path, output_folder):
         print(f"Error reading EPUB: {e}")
         return
 
+    writer = SiteWriter(output_folder, incremental)
+    indexer = SearchIndexBuilder(source_lang or book_language(book)) if search_index else None
+    images = ImagePipeline(book, output_folder, writer, image_workers) if responsive_images else None
     chapter_links = []
+    pages = []  # With responsive images, chapters are written once the variants are rendered
     count = 0
 
     print(f"[*] Writing chapters directly to: {output_folder}")
@@ -54,19 +169,41 @@ def epub_to_jekyll_htmlz(epub_path, css_path, output_folder):
 
         count += 1
         chapter_filename = f"Chapter_{count}.html" 
+        chapter_title = f"Chapter {count}"
+        chapter_link = f"""
+                <a href="{chapter_filename}" class="chapter-square">
+                   <span class="square-label">Chapter</span>
+                   <span class="square-number">{count}</span>
+                </a>"""
+
+        source_hash = fingerprint(RENDER_VERSION, str(count), str(search_index), str(responsive_images),
+                                  str(VARIANT_WIDTHS), item.get_content())
+        # The search index and image pipeline need to see every chapter, so fresh
+        # chapters are only skipped without them (unchanged output is still not rewritten)
+        if not (indexer or images) and writer.is_fresh(chapter_filename, source_hash):
+            writer.keep(chapter_filename)
+            chapter_links.append(chapter_link)
+            continue
+
         chapter_soup = BeautifulSoup(item.get_content(), 'html.parser')
         body_content = chapter_soup.find('body')
         
         if body_content:
             cleaned_html = clean_text_content(body_content.decode_contents())
-            chapter_title = f"Chapter {count}"
+            illustration_html = f'<img src="Illustrations/Chap_{count}_illus.png" alt="Illustration for {chapter_title}">'
+            if images:
+                embedded = images.embedded_images(item, cleaned_html)
+                illustration_html, header_image = images.header_html(count, chapter_title, embedded)
+                cleaned_html = images.rewrite_inline_images(cleaned_html, item, header_image)
+            if indexer:
+                cleaned_html = indexer.annotate_and_index(chapter_filename, chapter_title, cleaned_html)
             
             # FIXED: Header now uses a class for CSS control rather than hardcoded flex styles
             combined_header_html = f"""
 <div class="chapter-header-row">
     <h1 class="chapter-title">{chapter_title}</h1>
     <div class="chapter-illustration">
-        <img src="Illustrations/Chap_{count}_illus.png" alt="Illustration for {chapter_title}">
+        {illustration_html}
     </div>
 </div>"""
             
@@ -81,14 +218,11 @@ audio_url: "https://media.githubusercontent.com/media/egilchri/wings_one/main/Ch
 {cleaned_html}
 """
             # Write individual chapter file
-            with open(os.path.join(output_folder, chapter_filename), 'w', encoding='utf-8') as f:
-                f.write(chapter_page_content)
-            
-            chapter_links.append(f"""
-                <a href="{chapter_filename}" class="chapter-square">
-                   <span class="square-label">Chapter</span>
-                   <span class="square-number">{count}</span>
-                </a>""")
+            if images:
+                pages.append((chapter_filename, chapter_page_content, source_hash))
+            else:
+                writer.write(chapter_filename, chapter_page_content, source_hash)
+            chapter_links.append(chapter_link)
 
     # Write the Main Index
     book_title = os.path.splitext(os.path.basename(epub_path))[0].replace('_', ' ')
@@ -99,20 +233,27 @@ css: test_style.css
 viewport: "width=device-width, initial-scale=1.0"
 ---
 <h1 class="main-title">{book_title}</h1>
+{'<p class="search-link"><a href="search.html">Search this book</a></p>' if indexer else ''}
 <div class="chapter-grid">
     {" ".join(chapter_links)}
 </div>
 """
-    with open(os.path.join(output_folder, 'index.html'), 'w', encoding='utf-8') as f:
-        f.write(index_html)
+    writer.write('index.html', index_html)
 
     # Ensure the CSS file exists and has mobile-responsive rules
-    write_responsive_css(css_path, os.path.join(output_folder, 'test_style.css'))
+    writer.write('test_style.css', build_responsive_css(css_path))
+    if indexer:
+        indexer.finish(writer)
+    if images:
+        images.run()
+        for chapter_filename, chapter_page_content, source_hash in pages:
+            writer.write(chapter_filename, images.resolve(chapter_page_content), source_hash)
+    writer.finish()
     
     print(f"[SUCCESS] Processed {count} chapters into {output_folder}. Mobile-responsive meta-tags added.")
 
-def write_responsive_css(src_path, dest_path):
-    """Copies existing CSS and appends mobile-responsive rules if missing."""
+def build_responsive_css(src_path):
+    """Returns the existing CSS with mobile-responsive rules appended if missing."""
     responsive_rules = """
 /* Mobile Responsive Overrides */
 .chapter-header-row {
@@ -153,15 +294,28 @@ def write_responsive_css(src_path, dest_path):
     if ".chapter-header-row" not in content:
         content += responsive_rules
 
+    return content
+
+def write_responsive_css(src_path, dest_path):
+    """Copies existing CSS and appends mobile-responsive rules if missing."""
     with open(dest_path, 'w') as f:
-        f.write(content)
+        f.write(build_responsive_css(src_path))
 
-if __name__ == "__main__":
+def cli(argv=None):
     parser = argparse.ArgumentParser(description="Convert EPUB to Jekyll-ready HTML with responsive design.")
     parser.add_argument("-i", "--input", required=True, help="Path to the source EPUB")
     parser.add_argument("-o", "--output_folder", required=True, help="Target directory for HTML files")
     parser.add_argument("--css", default=DEFAULT_CSS_PATH, help="Path to the source test_style.css")
+    parser.add_argument("--incremental", action="store_true", help="Only rewrite changed files, remove stale ones and write .gz copies")
+    parser.add_argument("--search_index", action="store_true", help="Build a sharded client-side search index and search page")
+    parser.add_argument("--source_lang", default=None, help="Language code of the original text (default: from EPUB metadata)")
+    parser.add_argument("--responsive_images", action="store_true", help="Generate cached WebP/JPEG variants with srcset for illustrations")
+    parser.add_argument("--image_workers", type=int, default=None, help="Worker processes for image resizing (default: CPU count)")
 
-    args = parser.parse_args()
-    epub_to_jekyll_htmlz(args.input, args.css, args.output_folder)
-    
+    args = parser.parse_args(argv)
+    epub_to_jekyll_htmlz(args.input, args.css, args.output_folder, args.incremental, args.search_index, args.source_lang,
+                         args.responsive_images, args.image_workers)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,16 +1,23 @@
+import worker_daemon
+worker_daemon.delegate(__name__, __file__)  # Run in the warm worker daemon if one is up
 import re
 import argparse
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
+from map_reduce_summary import condense
+from rate_limit import RateLimiter
+import cassette
 
 # Securely fetch the API key from your environment
 api_key = os.environ.get("GEMINI_API_KEY")
 
-if not api_key:
+if not api_key and not os.environ.get(cassette.ENV_PATH):
     print("Error: GEMINI_API_KEY environment variable not set.")
     exit(1)
 
-client = genai.Client(api_key=api_key)
+client = cassette.gemini_client(lambda: genai.Client(api_key=api_key))
 
 # Using the Gemini 2.5 Pro model from your verified list
 MODEL_NAME = 'gemini-2.5-pro'
@@ -43,15 +50,29 @@ def summarize_with_gemini(text, canto_name):
     except Exception as e:
         return f"Gemini Error: {e}"
 
-def process_cantos(file_path, start_canto, end_canto):
-    """Extracts text and tracks SECTION numbers for each Canto."""
-    if not os.path.exists(file_path):
-        print(f"Error: File '{file_path}' not found.")
-        return
+def summarize_canto(data, canto_name, limiter=None):
+    """
+    Condenses the canto's section summaries (map step if needed) and makes the
+    single reduce call. Every request, map and reduce alike, waits on limiter.
+    """
+    text = condense(client, data['section_summaries'], data['section_summaries'], limiter, label=canto_name)
+    if limiter:
+        limiter.wait()
+    return summarize_with_gemini(text, canto_name)
+
+def normalize_canto_name(name):
+    """'Purgatorio • Canto XXIV' and 'Purgatorio * Canto XXIV' name the same canto."""
+    return " ".join(name.replace("•", "*").split())
+
+def collect_cantos(file_path, start_canto, end_canto):
+    """Extracts text and tracks SECTION numbers for each Canto from start_canto through end_canto."""
+    start_canto = normalize_canto_name(start_canto)
+    end_canto = normalize_canto_name(end_canto)
 
     # Regex patterns
     canto_pattern = re.compile(r'(\w+)\s*[•*]\s*(Canto\s+[IVXLCDM]+)', re.IGNORECASE)
     section_pattern = re.compile(r'### SECTION (\d+) ORIGINAL', re.IGNORECASE)
+    translation_pattern = re.compile(r"class=['\"]translation-content['\"]>")
     
     current_canto_name = None
     accumulating = False
@@ -66,71 +87,155 @@ def process_cantos(file_path, start_canto, end_canto):
         for line in f:
             clean_line = line.strip()
             
-            # 1. Track Section Markers
-            section_match = section_pattern.search(clean_line)
-            if section_match and accumulating:
-                current_sections.append(int(section_match.group(1)))
-
-            # 2. Track Canto Headings
-            canto_match = canto_pattern.search(clean_line)
-            if canto_match:
-                found_name = f"{canto_match.group(1)} * {canto_match.group(2)}"
+            # 1. Track Section Markers (cheap substring test before the regex)
+            if accumulating and "#" in clean_line:
+                section_match = section_pattern.search(clean_line)
+                if section_match:
+                    current_sections.append(int(section_match.group(1)))
+
+            # 2. Track Canto Headings; a heading always has a bullet or asterisk
+            canto_match = ("•" in clean_line or "*" in clean_line) and canto_pattern.search(clean_line)
+            found_name = canto_match and f"{canto_match.group(1)} * {canto_match.group(2)}"
+            # A heading repeated in its own translation is not a new Canto
+            if canto_match and found_name != current_canto_name:
                 
                 # Save previous Canto data
                 if current_canto_name and accumulating:
                     canto_data[current_canto_name] = {
                         'text': "\n".join(current_text),
+                        'section_summaries': current_text,
                         'sections': sorted(current_sections)
                     }
                     current_text = []
                     current_sections = []
+                    if current_canto_name == end_canto:
+                        accumulating = False
+                        break
 
                 if found_name == start_canto:
                     accumulating = True
                 current_canto_name = found_name
 
-            # 3. Accumulate Translation Content
-            if accumulating:
-                if "class='translation-content'" in clean_line or 'class="translation-content"' in clean_line:
+            # 3. Accumulate Translation Content (one entry per section summary).
+            # translate_epub writes the whole <div class='translation-content'>...</div> on one line.
+            if accumulating and (in_translation or "translation-content" in clean_line):
+                marker = translation_pattern.search(clean_line)
+                if marker:
                     in_translation = True
-                    continue
+                    clean_line = clean_line[marker.end():]
+                    current_text.append("")
                 if in_translation:
                     if "</div>" in clean_line:
                         in_translation = False
-                    else:
-                        text_only = re.sub('<[^<]+?>', '', clean_line)
-                        if text_only:
-                            current_text.append(text_only)
+                        clean_line = clean_line.split("</div>", 1)[0]
+                    text_only = " ".join(re.sub('<[^<]+?>', ' ', clean_line).split())
+                    if text_only and current_text:
+                        current_text[-1] = f"{current_text[-1]} {text_only}".strip()
 
     # Finalize the last Canto
     if current_canto_name and accumulating:
         canto_data[current_canto_name] = {
             'text': "\n".join(current_text),
+            'section_summaries': current_text,
             'sections': sorted(current_sections)
         }
 
+    return canto_data
+
+def section_range(data):
+    """Formats the '(SECTIONS a-b)' suffix that build_audio.parse_summaries keys on."""
+    sec_list = data['sections']
+    return f"(SECTIONS {sec_list[0]}-{sec_list[-1]})" if sec_list else ""
+
+def process_cantos(file_path, start_canto, end_canto, summarize=False):
+    """Prints each Canto heading with its section range (and optionally its summary)."""
+    if not os.path.exists(file_path):
+        print(f"Error: File '{file_path}' not found.")
+        return
+
     # Output with Section Ranges
-    in_range = False
-    for name, data in canto_data.items():
-        if name == start_canto: in_range = True
-        if in_range:
-            # Format the section range string
-            sec_list = data['sections']
-            sec_range = f"(SECTIONS {sec_list[0]}-{sec_list[-1]})" if sec_list else ""
-            
-            print(f"\n{'-'*70}")
-            print(f"NARRATIVE SUMMARY: {name} {sec_range}")
-            print(f"{'-'*70}")
-            
-            # print(summarize_with_gemini(data['text'], name))
-            
-            if name == end_canto: break
+    for name, data in collect_cantos(file_path, start_canto, end_canto).items():
+        print(f"\n{'-'*70}")
+        print(f"NARRATIVE SUMMARY: {name} {section_range(data)}")
+        print(f"{'-'*70}")
+        
+        if summarize:
+            print(summarize_canto(data, name))
+
+def completed_cantos(summary_file):
+    """Names of the cantos that already have a summary in the summary file."""
+    if not os.path.exists(summary_file):
+        return set()
+    with open(summary_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    pattern = re.compile(r"NARRATIVE SUMMARY:\s*(.*?)\s*\(SECTIONS\s*\d+-\d+\)[ \t]*\n-+\n(.*?)(?=\n-|\Z)", re.DOTALL)
+    return {normalize_canto_name(m.group(1)) for m in pattern.finditer(content) if m.group(2).strip()}
+
+def format_summary_entry(name, data, summary):
+    """
+    One entry in the exact layout build_audio.parse_summaries reads. The body
+    ends at the next line starting with '-', so bullets are flattened.
+    """
+    lines = [re.sub(r"^[-*•]+\s*", "", line.strip()) for line in summary.strip().splitlines()]
+    body = "\n".join(line for line in lines if line)
+    return f"\n{'-'*70}\nNARRATIVE SUMMARY: {name} {section_range(data)}\n{'-'*70}\n{body}\n"
 
-if __name__ == "__main__":
+def summarize_cantos_to_file(file_path, start_canto, end_canto, summary_file, workers=4, rpm=5):
+    """
+    Summarizes a canto range concurrently under a rate limit, appending each
+    summary to summary_file as soon as it completes. Cantos already in the
+    file are skipped, so an interrupted run can simply be restarted.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: File '{file_path}' not found.")
+        return
+
+    done = completed_cantos(summary_file)
+    todo = []
+    for name, data in collect_cantos(file_path, start_canto, end_canto).items():
+        if name in done:
+            print(f"[ ] Already summarized: {name}")
+        elif not data['sections']:
+            print(f"[!] No sections found for {name}; skipping.")
+        else:
+            todo.append((name, data))
+    print(f"[*] {len(todo)} cantos to summarize ({len(done)} already in {summary_file}).")
+
+    limiter = RateLimiter(rpm)
+    write_lock = threading.Lock()
+
+    def run_one(name, data):
+        summary = summarize_canto(data, name, limiter)
+        if summary.startswith("Gemini Error") or not summary.strip():
+            print(f"[!] {name}: {summary.strip() or 'empty response'}")
+            return False
+        with write_lock:
+            with open(summary_file, 'a', encoding='utf-8') as f:
+                f.write(format_summary_entry(name, data, summary))
+                f.flush()
+                os.fsync(f.fileno())
+        print(f"[*] Summarized {name}")
+        return True
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda item: run_one(*item), todo))
+    print(f"[*] Finished: {sum(results)} written, {len(results) - sum(results)} failed (rerun to retry).")
+
+def cli(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-input", required=True)
     parser.add_argument("-start_canto", required=True)
     parser.add_argument("-end_canto", required=True)
-    args = parser.parse_args()
-    process_cantos(args.input, args.start_canto, args.end_canto)
+    parser.add_argument("-summarize", action="store_true", help="Summarize each canto from its section summaries")
+    parser.add_argument("-summary_file", help="Append summaries here concurrently; cantos already in the file are skipped")
+    parser.add_argument("-workers", type=int, default=4, help="Cantos summarized concurrently with -summary_file")
+    parser.add_argument("-rpm", type=int, default=5, help="Request budget per minute shared by all workers")
+    args = parser.parse_args(argv)
+    if args.summary_file:
+        summarize_cantos_to_file(args.input, args.start_canto, args.end_canto, args.summary_file, args.workers, args.rpm)
+    else:
+        process_cantos(args.input, args.start_canto, args.end_canto, args.summarize)
+
 
+if __name__ == "__main__":
+    cli()
@@ -1,9 +1,25 @@
-import os, re, argparse, time
+import worker_daemon
+worker_daemon.delegate(__name__, __file__)  # Run in the warm worker daemon if one is up
+import os, re, argparse, json
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
+from google.genai import types
+from rate_limit import RateLimiter
+from map_reduce_summary import condense
+import metrics
+import cassette
 
 # Configuration
 MODEL_NAME = 'gemini-2.5-pro'
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+client = cassette.gemini_client(lambda: genai.Client(api_key=os.environ.get("GEMINI_API_KEY")))
+
+# Chapters longer than this (in characters) are uploaded once as cached
+# context instead of being inlined into every prompt that needs them.
+CACHE_THRESHOLD_CHARS = 60000
+CACHE_TTL = "900s"
+
+SUMMARY_INSTRUCTIONS = "Summarize the action of the following text only. Focus on what happens. Do not include any analysis or interpretation."
+ANALYSIS_INSTRUCTIONS = "Provide a concise character study based on this text. Focus only on how characters are presented and any immediate shifts in their situation. Avoid thematic or philosophical discussion."
 
 def int_to_roman(n):
     """Converts an integer to a Roman numeral string."""
@@ -18,78 +34,215 @@ def int_to_roman(n):
         i += 1
     return roman_num
 
-def analyze_text(text):
+def chapter_schema(extract_analysis):
+    """JSON response schema for the combined summary/analysis call."""
+    properties = {"summary": {"type": "STRING", "description": SUMMARY_INSTRUCTIONS}}
+    if extract_analysis:
+        properties["analysis"] = {"type": "STRING", "description": ANALYSIS_INSTRUCTIONS}
+    return {"type": "OBJECT", "properties": properties, "required": list(properties)}
+
+class ChapterContext:
+    """
+    Holds a chapter's text for one or more prompts. Long chapters are uploaded
+    once as cached content and every prompt references the cache; short ones
+    are simply inlined. With a limiter, the cache upload and every prompt
+    each count as a request against the shared RPM budget.
+    """
+    def __init__(self, text, cache_threshold=CACHE_THRESHOLD_CHARS, limiter=None):
+        self.text = text
+        self.cache = None
+        self.limiter = limiter
+        if len(text) >= cache_threshold:
+            try:
+                self.wait()
+                with metrics.request("cache-create"):
+                    self.cache = client.caches.create(
+                        model=MODEL_NAME,
+                        config=types.CreateCachedContentConfig(contents=[f"Text:\n{text}"], ttl=CACHE_TTL),
+                    )
+                metrics.count("cache_created")
+            except Exception as e:
+                metrics.count("cache_unavailable")
+                print(f"[!] Context cache unavailable, inlining chapter text: {e}")
+
+    def wait(self):
+        if self.limiter is not None:
+            self.limiter.wait()
+
+    def generate(self, instructions, **config):
+        """Runs one prompt against the chapter text."""
+        self.wait()
+        if self.cache:
+            config["cached_content"] = self.cache.name
+            contents = instructions
+        else:
+            contents = f"{instructions}\n\nText:\n{self.text}"
+        with metrics.request(MODEL_NAME) as call:
+            response = client.models.generate_content(
+                model=MODEL_NAME, contents=contents,
+                config=types.GenerateContentConfig(**config) if config else None,
+            )
+            call.usage(response)
+        return response
+
+    def close(self):
+        if self.cache:
+            try:
+                client.caches.delete(name=self.cache.name)
+            except Exception as e:
+                print(f"[!] Could not delete context cache {self.cache.name}: {e}")
+
+def analyze_text(text, context=None):
     if not text.strip(): return "No content available for analysis."
-    prompt = f"Provide a concise character study based on this text. Focus only on how characters are presented and any immediate shifts in their situation. Avoid thematic or philosophical discussion.\n\nText:\n{text}"
     try:
-        response = client.models.generate_content(model=MODEL_NAME, contents=prompt)
+        response = (context or ChapterContext(text, float("inf"))).generate(ANALYSIS_INSTRUCTIONS)
         return response.text.strip()
     except Exception as e:
         print(f"[!] LLM Error: {e}"); return "Analysis generation failed."
 
-def summarize_text(text):
+def summarize_text(text, context=None):
     if not text.strip(): return "No content available."
-    prompt = f"Summarize the action of the following text only. Focus on what happens. Do not include any analysis or interpretation. \n\nText:\n{text}"
     try:
-        response = client.models.generate_content(model=MODEL_NAME, contents=prompt)
+        response = (context or ChapterContext(text, float("inf"))).generate(SUMMARY_INSTRUCTIONS)
         return response.text.strip()
     except Exception: return "Summary generation failed."
 
-def extract_chapters(input_file, output_file, extract_analysis):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    sections = re.split(r'={40}', content)
-    output_data = []
-    current_text_block = []
-    chapter_count = 1  # NEW: Tracks the sequence
-
-    for section in sections:
-        match = re.search(r'### SECTION \d+ ORIGINAL\s+<h[1-3][^>]*>(.*?)</h[1-3]>', section, re.DOTALL | re.IGNORECASE)
-        
-        if match:
-            if current_text_block:
-                # MODIFIED: Use the counter instead of the raw header text
-                process_and_append_chapter(int_to_roman(chapter_count), current_text_block, output_data, extract_analysis)
-                chapter_count += 1
-                current_text_block = []
-        
+def summarize_and_analyze(text, extract_analysis, cache_threshold=CACHE_THRESHOLD_CHARS, limiter=None):
+    """
+    Gets the summary (and optionally the character study) from a single
+    structured call. Falls back to separate prompts against the same cached
+    context if the structured response can't be used.
+    """
+    if not text.strip():
+        return "No content available.", "No content available for analysis." if extract_analysis else None
+
+    context = ChapterContext(text, cache_threshold, limiter)
+    try:
+        instructions = SUMMARY_INSTRUCTIONS
+        if extract_analysis:
+            instructions = f"For the text below, return JSON with two fields.\nsummary: {SUMMARY_INSTRUCTIONS}\nanalysis: {ANALYSIS_INSTRUCTIONS}"
+        try:
+            response = context.generate(instructions, response_mime_type="application/json",
+                                        response_schema=chapter_schema(extract_analysis))
+            result = json.loads(response.text)
+            summary = result["summary"].strip()
+            analysis = result["analysis"].strip() if extract_analysis else None
+            return summary, analysis
+        except Exception as e:
+            print(f"[!] Structured call failed ({e}); falling back to separate prompts.")
+            metrics.count("structured_fallbacks")
+            summary = summarize_text(text, context)
+            analysis = analyze_text(text, context) if extract_analysis else None
+            return summary, analysis
+    finally:
+        context.close()
+
+CHAPTER_HEADER_RE = re.compile(r'### SECTION \d+ ORIGINAL\s+<h[1-3][^>]*>(.*?)</h[1-3]>', re.DOTALL | re.IGNORECASE)
+
+class ChapterCollector:
+    """
+    Groups bilingual sections into chapters: each section that opens with an
+    h1-h3 header starts a new one, and text before the first header is
+    chapter I. Fed one section at a time, so pipeline.py can stream.
+    """
+    def __init__(self):
+        self.chapter_count = 1  # Tracks the sequence
+        self.text_block = []
+        self.summaries = []
+
+    def add(self, section):
+        """Adds one section of bilingual text; returns the chapter it closed, or None."""
+        closed = self.finish() if CHAPTER_HEADER_RE.search(section) else None
+
         text_matches = re.findall(r"<div class='original-text'>(.*?)</div>", section, re.DOTALL)
         for t in text_matches:
             clean_t = re.sub(r'<.*?>', '', t).strip()
-            if clean_t: current_text_block.append(clean_t)
+            if clean_t: self.text_block.append(clean_t)
+
+        for t in re.findall(r"<div class='translation-content'>(.*?)</div>", section, re.DOTALL):
+            clean_t = re.sub(r'<.*?>', ' ', t).strip()
+            if clean_t: self.summaries.append(" ".join(clean_t.split()))
+        return closed
+
+    def finish(self):
+        """(roman title, [original text blocks], [section summaries]) so far, or None if it has no text."""
+        if not self.text_block:
+            return None
+        # Use the counter instead of the raw header text
+        chapter = (int_to_roman(self.chapter_count), self.text_block, self.summaries)
+        self.chapter_count += 1
+        self.text_block = []
+        self.summaries = []
+        return chapter
+
+def collect_chapters(content):
+    """Splits the bilingual file into (roman title, [original text blocks], [section summaries]) per chapter."""
+    collector = ChapterCollector()
+    chapters = [chapter for section in re.split(r'={40}', content) if (chapter := collector.add(section))]
+    last = collector.finish()
+    return chapters + [last] if last else chapters
+
+def extract_chapters(input_file, output_file, extract_analysis, workers=4, rpm=5, cache_threshold=CACHE_THRESHOLD_CHARS, from_sections=False):
+    with metrics.stage("parse"):
+        with open(input_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        chapters = collect_chapters(content)
+    limiter = RateLimiter(rpm)
 
-    if current_text_block:
-        process_and_append_chapter(int_to_roman(chapter_count), current_text_block, output_data, extract_analysis)
+    # Chapters run concurrently; results are written back in book order.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(process_chapter, title, text_list, extract_analysis, limiter, cache_threshold,
+                               section_summaries if from_sections else None)
+                   for title, text_list, section_summaries in chapters]
+        output_data = []
+        for future in futures:
+            output_data.extend(future.result())
 
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("\n".join(output_data))
     print(f"[*] Finished! Output saved to: {output_file}")
 
-def process_and_append_chapter(title, text_list, output_list, extract_analysis):
+def process_chapter(title, text_list, extract_analysis, limiter, cache_threshold=CACHE_THRESHOLD_CHARS, section_summaries=None):
+    """
+    Summarizes one chapter and returns its output lines. With section_summaries
+    the reduce call works from the existing section-level summaries (or map-step
+    summaries of the text) instead of the full chapter.
+    """
     full_narrative = "\n\n".join(text_list).strip()
-    if not full_narrative: return
+    if not full_narrative: return []
+
+    reduce_input = full_narrative
+    if section_summaries is not None:
+        reduce_input = condense(client, text_list, section_summaries, limiter, label=f"Chapter {title}")
 
     print(f"    - Processing Chapter {title}...")
-    summary = summarize_text(full_narrative)
-    
-    output_list.append(f"TITLE: Chapter {title}")
-    output_list.append(f"SUMMARY: {summary}")
-    
+    summary, analysis = summarize_and_analyze(reduce_input, extract_analysis, cache_threshold, limiter)
+
+    output_list = [f"TITLE: Chapter {title}", f"SUMMARY: {summary}"]
     if extract_analysis:
-        analysis = analyze_text(full_narrative)
         output_list.append(f"ANALYSIS: {analysis}")
-    
+
     output_list.append(f"CONTENT:\n{full_narrative}\n")
     output_list.append("="*40 + "\n")
-    time.sleep(1)
+    return output_list
 
-if __name__ == "__main__":
+def cli(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input", required=True)
     parser.add_argument("-o", "--output", required=True)
     parser.add_argument("--extract-analysis", action="store_true")
-    args = parser.parse_args()
-    extract_chapters(args.input, args.output, args.extract_analysis)
+    parser.add_argument("--workers", type=int, default=4, help="Chapters summarized concurrently")
+    parser.add_argument("--rpm", type=int, default=5, help="Request budget per minute shared by all workers")
+    parser.add_argument("--cache-threshold", type=int, default=CACHE_THRESHOLD_CHARS,
+                        help="Chapters at least this many characters long are sent once as cached context")
+    parser.add_argument("--from-sections", action="store_true",
+                        help="Build chapter summaries from the section summaries in the bilingual file (map-reduce)")
+    parser.add_argument("--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+    args = parser.parse_args(argv)
+    with metrics.run("extract_chapters", args.metrics):
+        extract_chapters(args.input, args.output, args.extract_analysis, args.workers, args.rpm, args.cache_threshold, args.from_sections)
+
 
+if __name__ == "__main__":
+    cli()
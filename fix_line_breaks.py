@@ -1,25 +1,22 @@
-import os
+import canto_transforms
 
-def apply_css_fix(directory="."):
-    # Target property to inject
-    css_fix = "white-space: pre-wrap;"
-    
-    for filename in os.listdir(directory):
-        if filename.endswith(".html") and "Canto" in filename:
-            with open(filename, 'r', encoding='utf-8') as f:
-                content = f.read()
+# Target property to inject
+CSS_FIX = "white-space: pre-wrap;"
+
+def pre_wrap(soup):
+    """Transform pass: white-space: pre-wrap for .original. False if already fixed or not found."""
+    changed = False
+    for style_tag in soup.find_all('style'):
+        css = style_tag.string or ""
+        # Locate the .original class in the style block and inject the fix
+        # This looks for '.original {' and adds the property right after the brace
+        if ".original {" in css and CSS_FIX not in css:
+            style_tag.string = css.replace(".original {", f".original {{ {CSS_FIX}")
+            changed = True
+    return changed
 
-            # Locate the .original class in the style block and inject the fix
-            # This looks for '.original {' and adds the property right after the brace
-            if ".original {" in content and css_fix not in content:
-                updated_content = content.replace(".original {", f".original {{ {css_fix}")
-                
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(updated_content)
-                print(f"[*] Updated: {filename}")
-            else:
-                print(f"[ ] Skipped (already fixed or not found): {filename}")
+def apply_css_fix(directory="."):
+    canto_transforms.run_passes(["pre_wrap"], directory)
 
 if __name__ == "__main__":
     apply_css_fix()
-    
@@ -1,11 +1,8 @@
-import os
-import re
 from bs4 import BeautifulSoup
+import canto_transforms
 
-def format_html_poetry(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(), 'html.parser')
-
+def format_poetry(soup):
+    """Transform pass: prominent title, original stacked over translation in each bilingual row."""
     # 1. Ensure the H1 (Canto Title) is prominent and centered
     h1 = soup.find('h1')
     if h1:
@@ -32,17 +29,12 @@ def format_html_poetry(file_path):
         if trans:
             trans['style'] = "color: #7f8c8d; display: block; padding-left: 20px; border-left: 3px solid #eee;"
 
-    # Save the modified file
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(soup.prettify())
+def format_html_poetry(file_path):
+    canto_transforms.transform_files([file_path], ["poetry"])
 
 def run_filter_on_all():
     # Only target the Canto HTML files
-    for filename in os.listdir('.'):
-        if filename.endswith('.html') and 'Canto' in filename:
-            print(f"[*] Reformatting {filename}...")
-            format_html_poetry(filename)
+    canto_transforms.run_passes(["poetry"])
 
 if __name__ == "__main__":
     run_filter_on_all()
-
@@ -1,114 +1,24 @@
-filenames = [
-"Inferno_*_Canto_I_speed_0.75.html",
-"Inferno_*_Canto_II_speed_0.75.html",
-"Inferno_*_Canto_III_speed_0.75.html",
-"Inferno_*_Canto_IV_speed_0.75.html",
-"Inferno_*_Canto_V_speed_0.75.html",
-"Inferno_*_Canto_VI_speed_0.75.html",
-"Inferno_*_Canto_VII_speed_0.75.html",
-"Inferno_*_Canto_VIII_speed_0.75.html",
-"Inferno_*_Canto_IX_speed_0.75.html",
-"Inferno_*_Canto_X_speed_0.75.html",
-"Inferno_*_Canto_XI_speed_0.75.html",
-"Inferno_*_Canto_XII_speed_0.75.html",
-"Inferno_*_Canto_XIII_speed_0.75.html",
-"Inferno_*_Canto_XIV_speed_0.75.html",
-"Inferno_*_Canto_XV_speed_0.75.html",
-"Inferno_*_Canto_XVI_speed_0.75.html",
-"Inferno_*_Canto_XVII_speed_0.75.html",
-"Inferno_*_Canto_XVIII_speed_0.75.html",
-"Inferno_*_Canto_XIX_speed_0.75.html",
-"Inferno_*_Canto_XX_speed_0.75.html",
-"Inferno_*_Canto_XXI_speed_0.75.html",
-"Inferno_*_Canto_XXII_speed_0.75.html",
-"Inferno_*_Canto_XXIII_speed_0.75.html",
-"Inferno_*_Canto_XXIV_speed_0.75.html",
-"Inferno_*_Canto_XXV_speed_0.75.html",
-"Inferno_*_Canto_XXVI_speed_0.75.html",
-"Inferno_*_Canto_XXVII_speed_0.75.html",
-"Inferno_*_Canto_XXVIII_speed_0.75.html",
-"Inferno_*_Canto_XXIX_speed_0.75.html",
-"Inferno_*_Canto_XXX_speed_0.75.html",
-"Inferno_*_Canto_XXXI_speed_0.75.html",
-"Inferno_*_Canto_XXXII_speed_0.75.html",
-"Inferno_*_Canto_XXXIII_speed_0.75.html",
-"Inferno_*_Canto_XXXIV_speed_0.75.html",
-"Purgatorio_*_Canto_I_speed_0.75.html",
-"Purgatorio_*_Canto_II_speed_0.75.html",
-"Purgatorio_*_Canto_III_speed_0.75.html",
-"Purgatorio_*_Canto_IV_speed_0.75.html",
-"Purgatorio_*_Canto_V_speed_0.75.html",
-"Purgatorio_*_Canto_VI_speed_0.75.html",
-"Purgatorio_*_Canto_VII_speed_0.75.html",
-"Purgatorio_*_Canto_VIII_speed_0.75.html",
-"Purgatorio_*_Canto_IX_speed_0.75.html",
-"Purgatorio_*_Canto_X_speed_0.75.html",
-"Purgatorio_*_Canto_XI_speed_0.75.html",
-"Purgatorio_*_Canto_XII_speed_0.75.html",
-"Purgatorio_*_Canto_XIII_speed_0.75.html",
-"Purgatorio_*_Canto_XIV_speed_0.75.html",
-"Purgatorio_*_Canto_XV_speed_0.75.html",
-"Purgatorio_*_Canto_XVI_speed_0.75.html",
-"Purgatorio_*_Canto_XVII_speed_0.75.html",
-"Purgatorio_*_Canto_XVIII_speed_0.75.html",
-"Purgatorio_*_Canto_XIX_speed_0.75.html",
-"Purgatorio_*_Canto_XX_speed_0.75.html",
-"Purgatorio_*_Canto_XXI_speed_0.75.html",
-"Purgatorio_*_Canto_XXII_speed_0.75.html",
-"Purgatorio_*_Canto_XXIII_speed_0.75.html",
-"Purgatorio_*_Canto_XXIV_speed_0.75.html",
-"Purgatorio_*_Canto_XXV_speed_0.75.html",
-"Purgatorio_*_Canto_XXVI_speed_0.75.html",
-"Purgatorio_*_Canto_XXVII_speed_0.75.html",
-"Purgatorio_*_Canto_XXVIII_speed_0.75.html",
-"Purgatorio_*_Canto_XXIX_speed_0.75.html",
-"Purgatorio_*_Canto_XXX_speed_0.75.html",
-"Purgatorio_*_Canto_XXXI_speed_0.75.html",
-"Purgatorio_*_Canto_XXXII_speed_0.75.html",
-"Purgatorio_*_Canto_XXXIII_speed_0.75.htm",
-"Paradiso_*_Canto_I_speed_0.75.html",
-"Paradiso_*_Canto_II_speed_0.75.html",
-"Paradiso_*_Canto_III_speed_0.75.html",
-"Paradiso_*_Canto_IV_speed_0.75.html",
-"Paradiso_*_Canto_V_speed_0.75.html",
-"Paradiso_*_Canto_VI_speed_0.75.html",
-"Paradiso_*_Canto_VII_speed_0.75.html",
-"Paradiso_*_Canto_VIII_speed_0.75.html",
-"Paradiso_*_Canto_IX_speed_0.75.html",
-"Paradiso_*_Canto_X_speed_0.75.html",
-"Paradiso_*_Canto_XI_speed_0.75.html",
-"Paradiso_*_Canto_XII_speed_0.75.html",
-"Paradiso_*_Canto_XIII_speed_0.75.html",
-"Paradiso_*_Canto_XIV_speed_0.75.html",
-"Paradiso_*_Canto_XV_speed_0.75.html",
-"Paradiso_*_Canto_XVI_speed_0.75.html",
-"Paradiso_*_Canto_XVII_speed_0.75.html",
-"Paradiso_*_Canto_XVIII_speed_0.75.html",
-"Paradiso_*_Canto_XIX_speed_0.75.html",
-"Paradiso_*_Canto_XX_speed_0.75.html",
-"Paradiso_*_Canto_XXI_speed_0.75.html",
-"Paradiso_*_Canto_XXII_speed_0.75.html",
-"Paradiso_*_Canto_XXIII_speed_0.75.html",
-"Paradiso_*_Canto_XXIV_speed_0.75.html",
-"Paradiso_*_Canto_XXV_speed_0.75.html",
-"Paradiso_*_Canto_XXVI_speed_0.75.html",
-"Paradiso_*_Canto_XXVII_speed_0.75.html",
-"Paradiso_*_Canto_XXVIII_speed_0.75.html",
-"Paradiso_*_Canto_XXIX_speed_0.75.html",
-"Paradiso_*_Canto_XXX_speed_0.75.html",
-"Paradiso_*_Canto_XXXI_speed_0.75.html",
-"Paradiso_*_Canto_XXXII_speed_0.75.html",
-"Paradiso_*_Canto_XXXIII_speed_0.75.html"
+import argparse
+import catalog
 
-]
-
-def generate_html_grid(files):
-    for f in files:
-        # Extract parts for the display text
-        parts = f.split('_')
-        canticle = parts[0].upper()
-        number = parts[3]
+def generate_html_grid(rows):
+    for row in rows:
+        # Display text from the catalog entry
+        f = row['path']
+        canticle = (row['part'] or '').upper()
+        number = catalog.int_to_roman(row['number'])
         
         print(f'<div class="item"><a href="{f}"><span class="canto-badge">{canticle} {number}</span> <span class="file-name">Canto {number}</span></a></div>')
 
-generate_html_grid(filenames)
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Print the HTML grid of canto links for the index page.")
+    parser.add_argument("--dir", default=".", help="Folder holding the catalog and the canto pages")
+    parser.add_argument("--book", default=None)
+    parser.add_argument("--speed", type=float, default=None, help="Only pages built at this speed")
+    args = parser.parse_args(argv)
+    entries = catalog.open_catalog(args.dir, read_only=True)
+    generate_html_grid(entries.listing("canto_page", args.book, args.speed, numbered=True))
+
+
+if __name__ == "__main__":
+    cli()
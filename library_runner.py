@@ -0,0 +1,166 @@
+import os, glob, queue, argparse, threading, itertools
+import ebooklib
+from ebooklib import epub
+import translate_epub
+import translation_memory
+import metrics
+from rate_limit import RateLimiter
+
+# --- CONFIGURATION ---
+RPM = 5               # One quota budget shared by every book
+WORKERS = 4           # Requests in flight at once, across books
+QUEUE_SIZE = 32       # Sections read ahead of the workers
+
+DONE = object()
+
+
+class BookWriter:
+    """
+    Writes one book's bilingual file in section order while translations
+    complete out of order. Progress is saved in the book's state directory
+    each time a whole document has been written, as translate_epub does.
+    """
+    def __init__(self, epub_path):
+        self.epub_path = epub_path
+        self.out_file = epub_path.replace(".epub", "_Bilingual.txt")
+        self.f, self.start_index, self.start_number = translate_epub.resume_output(epub_path, self.out_file)
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.next_seq = 0
+        self.total = None
+        self.done = threading.Event()
+        self.translated = 0
+        self.failed = 0
+
+    def submit(self, seq, section, translation=None, failed=False):
+        with self.lock:
+            if section["kind"] == "text":
+                self.failed += failed
+                self.translated += not failed
+            self.pending[seq] = (section, translation)
+            while self.next_seq in self.pending:
+                section, translation = self.pending.pop(self.next_seq)
+                if section["kind"] in ("header", "text"):
+                    self.f.write(translate_epub.format_section(section, translation))
+                    self.f.flush()
+                if section["item_last"]:
+                    translate_epub.save_progress(self.epub_path, section["item_index"] + 1, self.f.tell(), section["number"])
+                self.next_seq += 1
+            self.check_done()
+
+    def close_input(self, total):
+        """Called by the feeder once it knows how many records the book has."""
+        with self.lock:
+            self.total = total
+            self.check_done()
+
+    def check_done(self):
+        if self.total is not None and self.next_seq >= self.total and not self.done.is_set():
+            self.f.close()
+            self.done.set()
+            print(f"[*] Finished {os.path.basename(self.epub_path)}: {self.translated} translated, "
+                  f"{self.failed} failed -> {self.out_file}", flush=True)
+
+
+class LibraryRunner:
+    """
+    Translates every EPUB in a folder through one shared work queue. Sections
+    from all books are interleaved round-robin, so a book that is waiting on
+    nothing never leaves an API slot idle, and a single RateLimiter holds the
+    whole library to one quota.
+    """
+    def __init__(self, folder, rpm=RPM, workers=WORKERS, min_sect_length=500, break_at_p_tags=False, chapter_tags="h1,h2,h3",
+                 align_sentences=False, memory_path=None):
+        self.paths = sorted(p for p in glob.glob(os.path.join(folder, "*.epub")) if "_Bilingual" not in os.path.basename(p))
+        self.limiter = RateLimiter(rpm)
+        self.workers = workers
+        self.min_sect_length = min_sect_length
+        self.break_at_p_tags = break_at_p_tags
+        self.tags_to_watch = [t.strip().lower() for t in chapter_tags.split(",")]
+        self.align_sentences = align_sentences
+        translate_epub.memory = translation_memory.open_memory(memory_path)
+        self.work = queue.Queue(maxsize=QUEUE_SIZE)
+
+    def book_records(self, path, writer):
+        """Yields (writer, seq, section) for one book from its resume point."""
+        try:
+            book = epub.read_epub(path)
+        except Exception as e:
+            print(f"[!] Skipping {os.path.basename(path)}: {e}", flush=True)
+            writer.close_input(0)
+            return
+        items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+        if writer.start_index:
+            print(f"[*] {os.path.basename(path)}: resuming at document {writer.start_index}", flush=True)
+        seq = -1
+        for seq, section in enumerate(translate_epub.iter_sections(items, self.tags_to_watch, writer.start_index,
+                                                                   self.min_sect_length, self.break_at_p_tags,
+                                                                   writer.start_number)):
+            yield writer, seq, section
+        writer.close_input(seq + 1)
+
+    def feed(self, writers):
+        """Round-robin over the books; only text sections go to the workers."""
+        streams = [self.book_records(path, writer) for path, writer in zip(self.paths, writers)]
+        try:
+            for record in itertools.chain.from_iterable(itertools.zip_longest(*streams)):
+                if record is None:
+                    continue
+                writer, seq, section = record
+                if section["kind"] == "text":
+                    self.work.put(record)
+                else:
+                    writer.submit(seq, section)
+        finally:
+            # Even if a book can't be read, the workers finish what is queued and exit
+            for _ in range(self.workers):
+                self.work.put(DONE)
+
+    def worker(self):
+        while (record := self.work.get()) is not DONE:
+            writer, seq, section = record
+            try:
+                # The limiter is only waited on when the memory cannot answer the section
+                translated = translate_epub.translate_text(section["text"], self.align_sentences, limiter=self.limiter)
+                writer.submit(seq, section, translated)
+            except Exception as e:
+                print(f"[!] {os.path.basename(writer.epub_path)} section {section['number']}: {e}", flush=True)
+                writer.submit(seq, section, failed=True)
+
+    def run(self):
+        if not self.paths:
+            print("[!] No EPUBs found.")
+            return
+        print(f"[*] {len(self.paths)} books, {self.workers} workers", flush=True)
+        writers = [BookWriter(path) for path in self.paths]
+        threads = [threading.Thread(target=self.worker, name=f"worker-{i}") for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            self.feed(writers)
+        finally:
+            for t in threads:
+                t.join()
+        for writer in writers:
+            writer.done.wait()
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Translate a folder of EPUBs under one shared quota.")
+    parser.add_argument("folder", help="Folder of source EPUBs")
+    parser.add_argument("--rpm", type=int, default=RPM, help="Requests per minute for the whole library")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Requests in flight at once")
+    parser.add_argument("-m", "--min_sect_length", type=int, default=500)
+    parser.add_argument("--break_at_p_tags", action="store_true")
+    parser.add_argument("--chapter_tags", type=str, default="h1,h2,h3")
+    parser.add_argument("--align_sentences", action="store_true", help="Sentence-aligned translations (see translate_epub.py)")
+    parser.add_argument("--memory", default=None, help="Translation memory shared by every book in the folder")
+    parser.add_argument("--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+    args = parser.parse_args(argv)
+    with metrics.run("library_runner", args.metrics):
+        LibraryRunner(args.folder, args.rpm, args.workers, args.min_sect_length, args.break_at_p_tags, args.chapter_tags,
+                      args.align_sentences, args.memory).run()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,5 @@
+"""
+One entry point for the pipeline scripts: python -m ltw <command> [args].
+Each command imports only the script it runs, so lightweight commands never
+pay for google.genai, ebooklib or pydub.
+"""
@@ -0,0 +1,3 @@
+from ltw.cli import main
+
+main()
@@ -0,0 +1,78 @@
+import os, sys, importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# --- CONFIGURATION ---
+# command -> ("module:function", help). Nothing here is imported until its command runs.
+COMMANDS = {
+    "Books": {
+        "translate": ("translate_epub:cli", "Translate an EPUB into a bilingual text file"),
+        "library": ("library_runner:cli", "Translate a folder of EPUBs under one quota"),
+        "pipeline": ("pipeline:cli", "Translate, summarize and narrate in one streaming run"),
+        "glossary": ("book_glossary:cli", "Extract a book's glossary of names and recurring terms"),
+        "plan": ("translation_plan:cli", "Project the requests, cost and time of a translation"),
+        "repair": ("repair_bilingual:cli", "Re-translate the failed sections of a bilingual file"),
+        "build": ("build_book:cli", "Rebuild the out-of-date stages of a book"),
+    },
+    "Outputs": {
+        "summarize": ("extract_chapters:cli", "Summarize chapters of a bilingual file"),
+        "epub": ("build_epub:cli", "Build the bilingual EPUB"),
+        "site": ("epub_to_htmlz:cli", "Convert an EPUB into a Jekyll site"),
+        "audio": ("build_chapter_audio:cli", "Narrate a book chapter by chapter"),
+    },
+    "Cantos": {
+        "canto-summarize": ("extract_cantos:cli", "Summarize a range of cantos"),
+        "canto-audio": ("build_audio:cli", "Bilingual canto audio with HTML players"),
+        "canto-augment": ("augment_bilingual_text:cli", "Insert canto headers into a bilingual file"),
+        "canto-sections": ("rehabilitate_summaries:cli", "Add section ranges to canto summary headers"),
+        "canto-reformat": ("reformat_cantos:cli", "Inject canto headings and summaries into HTML"),
+        "canto-transform": ("canto_transforms:cli", "Apply the canto HTML passes with one parse per file"),
+        "canto-sort": ("cant_sorter:cli", "Print canto filenames in reading order"),
+        "canto-index": ("index_creator:cli", "Print the canto link grid for the index page"),
+        "structure": ("structure_index:cli", "Build or show a bilingual file's structure index"),
+    },
+    "Tools": {
+        "daemon": ("worker_daemon:cli", "Start, stop or query the warm worker daemon"),
+        "cassette": ("cassette:cli", "Inspect a request cassette"),
+        "bench": ("bench.run:main", "Benchmark the stages on synthetic books"),
+        "faults": ("bench.faults:main", "Load-test the retry paths with simulated faults"),
+        "startup": ("bench.startup:main", "Measure cold-start time of the lightweight commands"),
+        "align": ("sentence_align:cli", "Align the sentences of a text with its translation"),
+        "memory": ("translation_memory:cli", "Import into, query or count the translation memory"),
+        "catalog": ("catalog:cli", "List, scan or prune the generated-artifact catalog"),
+    },
+}
+
+
+def usage():
+    lines = ["usage: python -m ltw <command> [args...]", "",
+             "Run 'python -m ltw <command> -h' for a command's options."]
+    for group, commands in COMMANDS.items():
+        lines.append(f"\n{group}:")
+        lines.extend(f"  {name:<17}{help_text}" for name, (_, help_text) in commands.items())
+    return "\n".join(lines)
+
+def find(name):
+    for commands in COMMANDS.values():
+        if name in commands:
+            return commands[name][0]
+    return None
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    target = find(argv[0])
+    if target is None:
+        print(f"[!] Unknown command: {argv[0]}\n\n{usage()}", file=sys.stderr)
+        raise SystemExit(2)
+    module_name, function = target.split(":")
+    sys.argv = [f"ltw {argv[0]}"] + argv[1:]  # So argparse names the command in usage and errors
+
+    import worker_daemon
+    if module_name in worker_daemon.WARM_MODULES:
+        worker_daemon.submit(module_name, argv[1:])  # Exits here if a daemon ran the job
+    getattr(importlib.import_module(module_name), function)(argv[1:])
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import RateLimiter
+import metrics
+
+# --- CONFIGURATION ---
+# The map step runs on the cheap model; callers do the single reduce call on their own model.
+MAP_MODEL = 'gemini-2.5-flash'
+CHUNK_CHARS = 12000           # Size of each map-step chunk
+MAX_REDUCE_CHARS = 40000      # Largest input handed to the reduce call
+MIN_SECTION_COVERAGE = 0.8    # Share of sections that need a summary before we trust them
+MAX_MAP_ROUNDS = 3
+
+MAP_INSTRUCTIONS = "Summarize the action of this passage in a few sentences. Focus on what happens and keep every character's name. Do not add analysis."
+
+def chunk_blocks(blocks, max_chars=CHUNK_CHARS):
+    """Groups consecutive text blocks into chunks of at most max_chars (a single oversized block stays whole)."""
+    chunks, current, size = [], [], 0
+    for block in blocks:
+        if current and size + len(block) > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def map_chunks(client, chunks, limiter=None, workers=4, model=MAP_MODEL):
+    """Summarizes chunks in parallel and returns the summaries in order."""
+    limiter = limiter or RateLimiter(0)
+
+    def summarize_chunk(chunk):
+        limiter.wait()
+        try:
+            with metrics.request(model) as call:
+                response = client.models.generate_content(model=model, contents=f"{MAP_INSTRUCTIONS}\n\nText:\n{chunk}")
+                call.usage(response)
+            return response.text.strip()
+        except Exception as e:
+            print(f"[!] Map step failed, keeping chunk text: {e}")
+            return chunk
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(summarize_chunk, chunks))
+
+def condense(client, originals, section_summaries, limiter=None, workers=4, label=""):
+    """
+    Returns the text to hand to a single reduce call for one chapter or canto.
+    The section-level summaries already in the _Bilingual.txt file are used
+    when they cover the chapter; otherwise the original text is used. Either
+    way, input over MAX_REDUCE_CHARS is shrunk with parallel map-step summaries
+    (repeated if needed) so the reduce call stays small.
+    """
+    usable = [s for s in section_summaries if s.strip()]
+    if usable and len(usable) >= MIN_SECTION_COVERAGE * max(1, len(originals)):
+        blocks, source = usable, "section summaries"
+    else:
+        blocks, source = [o for o in originals if o.strip()], "original text"
+
+    raw_chars = sum(len(o) for o in originals)
+    text = "\n\n".join(blocks)
+    rounds = 0
+    while len(text) > MAX_REDUCE_CHARS and rounds < MAX_MAP_ROUNDS:
+        chunks = chunk_blocks(blocks)
+        if len(chunks) < 2 and rounds:
+            break
+        blocks = map_chunks(client, chunks, limiter, workers)
+        text = "\n\n".join(blocks)
+        rounds += 1
+
+    print(f"    [{label}] reduce input from {source}: {len(text)} chars (original {raw_chars}, {rounds} map round(s))")
+    return text
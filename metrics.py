@@ -0,0 +1,270 @@
+import os, sys, json, time, threading
+from contextlib import contextmanager
+try:
+    import resource  # Unix only; peak RSS and child CPU are skipped without it
+except ImportError:
+    resource = None
+
+# --- CONFIGURATION ---
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PREFIX = "ltw"
+
+
+class Recorder:
+    """
+    Collects stage timings, request latencies, token counts and counters for
+    one run. Thread-safe; the module-level functions below use a single shared
+    instance so every script records into the same place.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.run_name = None
+        self.out_dir = None
+        self.events = None
+        self.started = time.time()
+        self.stages = {}     # name -> {"calls", "wall", "cpu", "child_cpu"}
+        self.requests = {}   # kind -> {"latencies": [...], "errors": {code: n}, tokens...}
+        self.counters = {}   # name -> n
+
+    def emit(self, record):
+        if self.events is None:
+            return
+        record = {"ts": round(time.time(), 3), "run": self.run_name, **record}
+        with self.lock:
+            self.events.write(json.dumps(record) + "\n")
+            self.events.flush()
+
+    def add_stage(self, name, wall, cpu, child_cpu):
+        with self.lock:
+            s = self.stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "child_cpu": 0.0})
+            s["calls"] += 1
+            s["wall"] += wall
+            s["cpu"] += cpu
+            s["child_cpu"] += child_cpu
+
+    def request_stats(self, kind):
+        return self.requests.setdefault(kind, {"latencies": [], "errors": {}, "prompt_tokens": 0,
+                                               "output_tokens": 0, "cached_tokens": 0, "cache_hits": 0})
+
+    def add_request(self, kind, seconds, error=None):
+        with self.lock:
+            r = self.request_stats(kind)
+            r["latencies"].append(seconds)
+            if error is not None:
+                r["errors"][error] = r["errors"].get(error, 0) + 1
+
+    def add_usage(self, kind, prompt, output, cached):
+        with self.lock:
+            r = self.request_stats(kind)
+            r["prompt_tokens"] += prompt
+            r["output_tokens"] += output
+            r["cached_tokens"] += cached
+            if cached:
+                r["cache_hits"] += 1
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+
+_recorder = Recorder()
+
+def child_cpu_seconds():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def peak_rss_bytes():
+    """Peak resident set size of this process and of its largest finished child (e.g. ffmpeg)."""
+    if resource is None:
+        return 0, 0
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    unit = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit)
+
+@contextmanager
+def stage(name):
+    """
+    Times a block as part of a named stage. Wall time and the calling thread's
+    CPU time accumulate per stage name; CPU used by subprocesses that finish
+    inside the block (pydub's ffmpeg) is recorded as child CPU.
+    """
+    wall, cpu, child = time.monotonic(), time.thread_time(), child_cpu_seconds()
+    try:
+        yield
+    finally:
+        wall = time.monotonic() - wall
+        cpu = time.thread_time() - cpu
+        child = child_cpu_seconds() - child
+        _recorder.add_stage(name, wall, cpu, child)
+        _recorder.emit({"event": "stage", "stage": name, "wall": round(wall, 4),
+                        "cpu": round(cpu, 4), "child_cpu": round(child, 4)})
+
+def timed_iter(iterable, name):
+    """Yields from iterable, charging only the time spent producing items to the named stage."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def add_time(name, seconds):
+    """Charges a wait that already happened (e.g. a rate-limit sleep) to a stage."""
+    _recorder.add_stage(name, seconds, 0.0, 0.0)
+
+class RequestTimer:
+    def __init__(self, kind):
+        self.kind = kind
+        self.tokens = None
+
+    def usage(self, response):
+        """Records token counts from a google-genai response's usage_metadata, if present."""
+        meta = getattr(response, "usage_metadata", None)
+        if meta is None:
+            return
+        prompt = getattr(meta, "prompt_token_count", None) or 0
+        output = (getattr(meta, "candidates_token_count", None) or 0) + (getattr(meta, "thoughts_token_count", None) or 0)
+        cached = getattr(meta, "cached_content_token_count", None) or 0
+        self.tokens = {"prompt": prompt, "output": output, "cached": cached}
+        _recorder.add_usage(self.kind, prompt, output, cached)
+
+@contextmanager
+def request(kind):
+    """
+    Times one API call. Exceptions are recorded with their HTTP code when they
+    carry one (errors.ClientError) and re-raised.
+    """
+    timer = RequestTimer(kind)
+    started = time.monotonic()
+    error = None
+    try:
+        yield timer
+    except Exception as e:
+        error = str(getattr(e, "code", None) or type(e).__name__)
+        raise
+    finally:
+        seconds = time.monotonic() - started
+        _recorder.add_request(kind, seconds, error)
+        record = {"event": "request", "kind": kind, "seconds": round(seconds, 4)}
+        if error is not None:
+            record["error"] = error
+        if timer.tokens:
+            record["tokens"] = timer.tokens
+        _recorder.emit(record)
+
+def count(name, n=1):
+    """Increments a counter such as retries or cache_created."""
+    _recorder.count(name, n)
+    _recorder.emit({"event": "count", "name": name, "n": n})
+
+def on_backoff(details):
+    """backoff handler: records each retry and the time it waits."""
+    count("retries")
+    add_time("backoff_wait", details.get("wait", 0.0))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def prometheus_text(rec):
+    """Renders the run in the Prometheus text exposition format (for node_exporter's textfile collector)."""
+    run = rec.run_name or "run"
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{k}="{v}"' for k, v in {"run": run, **labels}.items())
+            lines.append(f"{PREFIX}_{name}{suffix}{{{label_text}}} {value}")
+
+    metric("stage_wall_seconds", "counter", "Wall time spent in each stage.",
+           [("", {"stage": n}, round(s["wall"], 4)) for n, s in rec.stages.items()])
+    metric("stage_cpu_seconds", "counter", "CPU time spent in each stage (own thread, then child processes).",
+           [("", {"stage": n, "source": "self"}, round(s["cpu"], 4)) for n, s in rec.stages.items()]
+           + [("", {"stage": n, "source": "children"}, round(s["child_cpu"], 4)) for n, s in rec.stages.items()])
+
+    samples = []
+    for kind, r in rec.requests.items():
+        for bound in LATENCY_BUCKETS:
+            samples.append(("_bucket", {"kind": kind, "le": bound}, sum(1 for v in r["latencies"] if v <= bound)))
+        samples.append(("_bucket", {"kind": kind, "le": "+Inf"}, len(r["latencies"])))
+        samples.append(("_sum", {"kind": kind}, round(sum(r["latencies"]), 4)))
+        samples.append(("_count", {"kind": kind}, len(r["latencies"])))
+    metric("request_seconds", "histogram", "Latency of API and TTS requests.", samples)
+
+    metric("request_errors_total", "counter", "Failed requests by error code.",
+           [("", {"kind": k, "code": code}, n) for k, r in rec.requests.items() for code, n in r["errors"].items()])
+    metric("tokens_total", "counter", "Tokens reported by the API.",
+           [("", {"kind": k, "type": t}, r[f"{t}_tokens"]) for k, r in rec.requests.items() for t in ("prompt", "output", "cached")])
+    metric("cache_hits_total", "counter", "Requests that were served partly from cached context.",
+           [("", {"kind": k}, r["cache_hits"]) for k, r in rec.requests.items()])
+    metric("events_total", "counter", "Counters such as retries and cache creation.",
+           [("", {"name": n}, v) for n, v in rec.counters.items()])
+    self_rss, child_rss = peak_rss_bytes()
+    metric("peak_rss_bytes", "gauge", "Peak resident set size.",
+           [("", {"process": "self"}, self_rss), ("", {"process": "children"}, child_rss)])
+    return "\n".join(lines) + "\n"
+
+def summary_table(rec):
+    """End-of-run table of where the time went."""
+    elapsed = time.time() - rec.started
+    out = [f"\n=== Metrics: {rec.run_name} ({elapsed / 60:.1f} min) ===",
+           f"{'STAGE':<20}{'CALLS':>8}{'WALL s':>12}{'CPU s':>10}{'CHILD s':>10}{'% WALL':>8}"]
+    for name, s in sorted(rec.stages.items(), key=lambda kv: -kv[1]["wall"]):
+        share = 100 * s["wall"] / elapsed if elapsed else 0
+        out.append(f"{name:<20}{s['calls']:>8}{s['wall']:>12.1f}{s['cpu']:>10.1f}{s['child_cpu']:>10.1f}{share:>8.1f}")
+    if rec.requests:
+        out.append(f"\n{'REQUESTS':<20}{'COUNT':>8}{'ERRORS':>8}{'P50 s':>8}{'P95 s':>8}{'MAX s':>8}{'TOKENS IN/OUT':>18}{'CACHE HIT':>10}")
+        for kind, r in rec.requests.items():
+            lat = r["latencies"]
+            errors = sum(r["errors"].values())
+            hit = 100 * r["cache_hits"] / len(lat) if lat else 0
+            tokens = f"{r['prompt_tokens']}/{r['output_tokens']}"
+            out.append(f"{kind:<20}{len(lat):>8}{errors:>8}{percentile(lat, 0.5):>8.2f}{percentile(lat, 0.95):>8.2f}"
+                       f"{max(lat, default=0):>8.2f}{tokens:>18}{hit:>9.0f}%")
+    for name, n in sorted(rec.counters.items()):
+        out.append(f"{name}: {n}")
+    self_rss, child_rss = peak_rss_bytes()
+    out.append(f"peak RSS: {self_rss / 2**20:.0f} MB (children {child_rss / 2**20:.0f} MB)")
+    return "\n".join(out)
+
+@contextmanager
+def run(name, out_dir=None):
+    """
+    Wraps a script's main work. With out_dir, events stream to
+    <out_dir>/<name>.jsonl as they happen; on exit <name>.prom is written and a
+    summary table is printed. Without out_dir nothing is written. Each run
+    starts from empty totals, so jobs in one long-lived process stay apart.
+    """
+    global _recorder
+    _recorder = Recorder()
+    _recorder.run_name = name
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        _recorder.out_dir = out_dir
+        _recorder.events = open(os.path.join(out_dir, f"{name}.jsonl"), "a", encoding="utf-8")
+        _recorder.emit({"event": "start", "pid": os.getpid()})
+    try:
+        yield _recorder
+    finally:
+        if out_dir:
+            self_rss, child_rss = peak_rss_bytes()
+            _recorder.emit({"event": "end", "seconds": round(time.time() - _recorder.started, 3),
+                            "peak_rss": self_rss, "child_peak_rss": child_rss})
+            _recorder.events.close()
+            _recorder.events = None
+            prom_path = os.path.join(out_dir, f"{name}.prom")
+            with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(prometheus_text(_recorder))
+            os.replace(prom_path + ".tmp", prom_path)
+            print(summary_table(_recorder))
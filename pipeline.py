@@ -0,0 +1,227 @@
+import os, asyncio, argparse, queue, threading, time
+import ebooklib
+from ebooklib import epub
+import translate_epub
+import translation_memory
+import extract_chapters
+import build_chapter_audio
+from rate_limit import RateLimiter
+
+# --- CONFIGURATION ---
+QUEUE_SIZE = 2        # Chapters allowed to wait between stages before upstream blocks
+TRANSLATE_RPM = 5     # Flash quota for section translation
+SUMMARY_RPM = 5       # Pro quota for chapter summaries
+
+DONE = object()       # End-of-stream marker passed down the queues
+
+
+class Pipeline:
+    """
+    Runs translate -> summarize -> synthesize as three concurrent stages
+    connected by bounded in-memory queues. A chapter is handed to the
+    summarizer as soon as its last section is translated, and to the audio
+    stage as soon as its summary is written, so early chapters are finished
+    long before the whole book is. Full queues block the stage feeding them.
+
+    Outputs are the same files the standalone scripts produce:
+    <book>_Bilingual.txt, the extract_chapters summary file, and
+    Chapter_<N>.mp3 files in the audio folder, numbered like the summary
+    file (build_chapter_audio.py, which only starts chapters at bare roman
+    <h2> headers, can number them differently). The run always starts fresh;
+    it does not read or write the book's translation progress.
+    """
+    def __init__(self, epub_path, summary_file, audio_dir, chapter_limit=None, min_sect_length=500,
+                 break_at_p_tags=False, chapter_tags="h1,h2,h3", extract_analysis=False, from_sections=False,
+                 queue_size=QUEUE_SIZE, translate_rpm=TRANSLATE_RPM, summary_rpm=SUMMARY_RPM, align_sentences=False,
+                 memory_path=None):
+        self.epub_path = epub_path
+        self.bilingual_file = epub_path.replace(".epub", "_Bilingual.txt")
+        self.summary_file = summary_file
+        self.audio_dir = audio_dir
+        self.chapter_limit = chapter_limit
+        self.min_sect_length = min_sect_length
+        self.break_at_p_tags = break_at_p_tags
+        self.tags_to_watch = [t.strip().lower() for t in chapter_tags.split(",")]
+        self.extract_analysis = extract_analysis
+        self.from_sections = from_sections
+        self.align_sentences = align_sentences
+        translate_epub.memory = translation_memory.open_memory(memory_path)
+        self.translate_limiter = RateLimiter(translate_rpm)
+        self.summary_limiter = RateLimiter(summary_rpm)
+        self.summary_queue = queue.Queue(maxsize=queue_size)
+        self.audio_queue = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.errors = []
+        self.started = time.monotonic()
+
+    def log(self, message):
+        elapsed = time.monotonic() - self.started
+        print(f"[{elapsed / 60:6.1f} min] {message}", flush=True)
+
+    def put(self, q, item):
+        """Blocking put that gives up if another stage has failed."""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=1)
+            except queue.Empty:
+                continue
+        return DONE
+
+    def run_stage(self, name, target, downstream=None):
+        """Thread body: runs a stage, records failures and always closes the downstream queue."""
+        try:
+            target()
+        except Exception as e:
+            self.errors.append((name, e))
+            self.log(f"[!] {name} stage failed: {e}")
+            self.stop.set()
+        finally:
+            if downstream is not None:
+                self.put(downstream, DONE)
+
+    # --- Stage 1: translation ---
+    def translate(self):
+        """
+        Chapter boundaries and numbering come from extract_chapters' own rule
+        (any h1-h3 header; text before the first one is chapter I), fed with
+        the same text written to the bilingual file, so the summaries match a
+        standalone extract_chapters run over that file.
+        """
+        book = epub.read_epub(self.epub_path)
+        items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+        collector = extract_chapters.ChapterCollector()
+        prose = []  # Clean section text of the open chapter, for the audio stage
+        chapters_queued = 0
+
+        def queue_chapter(closed):
+            nonlocal prose, chapters_queued
+            title, originals, translations = closed
+            chapter = {"title": title, "originals": originals, "translations": translations, "prose": prose}
+            prose = []
+            chapters_queued += 1
+            self.log(f"Chapter {title} translated; queued for summary.")
+            return self.put(self.summary_queue, chapter)
+
+        with open(self.bilingual_file, "w", encoding="utf-8") as f:
+            for section in translate_epub.iter_sections(items, self.tags_to_watch, 0, self.min_sect_length, self.break_at_p_tags):
+                if self.stop.is_set():
+                    return
+                if section["kind"] == "header":
+                    out = translate_epub.format_original(section["number"], section["html"])
+                    out += f"\n### EXTRACTED HEADER: {section['text']}\n"
+                elif section["kind"] == "text":
+                    out = translate_epub.format_original(section["number"], section["html"])
+                    try:
+                        self.translate_limiter.wait()
+                        translation = translate_epub.translate_text(section["text"], self.align_sentences)
+                        out += translate_epub.format_translation(translation)
+                    except Exception as e:
+                        self.log(f"[!] Section {section['number']} not translated: {e}")
+                else:
+                    continue
+                closed = collector.add(out)
+                if closed:
+                    if not queue_chapter(closed):
+                        return
+                    if self.chapter_limit and chapters_queued >= self.chapter_limit:
+                        self.log("Chapter limit reached.")
+                        return
+                if section["kind"] == "text":
+                    prose.append(section["text"])
+                f.write(out + translate_epub.DIVIDER)
+                f.flush()
+
+        closed = collector.finish()
+        if closed:
+            queue_chapter(closed)
+
+    # --- Stage 2: chapter summaries ---
+    def summarize(self):
+        os.makedirs(os.path.dirname(self.summary_file) or ".", exist_ok=True)
+        with open(self.summary_file, "w", encoding="utf-8") as f:
+            while (chapter := self.get(self.summary_queue)) is not DONE:
+                lines = extract_chapters.process_chapter(
+                    chapter["title"], chapter["originals"], self.extract_analysis, self.summary_limiter,
+                    section_summaries=chapter["translations"] if self.from_sections else None)
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                self.log(f"Chapter {chapter['title']} summarized; queued for audio.")
+                if not self.put(self.audio_queue, chapter):
+                    return
+
+    # --- Stage 3: audio ---
+    def synthesize(self):
+        os.makedirs(self.audio_dir, exist_ok=True)
+        js_map = {}
+
+        async def consume():
+            loop = asyncio.get_running_loop()
+            offset = 0.0
+            while (chapter := await loop.run_in_executor(None, self.get, self.audio_queue)) is not DONE:
+                result = await build_chapter_audio.process_audio_chapter(
+                    chapter["title"], chapter["prose"], self.audio_dir, js_map, offset, False,
+                    os.path.splitext(os.path.basename(self.epub_path))[0])
+                if result:
+                    offset = result[1]
+                    mp3_path = os.path.join(self.audio_dir, f"Chapter_{chapter['title']}.mp3")
+                    self.log(f"Chapter {chapter['title']} is listenable: {mp3_path}")
+
+        asyncio.run(consume())
+        print("const chapterMap = {")
+        for name, sec in js_map.items():
+            print(f'    "Chapter {name}": {sec},')
+        print("};")
+
+    def run(self):
+        stages = [
+            threading.Thread(target=self.run_stage, args=("translate", self.translate, self.summary_queue), name="translate"),
+            threading.Thread(target=self.run_stage, args=("summarize", self.summarize, self.audio_queue), name="summarize"),
+            threading.Thread(target=self.run_stage, args=("audio", self.synthesize), name="audio"),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        if self.errors:
+            print(f"[!] Pipeline finished with errors: {', '.join(name for name, _ in self.errors)}")
+        else:
+            self.log(f"Pipeline complete: {self.bilingual_file}, {self.summary_file}, {self.audio_dir}")
+        return not self.errors
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Translate, summarize and synthesize a book in one streaming run.")
+    parser.add_argument("-i", "--input", required=True, help="Source EPUB")
+    parser.add_argument("-s", "--summary", required=True, help="Chapter summary file (extract_chapters format)")
+    parser.add_argument("-a", "--audio_dir", required=True, help="Folder for Chapter_N.mp3 files")
+    parser.add_argument("-c", "--chapter_limit", type=int, default=None)
+    parser.add_argument("-m", "--min_sect_length", type=int, default=500)
+    parser.add_argument("--break_at_p_tags", action="store_true")
+    parser.add_argument("--chapter_tags", type=str, default="h1,h2,h3")
+    parser.add_argument("--extract-analysis", action="store_true")
+    parser.add_argument("--from-sections", action="store_true", help="Summarize chapters from their section translations")
+    parser.add_argument("--queue_size", type=int, default=QUEUE_SIZE, help="Chapters buffered between stages")
+    parser.add_argument("--translate_rpm", type=int, default=TRANSLATE_RPM)
+    parser.add_argument("--summary_rpm", type=int, default=SUMMARY_RPM)
+    parser.add_argument("--align_sentences", action="store_true", help="Sentence-aligned translations (see translate_epub.py)")
+    parser.add_argument("--memory", default=None, help="Translation memory database (see translate_epub.py)")
+    args = parser.parse_args(argv)
+
+    ok = Pipeline(args.input, args.summary, args.audio_dir, args.chapter_limit, args.min_sect_length, args.break_at_p_tags,
+                  args.chapter_tags, args.extract_analysis, args.from_sections, args.queue_size,
+                  args.translate_rpm, args.summary_rpm, args.align_sentences, args.memory).run()
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,24 @@
+import threading, time
+import metrics
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls evenly to stay under a
+    requests-per-minute budget. Share one instance between worker threads.
+    """
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        """Blocks until the caller's slot comes up."""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+            metrics.add_time("rate_limit_wait", slot - now)
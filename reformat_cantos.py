@@ -1,6 +1,6 @@
 import argparse
 import re
-from bs4 import BeautifulSoup
+import canto_transforms
 
 def extract_summaries(canto_data_path):
     """Parses the text file and returns a dict mapping Canto names to summaries."""
@@ -32,10 +32,8 @@ def extract_summaries(canto_data_path):
             
     return summaries
 
-def process_html(html_path, summaries):
-    with open(html_path, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f, 'html.parser')
-
+def inject_summaries(soup, summaries):
+    """Transform pass: heading and summary box before each canto's first segment. False if no canto matched."""
     found_any = False
     
     # Search for Canto markers in the source-text divs
@@ -70,20 +68,21 @@ def process_html(html_path, summaries):
                 parent_segment.insert_before(new_h1)
                 new_h1.insert_after(summary_div)
 
-    if found_any:
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(soup.prettify())
-        print(f"Successfully processed: {html_path}")
-    else:
-        print("No matching Canto data found in the HTML.")
+    return found_any
 
-if __name__ == "__main__":
+def process_html(html_path, summaries):
+    canto_transforms.transform_files([html_path], ["summaries"], {"summaries": {"summaries": summaries}})
+
+def cli(argv=None):
     parser = argparse.ArgumentParser(description="Inject Canto headings and summaries.")
     parser.add_argument("-html_file", required=True)
     parser.add_argument("-canto_data", required=True)
-    
-    args = parser.parse_args()
-    
+
+    args = parser.parse_args(argv)
+
     canto_map = extract_summaries(args.canto_data)
     process_html(args.html_file, canto_map)
 
+
+if __name__ == "__main__":
+    cli()
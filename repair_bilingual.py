@@ -0,0 +1,154 @@
+import os, re, argparse
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+import translate_epub
+import metrics
+from rate_limit import RateLimiter
+
+# --- CONFIGURATION ---
+RPM = 5          # Same quota translate_epub works under
+WORKERS = 4      # Repair requests in flight at once
+ORIGINAL_RE = re.compile(r"<div class='original-text'>\n### SECTION (\d+) ORIGINAL\n(.*?)\n</div>\n", re.DOTALL)
+DETAILS_RE = re.compile(r"\n<details><summary>Translation</summary>\n<div class='translation-content'>(.*?)</div>\n</details>\n",
+                        re.DOTALL)
+
+
+def diagnose(chunk):
+    """(section number, source text, reason) for a text section whose translation needs redoing, else None."""
+    if "### EXTRACTED HEADER:" in chunk:
+        return None
+    original = ORIGINAL_RE.search(chunk)
+    if not original:
+        return None
+    details = DETAILS_RE.search(chunk, original.end())
+    if not details:
+        reason = "missing"
+    else:
+        text = re.sub(r"<[^>]+>", " ", details.group(1))
+        if not text.strip():
+            reason = "empty"
+        elif translate_epub.ARTIFACT_RE.search(text):
+            reason = "artifact"
+        else:
+            return None
+    soup = BeautifulSoup(original.group(2), "html.parser")
+    for header in soup.find_all("h3", class_="canto-header"):
+        header.decompose()  # Inserted by augment_bilingual_text, not part of the source
+    return int(original.group(1)), soup.get_text().strip(), reason
+
+def splice(chunk, translation_html):
+    """The chunk with its translation block replaced, or inserted after the original if it had none."""
+    original = ORIGINAL_RE.search(chunk)
+    details = DETAILS_RE.search(chunk, original.end())
+    if details:
+        return chunk[:details.start()] + translation_html + chunk[details.end():]
+    return chunk[:original.end()] + translation_html + chunk[original.end():]
+
+def boundary_map(old_chunks, new_chunks):
+    """Old byte offset -> new byte offset at the end of every divider, for moving a resume offset."""
+    divider = len(translate_epub.DIVIDER.encode("utf-8"))
+    moves, old_pos, new_pos = {}, 0, 0
+    for old, new in zip(old_chunks[:-1], new_chunks[:-1]):
+        old_pos += len(old.encode("utf-8")) + divider
+        new_pos += len(new.encode("utf-8")) + divider
+        moves[old_pos] = new_pos
+    return moves
+
+def track_variant(bilingual_path):
+    """The variant of a <book>_<variant>_Bilingual.txt track, or None for the main file."""
+    return next((v for v in translate_epub.VARIANTS if bilingual_path.endswith(f"_{v}_Bilingual.txt")), None)
+
+def update_progress(bilingual_path, moves):
+    """
+    Keeps an unfinished translation resumable: its saved offset points into
+    the old file, so it is moved to the same section boundary in the new one.
+    """
+    track = track_variant(bilingual_path)
+    epub_path = bilingual_path.replace(f"_{track}_Bilingual.txt" if track else "_Bilingual.txt", ".epub")
+    idx, offset, number = translate_epub.load_progress(epub_path)
+    tracks = translate_epub.load_track_offsets(epub_path)
+    old = tracks.get(track) if track else offset
+    if old is None:
+        return
+    if old not in moves:
+        print(f"[!] Saved offset {old} is not a section boundary; resume state left as is.")
+        return
+    if track:
+        tracks[track] = moves[old]
+    else:
+        offset = moves[old]
+    translate_epub.save_progress(epub_path, idx, offset, number, tracks)
+
+def repair(bilingual_path, workers=WORKERS, rpm=RPM, check_only=False, variant=None):
+    """
+    Finds sections with missing, empty or artifact-laden translations,
+    re-requests only those (concurrently, under one rate limit) and rewrites
+    the file atomically with the new translations spliced in. Returns the
+    gaps found as (section number, reason). Variant tracks are repaired
+    with their own prompt; `variant` overrides the one read from the name.
+    """
+    with metrics.stage("scan"):
+        with open(bilingual_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        chunks = content.split(translate_epub.DIVIDER)
+        gaps = [(i, *found) for i, chunk in enumerate(chunks) if (found := diagnose(chunk))]
+    reasons = {}
+    for _, number, _, reason in gaps:
+        reasons.setdefault(reason, []).append(number)
+    print(f"[*] {bilingual_path}: {len(gaps)} sections to repair" +
+          "".join(f"\n    {reason}: {', '.join(map(str, numbers))}" for reason, numbers in reasons.items()))
+    if check_only or not gaps:
+        return [(number, reason) for _, number, _, reason in gaps]
+
+    align_sentences = "<p class='aligned'" in content  # Repair in the file's own format
+    variant = variant or track_variant(bilingual_path) or "summary"
+    limiter = RateLimiter(rpm)
+
+    def fix(gap):
+        i, number, source, _ = gap
+        try:
+            limiter.wait()
+            # refresh: the memory may hold the very translation being repaired
+            translation = translate_epub.translate_variants(source, [variant], align_sentences, refresh=True)[variant]
+            print(f"[*] Section {number} repaired.", flush=True)
+            return i, translation
+        except Exception as e:
+            print(f"[!] Section {number} still failing: {e}", flush=True)
+            return i, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(fix, gaps))
+
+    repaired = list(chunks)
+    for i, translation in results:
+        if translation:
+            repaired[i] = splice(chunks[i], translate_epub.format_translation(translation))
+    fixed = sum(1 for _, translation in results if translation)
+    if fixed:
+        with metrics.stage("write"):
+            tmp = bilingual_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(translate_epub.DIVIDER.join(repaired))
+            os.replace(tmp, bilingual_path)
+            update_progress(bilingual_path, boundary_map(chunks, repaired))
+    print(f"[*] Repaired {fixed} of {len(gaps)} sections.")
+    return [(number, reason) for _, number, _, reason in gaps]
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Re-translate the missing, empty or garbled sections of a bilingual file.")
+    parser.add_argument("input", help="A _Bilingual.txt file (not while its translation is running)")
+    parser.add_argument("--check", action="store_true", help="Only list the sections that need repair")
+    parser.add_argument("--rpm", type=int, default=RPM)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--variant", default=None, help="Output variant the file holds (default: from its name, else summary)")
+    parser.add_argument("--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+    args = parser.parse_args(argv)
+    with metrics.run("repair_bilingual", args.metrics):
+        gaps = repair(args.input, args.workers, args.rpm, args.check, args.variant)
+    if args.check and gaps:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,128 @@
+import re, html, math, argparse
+
+# --- CONFIGURATION ---
+# Gale & Church (1993): bead priors and the variance of target length per source character.
+# The expected length ratio is taken from the paragraph itself, since a contemporary
+# English rendering is rarely the same length as the original.
+BEAD_PRIORS = {(1, 1): 0.89, (1, 0): 0.0099, (0, 1): 0.0099, (2, 1): 0.089, (1, 2): 0.089, (2, 2): 0.011}
+VARIANCE = 6.8
+ABBREVIATIONS = {"m", "mm", "mme", "mlle", "mr", "mrs", "ms", "dr", "st", "sr", "sra", "sig", "etc", "cf", "vol", "ch"}
+NOT_INITIALS = {"I"}  # One-letter words that end sentences ("So was I.")
+BOUNDARY_RE = re.compile(r"([.!?…]+(?:\s?[»\"”’')\]])*)\s+")
+PAIR_RE = re.compile(r"<p class='aligned' data-source=\"([^\"]*)\"><i>(.*?)</i></p>", re.DOTALL)
+ALIGNED_SECTION_RE = re.compile(r"<div class='original-text'>(?:(?!</div>).)*</div>\s*<details><summary>Translation</summary>\s*"
+                                r"<div class='translation-content'>((?:<p class='aligned'.*?</p>)+)</div>\s*</details>",
+                                re.DOTALL)
+
+
+def split_sentences(text):
+    """
+    Splits prose into sentences at . ! ? … followed by a capitalized word,
+    skipping common abbreviations and capital initials.
+    """
+    pieces = BOUNDARY_RE.split(" ".join(text.split()))
+    sentences, current = [], ""
+    for i in range(0, len(pieces), 2):
+        current += pieces[i] + (pieces[i + 1] if i + 1 < len(pieces) else "")
+        following = pieces[i + 2] if i + 2 < len(pieces) else ""
+        last_word = pieces[i].rsplit(" ", 1)[-1]
+        initial = len(last_word) == 1 and last_word.isupper() and last_word not in NOT_INITIALS  # "J. Smith"
+        if following and (following[0].islower() or last_word.lower() in ABBREVIATIONS or initial):
+            current += " "
+            continue
+        if current.strip():
+            sentences.append(current.strip())
+        current = ""
+    return sentences
+
+def bead_cost(source_len, target_len, ratio, prior):
+    """-log P(bead) for a bead covering source_len and target_len characters."""
+    if source_len == 0 and target_len == 0:
+        return 0.0
+    mean = (source_len + target_len / ratio) / 2
+    delta = (target_len - source_len * ratio) / math.sqrt(max(mean, 1) * VARIANCE)
+    probability = math.erfc(abs(delta) / math.sqrt(2))  # Two-tailed normal tail
+    return -math.log(max(probability, 1e-300) * prior)
+
+def align(source, target):
+    """
+    Pairs two lists of sentences with Gale-Church dynamic programming over
+    1-1, 1-0, 0-1, 2-1, 1-2 and 2-2 beads. Returns [(source text, target text)].
+    Sentences left without a partner are joined to the neighbouring pair, so
+    every pair has text on both sides whenever both lists are non-empty.
+    """
+    if not source or not target:
+        return [(" ".join(source), " ".join(target))] if source or target else []
+    src_len = [len(s) for s in source]
+    tgt_len = [len(t) for t in target]
+    ratio = sum(tgt_len) / max(sum(src_len), 1)
+    n, m = len(source), len(target)
+    cost = [[math.inf] * (m + 1) for _ in range(n + 1)]
+    back = [[None] * (m + 1) for _ in range(n + 1)]
+    cost[0][0] = 0.0
+    for i in range(n + 1):
+        for j in range(m + 1):
+            if cost[i][j] == math.inf:
+                continue
+            for (di, dj), prior in BEAD_PRIORS.items():
+                ni, nj = i + di, j + dj
+                if ni > n or nj > m:
+                    continue
+                c = cost[i][j] + bead_cost(sum(src_len[i:ni]), sum(tgt_len[j:nj]), ratio, prior)
+                if c < cost[ni][nj]:
+                    cost[ni][nj], back[ni][nj] = c, (di, dj)
+
+    beads = []
+    i, j = n, m
+    while i or j:
+        di, dj = back[i][j]
+        beads.append((source[i - di:i], target[j - dj:j]))
+        i, j = i - di, j - dj
+    beads.reverse()
+
+    pairs = []
+    for src, tgt in beads:
+        if pairs and (not src or not tgt or not pairs[-1][0] or not pairs[-1][1]):
+            pairs[-1] = (pairs[-1][0] + src, pairs[-1][1] + tgt)
+        else:
+            pairs.append((src, tgt))
+    return [(" ".join(src), " ".join(tgt)) for src, tgt in pairs]
+
+def format_pairs(pairs):
+    """translation-content paragraphs for aligned pairs; the source sentence rides along in data-source."""
+    return "".join(f"<p class='aligned' data-source=\"{html.escape(src, quote=True)}\"><i>{tgt}</i></p>"
+                   for src, tgt in pairs)
+
+def parse_pairs(translation_html):
+    """[(source, translation)] from a translation-content block written by format_pairs, or []."""
+    return [(html.unescape(src), re.sub(r"<[^>]+>", "", tgt).strip()) for src, tgt in PAIR_RE.findall(translation_html)]
+
+def interlinear_html(section):
+    """
+    Rewrites aligned sections of bilingual text as interlinear pairs, each source
+    sentence directly above its translation. Other sections are left alone.
+    """
+    def render(match):
+        rows = "".join(f"<p class='pair'><span class='original-text'>{html.escape(src)}</span>"
+                       f"<span class='translation-content'>{tgt}</span></p>"
+                       for src, tgt in parse_pairs(match.group(1)))
+        return f"<div class='interlinear'>{rows}</div>"
+    return ALIGNED_SECTION_RE.sub(render, section)
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Align the sentences of a text with its translation.")
+    parser.add_argument("source", help="Plain-text original")
+    parser.add_argument("target", help="Plain-text translation (one sentence per line, or prose)")
+    args = parser.parse_args(argv)
+    with open(args.source, "r", encoding="utf-8") as f:
+        source = split_sentences(f.read())
+    with open(args.target, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    target = lines if len(lines) > 1 else split_sentences(" ".join(lines))
+    for src, tgt in align(source, target):
+        print(f"{src}\n    {tgt}\n")
+
+
+if __name__ == "__main__":
+    cli()
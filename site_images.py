@@ -0,0 +1,227 @@
+import hashlib
+import io
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+import ebooklib
+from bs4 import BeautifulSoup
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional: without it images are copied through unresized
+    Image = None
+
+# --- CONFIGURATION ---
+VARIANT_DIR = "Illustrations/variants"
+EPUB_IMAGE_DIR = "Illustrations/epub"
+VARIANT_WIDTHS = (320, 640, 1024)
+VARIANT_FORMATS = (("webp", "image/webp"), ("jpg", "image/jpeg"))
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+HEADER_SIZES = "(max-width: 768px) 100vw, 500px"
+INLINE_SIZES = "(max-width: 768px) 100vw, 800px"
+
+def image_hash(data):
+    """Short content hash used to name cached variants."""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def variant_path(digest, width, ext):
+    return f"{VARIANT_DIR}/{digest}-{width}.{ext}"
+
+def render_variants(data, output_folder, digest, widths):
+    """Worker: writes every missing WebP/JPEG variant of one image. Returns the number written."""
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    written = 0
+    for width in widths:
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+        for ext, _ in VARIANT_FORMATS:
+            path = os.path.join(output_folder, variant_path(digest, width, ext))
+            if os.path.exists(path):
+                continue
+            tmp_path = path + ".tmp"
+            if ext == "jpg":
+                flat = resized
+                if resized.mode in ("RGBA", "LA", "P"):
+                    flat = Image.new("RGB", resized.size, "white")
+                    rgba = resized.convert("RGBA")
+                    flat.paste(rgba, mask=rgba.split()[-1])
+                flat.convert("RGB").save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            else:
+                webp = resized if resized.mode in ("RGB", "RGBA") else resized.convert("RGBA")
+                webp.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=6)
+            os.replace(tmp_path, path)
+            written += 1
+    return written
+
+
+class ImagePipeline:
+    """
+    Collects chapter illustrations and images embedded in the source EPUB,
+    plans resized WebP/JPEG variants for each, and renders the missing ones in
+    a process pool. Variants are named by source hash, so a rerun over the same
+    images finds everything cached and does no work.
+    """
+    def __init__(self, book, output_folder, writer, workers=None):
+        self.output_folder = output_folder
+        self.writer = writer
+        self.workers = workers
+        self.epub_images = {item.file_name: item for item in book.get_items_of_type(ebooklib.ITEM_IMAGE)}
+        self.pending = {}   # digest -> (data, widths)
+        self.originals = {}  # digest -> (rel_path, data, user_supplied) for images whose variants failed
+        self.failed = set()
+        self.referenced = set()
+        if Image is None:
+            print("[!] Pillow not installed; images will be used at full size.")
+
+    def _plan(self, data, fallback_rel_path, user_supplied=False):
+        """
+        Registers an image and returns (digest, widths); widths is empty when no
+        variants can be made. User-supplied files are used in place and never
+        written or tracked by the site writer, so incremental runs cannot prune them.
+        """
+        digest = image_hash(data)
+        self.originals[digest] = (fallback_rel_path, data, user_supplied)
+        if Image is None:
+            self._copy_original(digest)
+            return digest, ()
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                source_width = img.width
+        except Exception as e:
+            print(f"[!] Unreadable image {fallback_rel_path}: {e}")
+            self._copy_original(digest)
+            return digest, ()
+
+        # Never upscale: keep the widths that fit plus the original width as the largest candidate
+        widths = tuple(sorted({*(w for w in VARIANT_WIDTHS if w < source_width), min(source_width, VARIANT_WIDTHS[-1])}))
+        for width in widths:
+            for ext, _ in VARIANT_FORMATS:
+                self.referenced.add(variant_path(digest, width, ext))
+        self.pending[digest] = (data, widths)
+        return digest, widths
+
+    def picture_html(self, data, fallback_rel_path, alt, sizes, user_supplied=False):
+        """Returns <picture> markup with srcset for the image (or a plain <img> without Pillow)."""
+        digest, widths = self._plan(data, fallback_rel_path, user_supplied)
+        if not widths:
+            return f'<img src="{fallback_rel_path}" alt="{alt}" loading="lazy">'
+        srcsets = {ext: ", ".join(f"{variant_path(digest, w, ext)} {w}w" for w in widths) for ext, _ in VARIANT_FORMATS}
+        default_src = variant_path(digest, widths[min(1, len(widths) - 1)], "jpg")
+        return (f'<picture data-image="{digest}"><source type="image/webp" srcset="{srcsets["webp"]}" sizes="{sizes}">'
+                f'<img src="{default_src}" srcset="{srcsets["jpg"]}" sizes="{sizes}" alt="{alt}" loading="lazy"></picture>')
+
+    def resolve(self, html):
+        """
+        Swaps the <picture> of each image whose variants could not be rendered
+        for a plain <img> of the original file. Call on page markup after run().
+        """
+        if not self.failed or "data-image=" not in html:
+            return html
+        soup = BeautifulSoup(html, "html.parser")
+        for picture in soup.find_all("picture", attrs={"data-image": True}):
+            digest = picture["data-image"]
+            if digest in self.failed:
+                img = picture.find("img")
+                alt = img.get("alt", "") if img else ""
+                picture.replace_with(BeautifulSoup(f'<img src="{self.originals[digest][0]}" alt="{alt}" loading="lazy">',
+                                                   "html.parser"))
+        return str(soup)
+
+    def _resolve(self, item, src):
+        """Maps an <img src> inside a chapter to the EPUB image item it points at, if any."""
+        name = posixpath.normpath(posixpath.join(posixpath.dirname(item.file_name), src))
+        return name if name in self.epub_images else None
+
+    def embedded_images(self, item, html):
+        """Returns the EPUB file names of the images a chapter references, in document order."""
+        names = []
+        for img in BeautifulSoup(html, "html.parser").find_all("img"):
+            name = self._resolve(item, img.get("src", ""))
+            if name:
+                names.append(name)
+        return names
+
+    def header_html(self, count, chapter_title, embedded):
+        """
+        Illustration for the chapter header: a hand-made Illustrations/Chap_N_illus.png
+        if one exists in the output folder, else the first image embedded in the chapter.
+        Returns (html, name of the embedded image used or None).
+        """
+        alt = f"Illustration for {chapter_title}"
+        rel_path = f"Illustrations/Chap_{count}_illus.png"
+        illus_path = os.path.join(self.output_folder, rel_path)
+        if os.path.exists(illus_path):
+            with open(illus_path, "rb") as f:
+                data = f.read()
+            self.writer.untrack(rel_path)  # Listed by earlier runs, which wrote it back through the writer
+            return self.picture_html(data, rel_path, alt, HEADER_SIZES, user_supplied=True), None
+        if embedded:
+            name = embedded[0]
+            data = self.epub_images[name].get_content()
+            return self.picture_html(data, f"{EPUB_IMAGE_DIR}/{posixpath.basename(name)}", alt, HEADER_SIZES), name
+        return "", None
+
+    def rewrite_inline_images(self, html, item, header_image=None):
+        """
+        Replaces the chapter's <img> tags that point into the EPUB with responsive
+        markup. The image promoted to the header is dropped from the body so it is
+        not shown twice.
+        """
+        soup = BeautifulSoup(html, "html.parser")
+        for img in soup.find_all("img"):
+            name = self._resolve(item, img.get("src", ""))
+            if not name:
+                continue
+            if name == header_image:
+                img.decompose()
+                header_image = None
+                continue
+            data = self.epub_images[name].get_content()
+            picture = self.picture_html(data, f"{EPUB_IMAGE_DIR}/{posixpath.basename(name)}", img.get("alt", ""), INLINE_SIZES)
+            img.replace_with(BeautifulSoup(picture, "html.parser"))
+        return str(soup)
+
+    def _copy_original(self, digest):
+        """Makes the source image available at its fallback path (user-supplied files are already there)."""
+        rel_path, data, user_supplied = self.originals[digest]
+        if not user_supplied:
+            self.writer.write(rel_path, data)
+
+    def run(self):
+        """
+        Renders missing variants in a worker pool and prunes variants no page
+        references any more. Images that fail are served from their original
+        file; pass page markup through resolve() afterwards.
+        """
+        jobs = []
+        for digest, (data, widths) in self.pending.items():
+            missing = [w for w in widths for ext, _ in VARIANT_FORMATS
+                       if not os.path.exists(os.path.join(self.output_folder, variant_path(digest, w, ext)))]
+            if missing:
+                jobs.append((data, digest, sorted(set(missing))))
+
+        os.makedirs(os.path.join(self.output_folder, VARIANT_DIR), exist_ok=True)
+        written = 0
+        if jobs:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(render_variants, data, self.output_folder, digest, widths) for data, digest, widths in jobs]
+                for future, (data, digest, widths) in zip(futures, jobs):
+                    try:
+                        written += future.result()
+                    except Exception as e:
+                        # One odd image must not sink the site: its pages link the original file instead
+                        print(f"[!] Could not render variants of image {digest}: {e}; using the original.")
+                        self.failed.add(digest)
+                        self._copy_original(digest)
+
+        removed = 0
+        variant_dir = os.path.join(self.output_folder, VARIANT_DIR)
+        for name in os.listdir(variant_dir):
+            if f"{VARIANT_DIR}/{name}" not in self.referenced:
+                os.remove(os.path.join(variant_dir, name))
+                removed += 1
+
+        print(f"[*] Images: {len(self.pending)} sources, {written} variants rendered, "
+              f"{len(self.referenced) - written} cached, {removed} stale removed.")
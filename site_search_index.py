@@ -0,0 +1,249 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import unicodedata
+from collections import defaultdict
+from bs4 import BeautifulSoup
+
+# --- CONFIGURATION ---
+SEARCH_DIR = "search"
+PREFIX_LEN = 2                  # Shard key: first N characters of the folded term
+MAX_BUFFERED_POSTINGS = 200000  # Spill to disk past this many buffered postings
+MIN_TOKEN_LEN = 2
+
+# Small per-language stopword lists; enough to keep the biggest shards in check.
+STOPWORDS = {
+    "en": {"the", "and", "of", "to", "in", "a", "is", "it", "that", "he", "she", "was", "for", "on", "as", "with",
+           "his", "her", "at", "by", "be", "had", "have", "but", "not", "this", "from", "they", "you", "an", "or"},
+    "it": {"il", "lo", "la", "le", "gli", "di", "da", "in", "con", "su", "per", "tra", "fra", "che", "non", "un",
+           "una", "uno", "del", "della", "dei", "delle", "al", "alla", "ai", "si", "mi", "ti", "ne", "ed", "io"},
+    "fr": {"le", "la", "les", "de", "des", "du", "un", "une", "et", "en", "que", "qui", "ne", "pas", "il", "elle",
+           "je", "se", "sa", "son", "ses", "au", "aux", "dans", "pour", "par", "sur", "ce", "est", "avec"},
+    "es": {"el", "la", "los", "las", "de", "del", "y", "en", "que", "un", "una", "se", "no", "por", "con", "su",
+           "sus", "al", "lo", "como", "mas", "pero", "es", "le", "me", "mi", "ya", "para", "o"},
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def fold(text):
+    """Lowercases and strips diacritics so 'Città' and 'citta' index the same."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text, lang):
+    """Splits text into folded index terms for the given language."""
+    stop = STOPWORDS.get(lang, set())
+    for raw in TOKEN_RE.findall(text):
+        term = fold(raw)
+        if len(term) >= MIN_TOKEN_LEN and not term.isdigit() and term not in stop:
+            yield term
+
+def shard_key(term):
+    """Returns the shard a term lives in; short terms are padded so every key has PREFIX_LEN chars."""
+    return term[:PREFIX_LEN].ljust(PREFIX_LEN, "_")
+
+
+class SearchIndexBuilder:
+    """
+    Builds an inverted index over the original and translation text of each
+    chapter as the site is generated. Postings are buffered in memory and
+    spilled to per-shard run files, so memory stays bounded no matter how long
+    the book is; finish() merges one shard at a time.
+    """
+    def __init__(self, source_lang="en", translation_lang="en"):
+        self.source_lang = source_lang
+        self.translation_lang = translation_lang
+        self.work_dir = tempfile.mkdtemp(prefix="ltw_search_")
+        self.buffer = defaultdict(lambda: defaultdict(int))  # (track, lang, term) -> {(chapter, block): tf}
+        self.buffered = 0
+        self.chapters = []
+
+    def annotate_and_index(self, chapter_url, chapter_title, chapter_html):
+        """
+        Indexes one chapter and returns its HTML with passage anchors added to
+        each original/translation block so search results can link to them.
+        """
+        chapter_idx = len(self.chapters)
+        self.chapters.append([chapter_url, chapter_title])
+        soup = BeautifulSoup(chapter_html, "html.parser")
+
+        tracks = [
+            (self.source_lang, "o", soup.find_all(class_="original-text")),
+            (self.translation_lang, "t", soup.find_all(class_="translation-content")),
+        ]
+        if not tracks[0][2]:
+            # Plain EPUB without bilingual markup: index the paragraphs as the original track.
+            tracks[0] = (self.source_lang, "o", soup.find_all("p"))
+
+        for lang, tag, blocks in tracks:
+            for block_idx, block in enumerate(blocks):
+                block["id"] = f"passage-{tag}-{block_idx}"
+                for term in tokenize(block.get_text(" "), lang):
+                    postings = self.buffer[(tag, lang, term)]
+                    if (chapter_idx, block_idx) not in postings:
+                        self.buffered += 1
+                    postings[(chapter_idx, block_idx)] += 1
+
+        if self.buffered >= MAX_BUFFERED_POSTINGS:
+            self._spill()
+        return str(soup)
+
+    def _spill(self):
+        """
+        Appends buffered postings to per-shard run files and clears the buffer.
+        Original and translation get separate shards even when they share a
+        language, since their block ids count independently.
+        """
+        runs = defaultdict(list)
+        for (track, lang, term), postings in self.buffer.items():
+            key = shard_key(term)
+            for (chapter_idx, block_idx), tf in postings.items():
+                runs[(track, lang, key)].append(f"{term}\t{chapter_idx}\t{block_idx}\t{tf}\n")
+        for (track, lang, key), lines in runs.items():
+            os.makedirs(os.path.join(self.work_dir, track, lang), exist_ok=True)
+            with open(os.path.join(self.work_dir, track, lang, key + ".tsv"), "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        self.buffer.clear()
+        self.buffered = 0
+
+    def finish(self, writer):
+        """Merges the run files shard by shard and writes the compressed index through a SiteWriter."""
+        self._spill()
+        shards = {}  # "track/lang" -> shard keys
+        try:
+            for track in sorted(os.listdir(self.work_dir)):
+                for lang in sorted(os.listdir(os.path.join(self.work_dir, track))):
+                    keys = []
+                    for run_name in sorted(os.listdir(os.path.join(self.work_dir, track, lang))):
+                        key = run_name[:-len(".tsv")]
+                        shard = defaultdict(list)
+                        with open(os.path.join(self.work_dir, track, lang, run_name), "r", encoding="utf-8") as f:
+                            for line in f:
+                                term, chapter_idx, block_idx, tf = line.rstrip("\n").split("\t")
+                                shard[term].append([track, int(chapter_idx), int(block_idx), int(tf)])
+                        payload = json.dumps({t: sorted(p) for t, p in sorted(shard.items())}, separators=(",", ":"))
+                        writer.write(f"{SEARCH_DIR}/{track}/{lang}/{key}.json.gz",
+                                     gzip.compress(payload.encode("utf-8"), 9, mtime=0))
+                        keys.append(key)
+                    shards[f"{track}/{lang}"] = keys
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+        manifest = {
+            "version": 2,
+            "prefix_len": PREFIX_LEN,
+            "min_token_len": MIN_TOKEN_LEN,
+            "tracks": {"o": self.source_lang, "t": self.translation_lang},
+            "shards": shards,
+            "stopwords": {lang: sorted(STOPWORDS.get(lang, ())) for lang in {self.source_lang, self.translation_lang}},
+            "chapters": self.chapters,
+        }
+        writer.write(f"{SEARCH_DIR}/manifest.json", json.dumps(manifest, separators=(",", ":")))
+        writer.write("search.js", SEARCH_JS)
+        writer.write("search.html", SEARCH_PAGE)
+        print(f"[*] Search index: {len(self.chapters)} chapters, "
+              f"{sum(len(s) for s in shards.values())} shards across {', '.join(shards) or 'no tracks'}.")
+
+
+SEARCH_PAGE = """---
+layout: default
+title: "Search"
+css: test_style.css
+viewport: "width=device-width, initial-scale=1.0"
+---
+<h1 class="main-title">Search</h1>
+<input id="search-box" type="search" placeholder="Search the original or the translation" style="width: 100%; font-size: 1.2em;">
+<div id="search-results"></div>
+<script src="search.js"></script>
+"""
+
+# Client side: fold the query exactly like fold() above, fetch only the shards
+# for the query terms, and AND the postings together per passage.
+SEARCH_JS = r"""(function () {
+  var manifest = null;
+  var shardCache = {};
+
+  function fold(s) {
+    return s.toLowerCase().normalize('NFKD').replace(/[\u0300-\u036f]/g, '');
+  }
+  function terms(q, lang) {
+    var stop = manifest.stopwords[lang] || [];
+    return (fold(q).match(/[\p{L}\p{N}_]+/gu) || []).filter(function (t) {
+      return t.length >= manifest.min_token_len && !/^\d+$/.test(t) && !stop.includes(t);
+    });
+  }
+  function shardKey(t) {
+    var k = t.slice(0, manifest.prefix_len);
+    while (k.length < manifest.prefix_len) k += '_';
+    return k;
+  }
+  function loadShard(track, lang, key) {
+    var dir = track + '/' + lang;
+    var id = dir + '/' + key;
+    if (!(manifest.shards[dir] || []).includes(key)) return Promise.resolve({});
+    if (!shardCache[id]) {
+      shardCache[id] = fetch('search/' + id + '.json.gz').then(function (r) {
+        var enc = r.headers.get('Content-Encoding');
+        if (enc === 'gzip') return r.json();
+        return new Response(r.body.pipeThrough(new DecompressionStream('gzip'))).json();
+      });
+    }
+    return shardCache[id];
+  }
+  function searchTrack(track, q) {
+    var lang = manifest.tracks[track];
+    var qterms = terms(q, lang);
+    if (!qterms.length) return Promise.resolve([]);
+    return Promise.all(qterms.map(function (t) {
+      return loadShard(track, lang, shardKey(t)).then(function (s) { return s[t] || []; });
+    })).then(function (lists) {
+      var hits = null;
+      lists.forEach(function (postings) {
+        var next = {};
+        postings.forEach(function (p) {
+          var k = p[0] + ':' + p[1] + ':' + p[2];
+          if (hits === null || k in hits) next[k] = (hits ? hits[k] : 0) + p[3];
+        });
+        hits = next;
+      });
+      return Object.keys(hits || {}).map(function (k) {
+        var parts = k.split(':');
+        return { track: parts[0], chapter: +parts[1], block: +parts[2], score: hits[k] };
+      });
+    });
+  }
+  function render(results) {
+    var out = document.getElementById('search-results');
+    out.innerHTML = '';
+    results.sort(function (a, b) { return b.score - a.score || a.chapter - b.chapter || a.block - b.block; });
+    results.slice(0, 100).forEach(function (r) {
+      var ch = manifest.chapters[r.chapter];
+      var a = document.createElement('a');
+      a.href = ch[0] + '#passage-' + r.track + '-' + r.block;
+      a.textContent = ch[1] + (r.track === 'o' ? ' (original)' : ' (translation)') + ', passage ' + (r.block + 1);
+      var div = document.createElement('div');
+      div.className = 'search-hit';
+      div.appendChild(a);
+      out.appendChild(div);
+    });
+    if (!results.length) out.textContent = 'No matches.';
+  }
+  function run(q) {
+    Promise.all([searchTrack('o', q), searchTrack('t', q)]).then(function (r) {
+      render(r[0].concat(r[1]));
+    });
+  }
+  fetch('search/manifest.json').then(function (r) { return r.json(); }).then(function (m) {
+    manifest = m;
+    var box = document.getElementById('search-box');
+    var timer = null;
+    box.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () { run(box.value); }, 250);
+    });
+  });
+})();
+"""
@@ -0,0 +1,155 @@
+import os, re, json, mmap, argparse
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+INDEX_SUFFIX = ".index.json"   # Sidecar written next to the bilingual file
+INDEX_VERSION = 1
+
+# One scan finds every divider, section marker and header. Alternatives are tried in order,
+# so the section marker wins over the bare ORIGINAL that build_audio counts segments by.
+TOKEN_RE = re.compile(rb"(?P<divider>={40})"
+                      rb"|### SECTION (?P<section>\d+) ORIGINAL"
+                      rb"|(?P<original>ORIGINAL)"
+                      rb"|<h3 class='canto-header'>(?P<canto>.*?)</h3>"
+                      rb"|### EXTRACTED HEADER: (?P<chapter>[^\n]*)")
+TITLE_RE = re.compile(rb"TITLE: ([^\n]*)")
+AUTHOR_RE = re.compile(rb"AUTHOR: ([^\n]*)")
+
+
+class StructureIndex:
+    """
+    Where things are in a bilingual file, by byte offset:
+      segments: [start, end, section number] for every divider-delimited chunk
+                containing an ORIGINAL block, in file order (build_audio's segments)
+      cantos:   {name, start, end, offset} from the canto headers augment_bilingual_text inserts
+      chapters: {name, start, end, offset} from translate_epub's EXTRACTED HEADER lines
+    start/end are section numbers, offset is the header's byte position.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.segments = data["segments"]
+        self.cantos = data["cantos"]
+        self.chapters = data["chapters"]
+        self.title = data.get("title") or "Unknown"
+        self.author = data.get("author") or "Unknown"
+
+    def canto(self, name):
+        """Finds a canto by name; '•' and '*' separators are interchangeable."""
+        wanted = name.replace(" • ", " * ")
+        return next((c for c in self.cantos if c["name"] == wanted), None)
+
+    def segment_for_section(self, number):
+        """Position (1-based, as build_audio counts) of the segment holding section `number`."""
+        for i, (_, _, section) in enumerate(self.segments, start=1):
+            if section == number:
+                return i
+        return None
+
+
+def index_path(bilingual_path):
+    return bilingual_path + INDEX_SUFFIX
+
+def file_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+@contextmanager
+def mapped(path):
+    """Read-only mmap of a file (None for an empty one, which cannot be mapped)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+def close_ranges(entries, last_section):
+    """Each entry ends at the section before the next one starts; the last runs to the end of the file."""
+    for entry, following in zip(entries, entries[1:] + [None]):
+        entry["end"] = following["start"] - 1 if following else last_section
+
+def build_index(bilingual_path):
+    """Scans the bilingual file once and returns the index data."""
+    segments, cantos, chapters = [], [], []
+    title = author = None
+    with mapped(bilingual_path) as mm:
+        if mm is not None:
+            chunk_start, has_original, number = 0, False, None
+            last_section = 0
+            waiting = []  # Chapter headers not yet followed by a section
+            for match in TOKEN_RE.finditer(mm):
+                kind = match.lastgroup
+                if kind == "divider":
+                    if has_original:
+                        segments.append([chunk_start, match.start(), number])
+                    chunk_start, has_original, number = match.end(), False, None
+                elif kind == "section":
+                    has_original, number = True, int(match.group("section"))
+                    last_section = number
+                    for chapter in waiting:
+                        chapter["start"] = number
+                    waiting = []
+                elif kind == "original":
+                    has_original = True
+                elif kind == "canto":
+                    # The header sits inside the first section of its canto
+                    name = match.group("canto").decode("utf-8").replace(" • ", " * ")
+                    cantos.append({"name": name, "start": last_section, "offset": match.start()})
+                else:
+                    # Chapter headers come before their first section
+                    name = match.group("chapter").decode("utf-8").strip()
+                    chapters.append({"name": name, "start": None, "offset": match.start()})
+                    waiting.append(chapters[-1])
+            if has_original:
+                segments.append([chunk_start, len(mm), number])
+            chapters = [c for c in chapters if c["start"] is not None]
+            close_ranges(cantos, last_section)
+            close_ranges(chapters, last_section)
+            found = TITLE_RE.search(mm)
+            title = found.group(1).decode("utf-8").strip() if found else None
+            found = AUTHOR_RE.search(mm)
+            author = found.group(1).decode("utf-8").strip() if found else None
+    return {"version": INDEX_VERSION, "source": file_stamp(bilingual_path), "title": title, "author": author,
+            "segments": segments, "cantos": cantos, "chapters": chapters}
+
+def load_index(bilingual_path, rebuild=False):
+    """
+    Returns the StructureIndex for a bilingual file, reading the sidecar when
+    it matches the file's size and modification time and rebuilding it
+    (one scan) otherwise.
+    """
+    path = index_path(bilingual_path)
+    if not rebuild and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == INDEX_VERSION and data.get("source") == file_stamp(bilingual_path):
+            return StructureIndex(data)
+    data = build_index(bilingual_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+    return StructureIndex(data)
+
+def iter_segment_text(bilingual_path, index, first=1):
+    """Yields (position, chunk text) for segments from position `first` on, reading only their bytes."""
+    with mapped(bilingual_path) as mm:
+        first = max(first, 1)
+        for i, (start, end, _) in enumerate(index.segments[first - 1:], start=first):
+            yield i, mm[start:end].decode("utf-8")
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Build or show the structure index of a bilingual file.")
+    parser.add_argument("input", help="A _Bilingual.txt file")
+    parser.add_argument("--rebuild", action="store_true", help="Rescan even if the sidecar is current")
+    args = parser.parse_args(argv)
+    index = load_index(args.input, args.rebuild)
+    print(f"[*] {index_path(args.input)}: {len(index.segments)} segments, {len(index.cantos)} cantos, "
+          f"{len(index.chapters)} chapters")
+    for entry in index.cantos or index.chapters:
+        print(f"    {entry['name']}: sections {entry['start']}-{entry['end']} @ byte {entry['offset']}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,33 +1,51 @@
-import sys, os, time, ebooklib, argparse, re
+import worker_daemon
+worker_daemon.delegate(__name__, __file__)  # Run in the warm worker daemon if one is up
+import sys, os, time, json, ebooklib, argparse, re
+from contextlib import contextmanager
 import backoff  # New import for handling rate limits
 from ebooklib import epub
 from bs4 import BeautifulSoup
 from google import genai
 from google.genai import errors # New import for specific error handling
+from google.genai import types
+import metrics
+import cassette
+import sentence_align
+import translation_memory
 
 # --- CONFIGURATION ---
 API_KEY = os.environ.get("GEMINI_API_KEY")
 #MODEL_ID = "gemini-2.0-flash"
 MODEL_ID = "gemini-2.5-flash"
 
-PROGRESS_FILE = ".translation_progress"
-client = genai.Client(api_key=API_KEY)
+STATE_SUFFIX = ".state"        # <book>.state/ holds that book's resume state
+PROGRESS_FILE = "translation_progress.json"
+THROTTLE_SECONDS = 12  # Pause after each section to stay under 5 RPM
+client = cassette.lazy_gemini_client(lambda: genai.Client(api_key=API_KEY))  # Built on first request
 
 # --- BACKOFF INTEGRATION ---
 # This decorator will retry the function if a 429 error occurs.
 # It uses exponential backoff (2s, 4s, 8s...) up to 5 times.
-backoff.on_exception(
+@backoff.on_exception(
     backoff.expo,
     errors.ClientError,
     giveup=lambda e: e.code != 429,
     max_tries=10,        # Increase tries to wait through longer lockout periods
-    max_time=300         # Allow it to wait up to 5 minutes total if needed
+    max_time=300,        # Allow it to wait up to 5 minutes total if needed
+    on_backoff=metrics.on_backoff
 )
-
-
-def call_gemini_with_backoff(prompt):
+def call_gemini_with_backoff(prompt, **config):
     """Wrapper to handle API calls with automatic retries for rate limits."""
-    return client.models.generate_content(model=MODEL_ID, contents=prompt)
+    if glossary is not None:
+        prompt, config = glossary.apply(prompt, config)
+    with metrics.request(MODEL_ID) as call:
+        if config:
+            response = client.models.generate_content(model=MODEL_ID, contents=prompt,
+                                                      config=types.GenerateContentConfig(**config))
+        else:
+            response = client.models.generate_content(model=MODEL_ID, contents=prompt)
+        call.usage(response)
+    return response
 
 def clean_ai_response(text):
     artifacts = ["Here's my attempt", "Here is the translation", "Translation:", "Contemporary English:"]
@@ -36,86 +54,372 @@ def clean_ai_response(text):
         cleaned = re.sub(f"(?i)^{artifact}.*?[:\\n]", "", cleaned)
     return cleaned.strip()
 
+# Preambles clean_ai_response did not catch, leaked reasoning, refusals and code fences
+ARTIFACT_RE = re.compile(r"(?i)here'?s my attempt|here is the (?:translation|summary)|contemporary english:|enough thinking"
+                         r"|^\s*(?:translation|summary):|^\s*(?:i'?m sorry|i am sorry|as an ai\b|i cannot (?:help|provide|translate))"
+                         r"|```")
+
 def is_strict_chapter(text):
     pattern_with_word = r"^\s*chapter\s+[ivxlcdm]+\s*$"
     pattern_standalone = r"^\s*[ivxlcdm]+\s*$"
     val = text.lower().strip()
     return bool(re.match(pattern_with_word, val) or re.match(pattern_standalone, val))
 
-def run_interleaved_translation(epub_path, section_limit=None, chapter_limit=None, min_sect_length=500, break_at_p_tags=False, chapter_tags="h1,h2,h3"):
-    book = epub.read_epub(epub_path)
-    out_file = epub_path.replace(".epub", "_Bilingual.txt")
-    tags_to_watch = [t.strip().lower() for t in chapter_tags.split(",")]
-    
-    idx = 0
-    translated_count = 0
-    chapters_processed = 0
+DIVIDER = "\n========================================\n"
+SECTION_PROMPT = "Summarize this in contemporary English. Only provide the summary:\n\n{text}"
+SENTENCE_PROMPT = ("Render this in contemporary English, sentence by sentence and in the same order. "
+                   "Put each sentence on its own line. Only provide the rendering:\n\n{text}")
+ADJUST_PROMPT = ("Below is a passage, a nearly identical earlier passage, and the contemporary English written for "
+                 "the earlier one. Adjust that English so it fits the new passage, changing only what differs. "
+                 "Keep its layout. Only provide the adjusted English.\n\nEARLIER PASSAGE:\n{old_source}\n\n"
+                 "EARLIER ENGLISH:\n{old_translation}\n\nNEW PASSAGE:\n{text}")
+# Output variants for --variants: name -> what to produce. The first variant listed goes to
+# <book>_Bilingual.txt, every other one to its own <book>_<variant>_Bilingual.txt track.
+VARIANTS = {
+    "summary": "Summarize this in contemporary English.",
+    "literal": "Translate this into English as closely and literally as readable English allows, sentence by sentence.",
+    "plain": "Retell this in short, plain English sentences for a first-time reader.",
+}
+VARIANT_PROMPT = "{instructions} Only provide it:\n\n{text}"
+VARIANTS_PROMPT = "For the text below, return JSON with one field per version:\n{fields}\n\nText:\n{text}"
+memory = None  # translation_memory.TranslationMemory when --memory (or LTW_TRANSLATION_MEMORY) is set
+reused_sections = 0  # Sections answered from memory without a request
+glossary = None  # book_glossary.BookContext when --glossary is set
+
+def format_original(number, element_html):
+    return f"\n<div class='original-text'>\n### SECTION {number} ORIGINAL\n{element_html}\n</div>\n"
+
+def format_translation(sanitized):
+    if isinstance(sanitized, list):
+        return f"\n<details><summary>Translation</summary>\n<div class='translation-content'>{sentence_align.format_pairs(sanitized)}</div>\n</details>\n"
+    fmt = "".join([f"<p><i>{line.strip()}</i></p>" for line in sanitized.split('\n') if line.strip()])
+    return f"\n<details><summary>Translation</summary>\n<div class='translation-content'>{fmt}</div>\n</details>\n"
+
+def format_section(section, translation=None):
+    """Everything written to the bilingual file for one header or text section."""
+    out = format_original(section["number"], section["html"])
+    if section["kind"] == "header":
+        out += f"\n### EXTRACTED HEADER: {section['text']}\n"
+    elif translation is not None:
+        out += format_translation(translation)
+    return out + DIVIDER
+
+def state_dir(epub_path):
+    return os.path.splitext(epub_path)[0] + STATE_SUFFIX
+
+def progress_path(epub_path):
+    return os.path.join(state_dir(epub_path), PROGRESS_FILE)
+
+def load_progress(epub_path):
+    """
+    Returns (next document index, bilingual file size at that point, sections
+    numbered so far), or (0, None, 0) for a fresh start.
+    """
+    path = progress_path(epub_path)
+    if not os.path.exists(path):
+        return 0, None, 0
+    with open(path, "r") as f:
+        state = json.load(f)
+    return state["item_index"], state.get("offset"), state.get("section_number", 0)
+
+def load_track_offsets(epub_path):
+    """{variant: offset} for the extra variant tracks of a resumable run."""
+    path = progress_path(epub_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f).get("tracks", {})
+
+def save_progress(epub_path, item_index, offset, section_number, tracks=None):
+    """Records that documents before item_index are complete and the output ends at offset."""
+    os.makedirs(state_dir(epub_path), exist_ok=True)
+    state = {"item_index": item_index, "offset": offset, "section_number": section_number}
+    if tracks:
+        state["tracks"] = tracks
+    tmp = progress_path(epub_path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, progress_path(epub_path))
+
+def resume_output(epub_path, out_file, track=None):
+    """
+    Opens the bilingual file for a (possibly resumed) run. Anything written
+    after the last completed document is cut off so it isn't duplicated.
+    Returns (file, start index, sections numbered before it). `track` names
+    an extra variant track, whose offset is saved separately.
+    """
+    idx, offset, number = load_progress(epub_path)
+    if track is not None:
+        offset = load_track_offsets(epub_path).get(track)
+    if idx and os.path.exists(out_file):
+        print(f"Resuming from index {idx}...")
+        if offset is not None and os.path.getsize(out_file) > offset:
+            with open(out_file, "r+b") as f:
+                f.truncate(offset)
+        return open(out_file, "a", encoding="utf-8"), idx, number
+    return open(out_file, "w", encoding="utf-8"), 0, 0
+
+def translate_text(text_content, align_sentences=False, refresh=False, limiter=None):
+    """
+    Sends one section to the model and returns the cleaned translation text.
+    With align_sentences the model answers one sentence per line, and the
+    result is a list of (source sentence, translation) pairs aligned locally.
+    With a translation memory, a near-identical earlier section is reused
+    as is or sent as a short adjust request instead; refresh (used by
+    repairs) always asks the model and replaces the stored translation.
+    Answers with artifacts are never stored. A rate_limit.RateLimiter is
+    waited on only when a request is actually sent.
+    """
+    kind = "sentences" if align_sentences else "section"
+    prompt = (SENTENCE_PROMPT if align_sentences else SECTION_PROMPT).format(text=text_content)
+    match = memory.lookup(text_content, kind) if memory is not None and not refresh else None
+    if match is not None and match.similarity >= memory.reuse:
+        global reused_sections
+        reused_sections += 1
+        metrics.count("memory_reused")
+        return finish_translation(text_content, match.translation, align_sentences)
+    if match is not None:
+        metrics.count("memory_adjusted")
+        prompt = ADJUST_PROMPT.format(old_source=match.source, old_translation=match.translation, text=text_content)
+    if limiter is not None:
+        limiter.wait()
+    translated = clean_ai_response(call_gemini_with_backoff(prompt).text)
+    if memory is not None and translated and not ARTIFACT_RE.search(translated):
+        memory.add(text_content, translated, kind, replace=refresh)
+    return finish_translation(text_content, translated, align_sentences)
+
+def finish_translation(text_content, translated, align_sentences):
+    if not align_sentences:
+        return translated
+    lines = [line.strip() for line in translated.split("\n") if line.strip()]
+    if len(lines) == 1:
+        lines = sentence_align.split_sentences(lines[0])
+    with metrics.stage("align"):
+        return sentence_align.align(sentence_align.split_sentences(text_content), lines)
+
+def variants_schema(variants):
+    """JSON response schema with one string field per variant."""
+    properties = {v: {"type": "STRING", "description": VARIANTS[v]} for v in variants}
+    return {"type": "OBJECT", "properties": properties, "required": list(properties)}
+
+def memory_kind(variant):
+    """Translation memory entries are kept apart per variant; the summary shares plain sections' entries."""
+    return "section" if variant == "summary" else variant
+
+def translate_variants(text_content, variants=("summary",), align_sentences=False, refresh=False):
+    """
+    Returns {variant: translation} for one section. Several variants come
+    back from a single structured request, so the section's input tokens are
+    paid once; separate requests are the fallback if the JSON can't be used.
+    With a translation memory, the section is reused when every variant is
+    stored at the reuse threshold; otherwise all variants are requested.
+    """
+    if list(variants) == ["summary"]:
+        return {"summary": translate_text(text_content, align_sentences, refresh)}
+    if memory is not None and not refresh:
+        matches = {v: memory.lookup(text_content, memory_kind(v)) for v in variants}
+        if all(match is not None and match.similarity >= memory.reuse for match in matches.values()):
+            global reused_sections
+            reused_sections += 1
+            metrics.count("memory_reused")
+            return {v: match.translation for v, match in matches.items()}
+    results = request_variants(text_content, variants)
+    if memory is not None:
+        for v, translated in results.items():
+            if translated and not ARTIFACT_RE.search(translated):
+                memory.add(text_content, translated, memory_kind(v), replace=refresh)
+    return results
+
+def request_variants(text_content, variants):
+    """{variant: translation} from the model: one plain request for a single variant, else one structured request."""
+    if len(variants) == 1:
+        if variants[0] == "summary":
+            prompt = SECTION_PROMPT.format(text=text_content)
+        else:
+            prompt = VARIANT_PROMPT.format(instructions=VARIANTS[variants[0]], text=text_content)
+        return {variants[0]: clean_ai_response(call_gemini_with_backoff(prompt).text)}
+    fields = "\n".join(f"{v}: {VARIANTS[v]}" for v in variants)
+    response = call_gemini_with_backoff(VARIANTS_PROMPT.format(fields=fields, text=text_content),
+                                        response_mime_type="application/json", response_schema=variants_schema(variants))
+    try:
+        result = json.loads(response.text)
+        return {v: clean_ai_response(result[v]) for v in variants}
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"[!] Structured call failed ({e}); falling back to separate prompts.", end=" ")
+        metrics.count("structured_fallbacks")
+        return {v: request_variants(text_content, [v])[v] for v in variants}
+
+def track_path(epub_path, variant=None):
+    """The bilingual file for a variant; None (or the first variant) is the usual _Bilingual.txt."""
+    if variant is None:
+        return epub_path.replace(".epub", "_Bilingual.txt")
+    return epub_path.replace(".epub", f"_{variant}_Bilingual.txt")
+
+def plain_translation(translation):
+    """The translation as one string, whether or not it was sentence-aligned."""
+    if isinstance(translation, list):
+        return " ".join(tgt for _, tgt in translation)
+    return " ".join(translation.split())
+
+def iter_sections(items, tags_to_watch, start_index=0, min_sect_length=500, break_at_p_tags=False, start_number=0):
+    """
+    Walks the EPUB documents from start_index and yields one dict per section
+    with the same numbering and segmentation as a translation run:
+      kind: 'header' (chapter_tags element), 'text' (to translate) or 'short' (below min length, not written)
+      number, html, text, is_chapter, item_index, item_last (True on the last section of a document).
+    A document with no sections yields a single 'empty' record so callers can advance progress.
+    Numbering continues from start_number when resuming.
+    """
+    translated_count = start_number
+    for i, item in enumerate(items[start_index:]):
+        current_index = start_index + i
+        soup = BeautifulSoup(item.get_content(), "html.parser")
+        records = []
+        for el in soup.find_all(['p'] + tags_to_watch):
+            text_content = el.get_text().strip()
+            if not text_content: continue
+            if el.name in tags_to_watch:
+                kind = "header"
+            elif break_at_p_tags or len(text_content) >= min_sect_length:
+                kind = "text"
+            else:
+                kind = "short"
+            translated_count += 1
+            records.append({"kind": kind, "number": translated_count, "html": str(el), "text": text_content,
+                            "is_chapter": kind == "header" and is_strict_chapter(text_content),
+                            "item_index": current_index, "item_last": False})
+        if not records:
+            records.append({"kind": "empty", "number": translated_count, "html": "", "text": "",
+                            "is_chapter": False, "item_index": current_index, "item_last": False})
+        records[-1]["item_last"] = True
+        yield from records
+
+@contextmanager
+def attached_glossary(epub_path, use_glossary):
+    """
+    Sends the book's glossary with every request for the duration of a run.
+    The global is always reset, and the cache deleted, even if the run fails,
+    so the next job in a warm daemon never inherits another book's glossary.
+    """
+    global glossary
+    glossary = None
+    if use_glossary:
+        import book_glossary  # It imports this module, so it is loaded on demand
+        glossary = book_glossary.open_context(epub_path)
+    try:
+        yield
+    finally:
+        if glossary is not None:
+            glossary.close()
+        glossary = None
+
+def run_interleaved_translation(epub_path, section_limit=None, chapter_limit=None, min_sect_length=500, break_at_p_tags=False, chapter_tags="h1,h2,h3", align_sentences=False, memory_path=None, variants=("summary",), use_glossary=False):
+    global memory
+    memory = translation_memory.open_memory(memory_path)
+    with attached_glossary(epub_path, use_glossary):
+        book = epub.read_epub(epub_path)
+        out_file = track_path(epub_path)
+        tags_to_watch = [t.strip().lower() for t in chapter_tags.split(",")]
     
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, "r") as f: 
-            idx = int(f.read().strip())
-            print(f"Resuming from index {idx}...")
-
-    items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
-
-    with open(out_file, "a" if idx > 0 else "w", encoding="utf-8") as f:
-        for i, item in enumerate(items[idx:]):
-            current_index = idx + i
-            soup = BeautifulSoup(item.get_content(), "html.parser")
-            elements = soup.find_all(['p'] + tags_to_watch)
-            
-            for el in elements:
-                text_content = el.get_text().strip()
-                if not text_content: continue
-
-                is_header_tag = el.name in tags_to_watch
+        chapters_processed = 0
+        items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+        if load_progress(epub_path)[0] and os.path.exists(out_file):
+            missing = [v for v in variants[1:] if v not in load_track_offsets(epub_path)]
+            if missing:
+                # A new track would start at the resume point and silently lack every earlier section
+                raise SystemExit(f"[!] Variant track(s) {', '.join(missing)} were not part of the interrupted run. "
+                                 f"Resume with the same --variants, or remove {state_dir(epub_path)} to start over.")
+        f, idx, number = resume_output(epub_path, out_file)
+        # Extra variant tracks are written in step with the main file
+        tracks = {v: resume_output(epub_path, track_path(epub_path, v), v)[0] for v in variants[1:]}
+        outputs = [f] + list(tracks.values())
+
+        with f:
+            for section in metrics.timed_iter(iter_sections(items, tags_to_watch, idx, min_sect_length, break_at_p_tags, number), "parse"):
+                if section["kind"] == "header":
+                    for out in outputs:
+                        out.write(format_section(section))
                 
-                if is_header_tag:
-                    f.write(f"\n<div class='original-text'>\n### SECTION {translated_count + 1} ORIGINAL\n{str(el)}\n</div>\n")
-                    f.write(f"\n### EXTRACTED HEADER: {text_content}\n")
-                    f.write(f"\n========================================\n")
-                    
-                    if is_strict_chapter(text_content):
+                    if section["is_chapter"]:
                         chapters_processed += 1
-                        print(f"Validated Chapter ({chapters_processed}/{chapter_limit}): {text_content}")
+                        print(f"Validated Chapter ({chapters_processed}/{chapter_limit}): {section['text']}")
                     else:
-                        print(f"Skipping (Non-Chapter Header): {text_content}")
-                else:
-                    if break_at_p_tags or len(text_content) >= min_sect_length:
-                        f.write(f"\n<div class='original-text'>\n### SECTION {translated_count + 1} ORIGINAL\n{str(el)}\n</div>\n")
-                        try:
-                            print(f"Translating section {translated_count + 1}...", end=" ", flush=True)
-                            prompt = f"Summarize this in contemporary English. Only provide the summary:\n\n{text_content}"
-                            
-                            # Use the new backoff wrapper instead of direct client call
-                            response = call_gemini_with_backoff(prompt)
-                            
-                            sanitized = clean_ai_response(response.text)
-                            fmt = "".join([f"<p><i>{line.strip()}</i></p>" for line in sanitized.split('\n') if line.strip()])
-                            f.write(f"\n<details><summary>Translation</summary>\n<div class='translation-content'>{fmt}</div>\n</details>\n")
+                        print(f"Skipping (Non-Chapter Header): {section['text']}")
+                elif section["kind"] == "text":
+                    for out in outputs:
+                        out.write(format_original(section["number"], section["html"]))
+                    try:
+                        print(f"Translating section {section['number']}...", end=" ", flush=True)
+                        reused = reused_sections
+                        # Use the new backoff wrapper instead of direct client call
+                        results = translate_variants(section["text"], variants, align_sentences)
+                        f.write(format_translation(results[variants[0]]))
+                        for v, out in tracks.items():
+                            out.write(format_translation(results[v]))
+                        if reused_sections > reused:
+                            print("Reused from memory.")
+                        else:
                             print("Done.")
-                            time.sleep(12)  # Mandatory 12-second pause to stay under 5 RPM
-                        except Exception as e:
-                            print(f"Error: {e}")
-                        f.write(f"\n========================================\n")
-                    
-                translated_count += 1
-                f.flush()
-
-                if chapter_limit and chapters_processed >= chapter_limit: break
-            if (chapter_limit and chapters_processed >= chapter_limit):
-                print("Chapter limit reached.")
-                break
-            with open(PROGRESS_FILE, "w") as pf: pf.write(str(current_index + 1))
+                            with metrics.stage("throttle"):
+                                time.sleep(THROTTLE_SECONDS)  # Mandatory pause to stay under 5 RPM
+                    except Exception as e:
+                        print(f"Error: {e}")
+                    for out in outputs:
+                        out.write(DIVIDER)
+                for out in outputs:
+                    out.flush()
 
-if __name__ == "__main__":
+                if chapter_limit and chapters_processed >= chapter_limit:
+                    print("Chapter limit reached.")
+                    break
+                if section["item_last"]:
+                    save_progress(epub_path, section["item_index"] + 1, f.tell(), section["number"],
+                                  {v: out.tell() for v, out in tracks.items()})
+        for out in tracks.values():
+            out.close()
+
+def cli(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input", required=True)
     parser.add_argument("-c", "--chapter_limit", type=int, default=None)
     parser.add_argument("-m", "--min_sect_length", type=int, default=500)
     parser.add_argument("--break_at_p_tags", action="store_true")
     parser.add_argument("--chapter_tags", type=str, default="h1,h2,h3")
-    
-    args = parser.parse_args()
-    run_interleaved_translation(args.input, None, args.chapter_limit, args.min_sect_length, args.break_at_p_tags, args.chapter_tags)
-    
+    parser.add_argument("--align_sentences", action="store_true", help="One request per section, aligned locally into sentence pairs")
+    parser.add_argument("--memory", default=None, help="Translation memory database shared across volumes and editions")
+    parser.add_argument("--variants", default="summary",
+                        help=f"Comma-separated outputs from one request per section ({', '.join(VARIANTS)}); the first goes to _Bilingual.txt")
+    parser.add_argument("--glossary", action="store_true",
+                        help="Extract the book's names and recurring terms first and send them as cached context")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only project requests, tokens, cost and time for this run (see translation_plan.py for quotas)")
+    parser.add_argument("--repair", action="store_true", help="Only re-translate the failed sections of the existing bilingual file")
+    parser.add_argument("--metrics", default=None, help="Folder for JSON-lines events, a Prometheus .prom file and a timing summary")
+
+    args = parser.parse_args(argv)
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown or not variants:
+        parser.error(f"unknown variant: {', '.join(unknown)}; choose from {', '.join(VARIANTS)}")
+    if args.align_sentences and variants != ["summary"]:
+        parser.error("--align_sentences works with the default summary variant only")
+    if args.plan:
+        import translation_plan
+        translation_plan.plan(args.input, args.min_sect_length, args.break_at_p_tags, args.chapter_tags,
+                              variants=variants, align_sentences=args.align_sentences, glossary=args.glossary)
+        return
+    if args.repair:
+        import repair_bilingual
+        global memory
+        memory = translation_memory.open_memory(args.memory)
+        with metrics.run("repair_bilingual", args.metrics), attached_glossary(args.input, args.glossary):
+            for i, variant in enumerate(variants):
+                repair_bilingual.repair(track_path(args.input, variant if i else None), variant=variant)
+        return
+    with metrics.run("translate_epub", args.metrics):
+        run_interleaved_translation(args.input, None, args.chapter_limit, args.min_sect_length, args.break_at_p_tags, args.chapter_tags,
+                                    args.align_sentences, args.memory, variants, args.glossary)
+
+
+if __name__ == "__main__":
+    cli()
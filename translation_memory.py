@@ -0,0 +1,198 @@
+import os, re, json, time, random, hashlib, sqlite3, argparse, threading
+
+# --- CONFIGURATION ---
+# Past source paragraphs are indexed by MinHash signature, split into LSH bands, so a
+# near-duplicate (another edition, the next volume's epigraph) is found without
+# comparing against every stored paragraph.
+ENV_PATH = "LTW_TRANSLATION_MEMORY"
+NUM_PERM = 64
+BANDS = 16                 # 16 bands of 4 rows: pairs above ~0.5 Jaccard share a bucket
+SHINGLE_WORDS = 3
+REUSE_THRESHOLD = 0.95     # At or above: the stored translation is used as is
+ADJUST_THRESHOLD = 0.7     # At or above: the model is asked to adjust the stored translation
+PRIME = (1 << 61) - 1
+SEED = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    kind TEXT,          -- 'section', 'sentences' (one sentence per line) or an output variant ('literal', 'plain')
+    digest TEXT,        -- of the normalized source
+    source TEXT,
+    translation TEXT,
+    created REAL,
+    UNIQUE (kind, digest)
+);
+CREATE TABLE IF NOT EXISTS bands (
+    kind TEXT,
+    band INTEGER,
+    bucket INTEGER,
+    entry INTEGER
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands (kind, band, bucket);
+"""
+
+_rng = random.Random(SEED)
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize(text):
+    """Lowercased words without punctuation, so editions that differ only in typography match exactly."""
+    return re.findall(r"\w+", text.lower())
+
+def shingles(words):
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+def stable_hash(value, size=8):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=size).digest(), "big")
+
+def minhash(shingle_set):
+    hashes = [stable_hash(s) for s in shingle_set]
+    return [min((a * h + b) % PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+def band_buckets(signature):
+    rows = NUM_PERM // BANDS
+    return [(band, stable_hash(",".join(map(str, signature[band * rows:(band + 1) * rows])), 7))
+            for band in range(BANDS)]
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class Match:
+    def __init__(self, similarity, source, translation):
+        self.similarity = similarity
+        self.source = source
+        self.translation = translation
+
+
+class TranslationMemory:
+    """Source paragraphs and their translations in one SQLite file. Safe to share between threads."""
+    def __init__(self, path, reuse=REUSE_THRESHOLD, adjust=ADJUST_THRESHOLD):
+        self.path = path
+        self.reuse = reuse
+        self.adjust = adjust
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def add(self, source, translation, kind="section", replace=False):
+        """Stores a translation; an existing one for the same source is kept unless replace is set."""
+        words = normalize(source)
+        if not words:
+            return
+        digest = hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+        buckets = band_buckets(minhash(shingles(words)))
+        with self.lock:
+            if replace and self.db.execute("UPDATE entries SET source = ?, translation = ?, created = ? "
+                                           "WHERE kind = ? AND digest = ?",
+                                           (source, translation, time.time(), kind, digest)).rowcount:
+                self.db.commit()
+                return
+            cursor = self.db.execute("INSERT OR IGNORE INTO entries (kind, digest, source, translation, created) "
+                                     "VALUES (?, ?, ?, ?, ?)", (kind, digest, source, translation, time.time()))
+            if cursor.rowcount:
+                self.db.executemany("INSERT INTO bands VALUES (?, ?, ?, ?)",
+                                    [(kind, band, bucket, cursor.lastrowid) for band, bucket in buckets])
+            self.db.commit()
+
+    def lookup(self, source, kind="section"):
+        """The most similar stored paragraph at or above the adjust threshold, or None."""
+        words = normalize(source)
+        if not words:
+            return None
+        digest = hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+        wanted = shingles(words)
+        with self.lock:
+            row = self.db.execute("SELECT source, translation FROM entries WHERE kind = ? AND digest = ?",
+                                  (kind, digest)).fetchone()
+            if row:
+                return Match(1.0, *row)
+            buckets = band_buckets(minhash(wanted))
+            ids = set()
+            for band, bucket in buckets:
+                ids.update(r[0] for r in self.db.execute(
+                    "SELECT entry FROM bands WHERE kind = ? AND band = ? AND bucket = ?", (kind, band, bucket)))
+            rows = [self.db.execute("SELECT source, translation FROM entries WHERE id = ?", (i,)).fetchone() for i in ids]
+        best = None
+        for stored_source, translation in rows:
+            similarity = jaccard(wanted, shingles(normalize(stored_source)))
+            if similarity >= self.adjust and (best is None or similarity > best.similarity):
+                best = Match(similarity, stored_source, translation)
+        return best
+
+    def stats(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT kind, COUNT(*) FROM entries GROUP BY kind").fetchall())
+
+    def import_bilingual(self, bilingual_path, kind=None):
+        """
+        Adds every translated section of an existing _Bilingual.txt (an earlier
+        volume or edition). Sections are stored under kind, by default the one
+        translate_epub uses for the file's track: a <book>_literal_Bilingual.txt
+        holds literal renderings, the main file summaries.
+        """
+        from bs4 import BeautifulSoup
+        import sentence_align
+        import translate_epub
+        if kind is None:
+            variant = next((v for v in translate_epub.VARIANTS if bilingual_path.endswith(f"_{v}_Bilingual.txt")), "summary")
+            kind = translate_epub.memory_kind(variant)
+        with open(bilingual_path, "r", encoding="utf-8") as f:
+            sections = re.split(r"={40,}", f.read())
+        added = 0
+        for section in sections:
+            original = re.search(r"<div class='original-text'>\s*### SECTION \d+ ORIGINAL\n(.*?)\n</div>", section, re.DOTALL)
+            translation = re.search(r"<div class='translation-content'>(.*?)</div>", section, re.DOTALL)
+            if not original or not translation:
+                continue
+            source = BeautifulSoup(original.group(1), "html.parser").get_text().strip()
+            pairs = sentence_align.parse_pairs(translation.group(1))
+            if pairs:
+                self.add(source, "\n".join(tgt for _, tgt in pairs), "sentences")
+            else:
+                lines = [re.sub(r"<[^>]+>", "", p).strip() for p in re.findall(r"<p>(.*?)</p>", translation.group(1), re.DOTALL)]
+                self.add(source, "\n".join(line for line in lines if line), kind)
+            added += 1
+        return added
+
+
+def open_memory(path=None):
+    """The translation memory at `path` (LTW_TRANSLATION_MEMORY when not given), or None if neither is set."""
+    path = path or os.environ.get(ENV_PATH)
+    if not path:
+        return None
+    global _memory
+    if _memory is None or _memory.path != path:
+        _memory = TranslationMemory(path)
+    return _memory
+
+_memory = None
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain or query the fuzzy translation memory.")
+    parser.add_argument("action", choices=["stats", "import", "query"])
+    parser.add_argument("memory", help="Memory database, e.g. Books/ltw_memory.db")
+    parser.add_argument("inputs", nargs="*", help="import: _Bilingual.txt files; query: the text to look up")
+    parser.add_argument("--kind", default=None, choices=["section", "sentences", "literal", "plain"],
+                        help="query: entries to search (default: section); import: overrides the kind taken from the file name")
+    args = parser.parse_args(argv)
+    memory = open_memory(args.memory)
+    if args.action == "import":
+        for path in args.inputs:
+            print(f"[*] {path}: {memory.import_bilingual(path, args.kind)} sections")
+    elif args.action == "query":
+        match = memory.lookup(" ".join(args.inputs), args.kind or "section")
+        if match is None:
+            print("[ ] No match above the adjust threshold.")
+        else:
+            print(f"[*] Similarity {match.similarity:.2f}\n{match.source}\n---\n{match.translation}")
+    print(json.dumps(memory.stats()))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,215 @@
+import os, json, math, argparse
+import ebooklib
+from ebooklib import epub
+import translate_epub
+import book_glossary
+
+# --- CONFIGURATION ---
+# Estimates, overridable on the command line or calibrated from an earlier run's metrics.
+CHARS_PER_TOKEN = 4.0
+OUTPUT_RATIOS = {"summary": 0.45, "literal": 1.1, "plain": 0.8, "sentences": 1.05}  # Output tokens per source token, thinking included
+LATENCY_SECONDS = 6.0          # Per request, as seen by translate_epub
+RPM = 5
+TPM = 250000
+WORKERS = 4                    # library_runner's default
+GLOSSARY_TOKENS = 2000         # Compact glossary sent as cached context with every request
+# USD per million tokens (gemini-2.5-flash)
+INPUT_PRICE = 0.30
+OUTPUT_PRICE = 2.50
+CACHED_PRICE = 0.03
+
+# (label, min_sect_length, break_at_p_tags) compared by --compare
+STRATEGIES = [
+    ("every <p>", 0, True),
+    ("min 250", 250, False),
+    ("min 500 (default)", 500, False),
+    ("min 1000", 1000, False),
+    ("min 2000", 2000, False),
+]
+
+
+class Strategy:
+    """Totals for one segmentation of the book."""
+    def __init__(self, label, min_sect_length, break_at_p_tags):
+        self.label = label
+        self.min_sect_length = min_sect_length
+        self.break_at_p_tags = break_at_p_tags
+        self.requests = 0
+        self.chars = 0
+        self.skipped_chars = 0
+
+    def add(self, text):
+        if self.break_at_p_tags or len(text) >= self.min_sect_length:
+            self.requests += 1
+            self.chars += len(text)
+        else:
+            self.skipped_chars += len(text)  # Sections below the minimum are not written at all
+
+
+def scan(epub_path, strategies, chapter_tags="h1,h2,h3"):
+    """
+    Streams the EPUB once through translate_epub's segmentation, counting
+    every strategy in the same pass (they differ only in which paragraphs
+    become sections). Returns (headers, chapters).
+    """
+    book = epub.read_epub(epub_path)
+    items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+    tags_to_watch = [t.strip().lower() for t in chapter_tags.split(",")]
+    headers = chapters = 0
+    for section in translate_epub.iter_sections(items, tags_to_watch, 0, 0, True):
+        if section["kind"] == "header":
+            headers += 1
+            chapters += section["is_chapter"]
+        elif section["kind"] == "text":
+            for strategy in strategies:
+                strategy.add(section["text"])
+    return headers, chapters
+
+def prompt_template(settings):
+    """
+    (prompt around the section text, output tokens per source token) for the
+    run's options, built as translate_epub.request_variants builds it.
+    """
+    variants = list(settings["variants"])
+    ratio = sum(OUTPUT_RATIOS.get(v, 1.0) for v in variants)
+    if settings["align_sentences"]:
+        return translate_epub.SENTENCE_PROMPT.format(text=""), OUTPUT_RATIOS["sentences"]
+    if variants == ["summary"]:
+        return translate_epub.SECTION_PROMPT.format(text=""), ratio
+    if len(variants) == 1:
+        return translate_epub.VARIANT_PROMPT.format(instructions=translate_epub.VARIANTS[variants[0]], text=""), ratio
+    fields = "\n".join(f"{v}: {translate_epub.VARIANTS[v]}" for v in variants)
+    return translate_epub.VARIANTS_PROMPT.format(fields=fields, text=""), ratio
+
+def calibrate(metrics_dir, settings):
+    """
+    Takes latency and output/input ratio from an earlier translate_epub run's
+    metrics events; that run should have used the same prompt options.
+    """
+    path = os.path.join(metrics_dir, "translate_epub.jsonl")
+    latencies, prompt, output = [], 0, 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            if event.get("event") == "request" and event.get("kind") == translate_epub.MODEL_ID and "error" not in event:
+                latencies.append(event["seconds"])
+                tokens = event.get("tokens") or {}
+                prompt += tokens.get("prompt", 0)
+                output += tokens.get("output", 0)
+    if latencies:
+        settings["latency"] = sum(latencies) / len(latencies)
+    if prompt:
+        template = len(prompt_template(settings)[0]) / settings["chars_per_token"] * len(latencies)
+        settings["output_ratio"] = output / max(prompt - template, 1)
+    print(f"[*] Calibrated from {len(latencies)} requests: {settings['latency']:.1f} s each, "
+          f"{settings.get('output_ratio', 0):.2f} output tokens per source token")
+
+def project(strategy, settings):
+    """Requests, tokens, cost and wall time for one strategy."""
+    cpt = settings["chars_per_token"]
+    template, ratio = prompt_template(settings)
+    ratio = settings.get("output_ratio") or ratio
+    sections = strategy.requests
+    source_tokens = strategy.chars / cpt
+    input_tokens = source_tokens + sections * len(template) / cpt
+    output_tokens = source_tokens * ratio
+    cached_tokens = 0
+    extraction = 0
+    if settings["glossary"]:
+        # One extraction request per chunk of the whole book, then the glossary rides along as cached context
+        book_chars = strategy.chars + strategy.skipped_chars
+        extraction = math.ceil(book_chars / book_glossary.CHUNK_CHARS)
+        input_tokens += book_chars / cpt
+        output_tokens += GLOSSARY_TOKENS
+        cached_tokens = sections * GLOSSARY_TOKENS
+    requests = sections + extraction
+    cost = (input_tokens * settings["input_price"] + output_tokens * settings["output_price"]
+            + cached_tokens * CACHED_PRICE) / 1e6
+
+    latency = settings["latency"]
+    # The glossary pass runs first, one request at a time
+    glossary_seconds = extraction * max(latency, 60 / settings["rpm"] if settings["rpm"] else 0)
+    sequential = glossary_seconds + sections * (latency + translate_epub.THROTTLE_SECONDS)  # translate_epub's own pacing
+    per_request = (input_tokens + output_tokens) / max(requests, 1)
+    rates = [settings["workers"] / latency]  # Requests per second each limit allows
+    if settings["rpm"]:
+        rates.append(settings["rpm"] / 60)
+    if settings["tpm"] and per_request:
+        rates.append(settings["tpm"] / per_request / 60)
+    concurrent = glossary_seconds + sections / min(rates)
+    days = math.ceil(requests / settings["rpd"]) if settings["rpd"] else None
+    total = strategy.chars + strategy.skipped_chars
+    return {"label": strategy.label, "requests": requests, "coverage": strategy.chars / total if total else 1.0,
+            "input": input_tokens, "output": output_tokens, "cost": cost,
+            "sequential": sequential, "concurrent": concurrent, "days": days}
+
+def hours(seconds):
+    return f"{int(seconds // 3600)}:{int(seconds % 3600 // 60):02d}"
+
+def report(epub_path, headers, chapters, rows, settings):
+    print(f"[*] {os.path.basename(epub_path)}: {chapters} chapters, {headers} headers")
+    print(f"    {settings['rpm'] or '-'} RPM, {settings['tpm'] or '-'} TPM, {settings['workers']} workers, "
+          f"{settings['latency']:.1f} s per request, {settings['chars_per_token']} chars per token")
+    print(f"\n{'strategy':<20}{'requests':>9}{'text':>7}{'input tok':>12}{'output tok':>12}{'cost $':>9}"
+          f"{'translate_epub':>16}{'at quota':>10}" + (f"{'days (RPD)':>12}" if settings["rpd"] else ""))
+    for r in rows:
+        print(f"{r['label']:<20}{r['requests']:>9}{r['coverage']:>7.0%}{r['input']:>12,.0f}{r['output']:>12,.0f}"
+              f"{r['cost']:>9.2f}{hours(r['sequential']):>16}{hours(r['concurrent']):>10}"
+              + (f"{r['days']:>12}" if settings["rpd"] else ""))
+    print("\n    text: share of the book's paragraph text that becomes sections (shorter paragraphs are skipped)")
+    print("    translate_epub: one request at a time plus its throttle pause; at quota: library_runner-style workers")
+
+def plan(epub_path, min_sect_length=500, break_at_p_tags=False, chapter_tags="h1,h2,h3", compare=False,
+         variants=("summary",), align_sentences=False, glossary=False, rpm=RPM, tpm=TPM, rpd=None, workers=WORKERS,
+         latency=LATENCY_SECONDS, chars_per_token=CHARS_PER_TOKEN, input_price=INPUT_PRICE, output_price=OUTPUT_PRICE,
+         metrics_dir=None):
+    """Projects requests, tokens, cost and time for a run without sending anything. Returns the rows."""
+    settings = {"variants": list(variants), "align_sentences": align_sentences, "glossary": glossary, "rpm": rpm,
+                "tpm": tpm, "rpd": rpd, "workers": workers, "latency": latency, "chars_per_token": chars_per_token,
+                "input_price": input_price, "output_price": output_price}
+    if metrics_dir:
+        calibrate(metrics_dir, settings)
+    key = (0, True) if break_at_p_tags else (min_sect_length, False)
+    label = next((s[0] for s in STRATEGIES if (s[1], s[2]) == key), f"min {min_sect_length}")
+    chosen = Strategy(label, *key)
+    strategies = [chosen]
+    if compare:
+        strategies += [Strategy(*s) for s in STRATEGIES
+                       if (s[1], s[2]) != (chosen.min_sect_length, chosen.break_at_p_tags)]
+    headers, chapters = scan(epub_path, strategies, chapter_tags)
+    rows = [project(s, settings) for s in strategies]
+    report(epub_path, headers, chapters, rows, settings)
+    return rows
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Project the requests, tokens, cost and time of a translation run.")
+    parser.add_argument("-i", "--input", required=True, help="Source EPUB")
+    parser.add_argument("-m", "--min_sect_length", type=int, default=500)
+    parser.add_argument("--break_at_p_tags", action="store_true")
+    parser.add_argument("--chapter_tags", type=str, default="h1,h2,h3")
+    parser.add_argument("--compare", action="store_true", help="Add the other segmentation strategies side by side")
+    parser.add_argument("--variants", default="summary", help="As for translate_epub.py")
+    parser.add_argument("--align_sentences", action="store_true")
+    parser.add_argument("--glossary", action="store_true")
+    parser.add_argument("--rpm", type=int, default=RPM, help="Requests per minute (0: no limit)")
+    parser.add_argument("--tpm", type=int, default=TPM, help="Tokens per minute (0: no limit)")
+    parser.add_argument("--rpd", type=int, default=None, help="Requests per day, to count the days a free tier needs")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Requests in flight at once")
+    parser.add_argument("--latency", type=float, default=LATENCY_SECONDS, help="Seconds per request")
+    parser.add_argument("--chars_per_token", type=float, default=CHARS_PER_TOKEN)
+    parser.add_argument("--input_price", type=float, default=INPUT_PRICE, help="USD per million input tokens")
+    parser.add_argument("--output_price", type=float, default=OUTPUT_PRICE, help="USD per million output tokens")
+    parser.add_argument("--calibrate", default=None, help="Metrics folder of an earlier translate_epub --metrics run")
+    args = parser.parse_args(argv)
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in variants if v not in translate_epub.VARIANTS]
+    if unknown or not variants:
+        parser.error(f"unknown variant: {', '.join(unknown)}; choose from {', '.join(translate_epub.VARIANTS)}")
+    plan(args.input, args.min_sect_length, args.break_at_p_tags, args.chapter_tags, args.compare, variants,
+         args.align_sentences, args.glossary, args.rpm, args.tpm, args.rpd, args.workers, args.latency,
+         args.chars_per_token, args.input_price, args.output_price, args.calibrate)
+
+
+if __name__ == "__main__":
+    cli()
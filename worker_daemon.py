@@ -0,0 +1,320 @@
+import os, sys, json, stat, time, socket, ctypes, hashlib, argparse, tempfile, threading
+
+# --- CONFIGURATION ---
+# Scripts that call delegate() at the top hand their job to a running daemon, which
+# keeps google.genai, ebooklib, bs4 and pydub imported and each module's genai.Client
+# (and its keep-alive connection pool) alive between jobs. LTW_NO_DAEMON=1 always runs
+# locally; LTW_DAEMON_SOCKET moves the socket.
+ENV_SOCKET = "LTW_DAEMON_SOCKET"
+ENV_DISABLE = "LTW_NO_DAEMON"
+ENV_PREFIX = "LTW_"          # The client's LTW_* settings apply to its job
+ENV_API_KEY = "GEMINI_API_KEY"  # Baked into the warm clients, so a job with another key runs locally
+WARM_MODULES = ["translate_epub", "extract_chapters", "extract_cantos", "build_audio",
+                "build_chapter_audio", "build_epub", "epub_to_htmlz"]
+
+
+def private_dir():
+    """$XDG_RUNTIME_DIR, or an owner-only folder of ours in the shared temp directory."""
+    return os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"ltw-{os.getuid()}")
+
+def socket_path():
+    return os.environ.get(ENV_SOCKET) or os.path.join(private_dir(), "ltw-worker.sock")
+
+def make_private_dir(directory):
+    """Creates the socket's folder owner-only, refusing one another user got to first."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise SystemExit(f"[!] {directory} must be a folder only you can access; set {ENV_SOCKET} elsewhere")
+
+def connect(path=None):
+    """A connected socket to the daemon, or None if none is listening (or the socket is not ours)."""
+    path = path or socket_path()
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    if os.stat(path).st_uid != os.getuid():
+        # Another user's socket would receive the job's arguments and settings
+        print(f"[!] Ignoring {path}: it belongs to another user", file=sys.stderr)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+def send(sock, message):
+    sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+def job_environment():
+    """The LTW_* settings a job runs with."""
+    return {k: v for k, v in os.environ.items() if k.startswith(ENV_PREFIX)}
+
+def key_digest():
+    """A digest of GEMINI_API_KEY, so the key itself never crosses the socket."""
+    return hashlib.sha256(os.environ.get(ENV_API_KEY, "").encode("utf-8")).hexdigest()
+
+
+# --- Thin client ---
+def delegate(name, file):
+    """
+    Called first thing by each script. When run as a script and a daemon is
+    listening, the job runs there with this process's arguments, working
+    directory and LTW_* settings, its output is streamed back, and this
+    process exits with the job's exit code. Otherwise (or if the daemon is
+    busy or holds another API key) it returns and the script runs as usual.
+    Cassette runs stay local, since the daemon's clients were built without it.
+    """
+    if name == "__main__":
+        submit(os.path.splitext(os.path.basename(file))[0], sys.argv[1:])
+
+def submit(module, argv):
+    """Runs module.cli(argv) in the daemon and exits, or returns if no daemon takes the job."""
+    if os.environ.get(ENV_DISABLE) or os.environ.get("LTW_CASSETTE"):
+        return
+    sock = connect()
+    if sock is None:
+        return
+    with sock, sock.makefile("r", encoding="utf-8") as replies:
+        send(sock, {"module": module, "argv": argv, "cwd": os.getcwd(), "env": job_environment(),
+                    "key": key_digest()})
+        first = replies.readline()
+        if not first or not json.loads(first).get("accepted"):
+            return
+        code = 1
+        try:
+            for line in replies:
+                reply = json.loads(line)
+                if "exit" in reply:
+                    code = reply["exit"]
+                    break
+                stream = sys.stderr if reply.get("stream") == "err" else sys.stdout
+                stream.write(reply["text"])
+                stream.flush()
+        except KeyboardInterrupt:
+            code = 130  # Closing the socket cancels the job in the daemon
+    sys.exit(code)
+
+
+# --- Daemon ---
+class SocketStream:
+    """File-like stdout/stderr that forwards writes to the job's client."""
+    def __init__(self, sock, name, lock):
+        self.sock = sock
+        self.name = name
+        self.lock = lock
+        self.closed = False
+
+    def write(self, text):
+        if text and not self.closed:
+            with self.lock:
+                try:
+                    send(self.sock, {"stream": self.name, "text": text})
+                except OSError:
+                    self.closed = True  # Client went away; the job keeps going
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def cancel_on_disconnect(sock, job_thread, done, guard):
+    """
+    Watches the job's socket: the client sends nothing after its request, so
+    end-of-stream means it went away (Ctrl-C). KeyboardInterrupt is then raised
+    in the job thread, as it would have been in a local run.
+    """
+    try:
+        while not done.is_set() and sock.recv(1024):
+            pass
+    except OSError:
+        pass
+    with guard:
+        if not done.is_set():
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(job_thread), ctypes.py_object(KeyboardInterrupt))
+
+class WorkerDaemon:
+    """
+    Accepts jobs over a Unix socket and runs each module's cli() in this
+    process. One job runs at a time, since jobs share sys.argv, the working
+    directory, the environment and stdout. A job that arrives meanwhile is
+    declined and its script runs in its own process, so several books can
+    still be worked on at once.
+    """
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self.modules = {}
+        self.mtimes = {}
+        self.job_lock = threading.Lock()
+        self.started = time.time()
+        self.jobs = 0
+        self.stopping = threading.Event()
+        self.log = sys.stderr
+
+    def load(self, name):
+        """Imports (or re-imports after an edit) one module, keeping it warm."""
+        import importlib
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name + ".py")
+        mtime = os.path.getmtime(path)
+        if name in self.modules and self.mtimes[name] == mtime:
+            return self.modules[name]
+        try:
+            module = importlib.reload(self.modules[name]) if name in self.modules else importlib.import_module(name)
+        except (Exception, SystemExit) as e:
+            print(f"[!] Could not load {name}: {e}", file=self.log, flush=True)
+            self.modules.pop(name, None)
+            return None
+        self.modules[name], self.mtimes[name] = module, mtime
+        return module
+
+    def warm(self):
+        started = time.monotonic()
+        for name in WARM_MODULES:
+            module = self.load(name)
+            if hasattr(module, "load_audio"):
+                module.load_audio()  # Imported lazily by the scripts, eagerly here
+        print(f"[*] Warmed {len(self.modules)}/{len(WARM_MODULES)} modules in {time.monotonic() - started:.1f}s",
+              file=self.log, flush=True)
+
+    def run_job(self, sock, request):
+        name = request.get("module")
+        if request.get("key") != key_digest():
+            print(f"[*] {name}: declined, the client uses another {ENV_API_KEY}", file=self.log, flush=True)
+            send(sock, {"accepted": False})
+            return
+        if not self.job_lock.acquire(blocking=False):
+            print(f"[*] {name}: declined while busy; it runs in its own process", file=self.log, flush=True)
+            send(sock, {"accepted": False})
+            return
+        try:
+            module = self.load(name) if name in WARM_MODULES else None
+            if module is None or not hasattr(module, "cli"):
+                send(sock, {"accepted": False})
+                return
+            send(sock, {"accepted": True})
+            print(f"[*] {name} {' '.join(request['argv'])}", file=self.log, flush=True)
+            lock = threading.Lock()
+            saved = sys.argv, sys.stdout, sys.stderr, os.getcwd()
+            saved_env = job_environment()
+            for key in saved_env:
+                del os.environ[key]
+            os.environ.update(request.get("env") or {})
+            sys.argv = [name + ".py"] + request["argv"]
+            sys.stdout, sys.stderr = SocketStream(sock, "out", lock), SocketStream(sock, "err", lock)
+            done, guard = threading.Event(), threading.Lock()
+            threading.Thread(target=cancel_on_disconnect, args=(sock, threading.get_ident(), done, guard),
+                             daemon=True).start()
+            code = 0
+            try:
+                try:
+                    os.chdir(request["cwd"])
+                    module.cli(request["argv"])
+                finally:
+                    with guard:
+                        done.set()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if e.code is not None and not isinstance(e.code, int):
+                    print(e.code, file=sys.stderr)
+            except KeyboardInterrupt:
+                print(f"[*] {name}: cancelled by the client", file=self.log, flush=True)
+                code = 130
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.argv, sys.stdout, sys.stderr = saved[:3]
+                os.chdir(saved[3])
+                for key in job_environment():
+                    del os.environ[key]
+                os.environ.update(saved_env)
+                self.jobs += 1
+            try:
+                send(sock, {"exit": code})
+            except OSError:
+                pass
+        finally:
+            self.job_lock.release()
+
+    def handle(self, sock):
+        with sock, sock.makefile("r", encoding="utf-8") as requests:
+            line = requests.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            command = request.get("command")
+            if command == "status":
+                send(sock, {"pid": os.getpid(), "uptime": round(time.time() - self.started), "jobs": self.jobs,
+                            "busy": self.job_lock.locked(), "modules": sorted(self.modules)})
+            elif command == "stop":
+                send(sock, {"stopping": True})
+                self.stopping.set()
+            else:
+                self.run_job(sock, request)
+
+    def serve(self):
+        if connect(self.path):
+            raise SystemExit(f"[!] A daemon is already listening on {self.path}")
+        if not os.environ.get(ENV_SOCKET) and self.path == socket_path():
+            make_private_dir(os.path.dirname(self.path))
+        if os.path.exists(self.path):
+            os.remove(self.path)  # Left behind by a daemon that did not shut down cleanly
+        self.warm()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)  # The socket is created owner-only, with no window before a chmod
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(umask)
+        server.listen()
+        server.settimeout(0.5)
+        print(f"[*] Listening on {self.path} (pid {os.getpid()})", file=self.log, flush=True)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            print("[*] Stopped.", file=self.log, flush=True)
+
+
+def command(path, message):
+    sock = connect(path)
+    if sock is None:
+        print(f"[*] No daemon listening on {path or socket_path()}")
+        return None
+    with sock, sock.makefile("r", encoding="utf-8") as replies:
+        send(sock, message)
+        return json.loads(replies.readline() or "null")
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Keep imports and API clients warm and run pipeline jobs sent by the scripts.")
+    parser.add_argument("action", choices=["start", "stop", "status"])
+    parser.add_argument("--socket", default=None, help=f"Socket path (default: ${ENV_SOCKET} or {socket_path()})")
+    args = parser.parse_args(argv)
+    if args.action == "start":
+        WorkerDaemon(args.socket).serve()
+    elif args.action == "stop":
+        if command(args.socket, {"command": "stop"}):
+            print("[*] Daemon stopping.")
+    else:
+        status = command(args.socket, {"command": "status"})
+        if status:
+            print(f"[*] pid {status['pid']}, up {status['uptime']}s, {status['jobs']} jobs run, "
+                  f"{'busy' if status['busy'] else 'idle'}; warm: {', '.join(status['modules'])}")
+
+
+if __name__ == "__main__":
+    cli()